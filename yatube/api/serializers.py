@@ -0,0 +1,108 @@
+"""
+Сериализация записей для JSON API без создания объектов моделей.
+
+Записи выбираются через QuerySet.values() сразу с полями связанных
+моделей (имя автора, slug группы), и ответ собирается из словарей.
+Набор полей каждого типа записей сокращается параметром
+fields[тип]=поле,поле (sparse fieldsets): ненужные столбцы
+не выбираются из базы и не попадают в ответ.
+"""
+from django.core.files.storage import default_storage
+
+
+class InvalidFields(ValueError):
+    """В fields[тип] указаны неизвестные поля."""
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    """
+    Тип записей API: поля ответа и пути к ним для values().
+    convert — функции, преобразующие значения полей для ответа.
+    """
+
+    def __init__(self, name, fields, convert=None):
+        self.name = name
+        self.fields = fields
+        self.convert = convert or {}
+
+    def fieldset(self, request, prefix=''):
+        """
+        Поля из ?fields[тип]=... или все поля. prefix — путь
+        к записи, если она выбирается через связанную модель.
+        """
+        value = request.GET.get(f'fields[{self.name}]')
+        if value is None:
+            return Fieldset(self, self.fields, prefix)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(names) - set(self.fields)
+        if unknown:
+            raise InvalidFields(
+                f'Неизвестные поля {self.name}: {", ".join(sorted(unknown))}'
+            )
+        return Fieldset(self, names, prefix)
+
+
+class Fieldset:
+    """Выбранные поля записи и столбцы, из которых они читаются."""
+
+    def __init__(self, resource, names, prefix=''):
+        self.lookups = {name: prefix + resource.fields[name]
+                        for name in names}
+        self.convert = resource.convert
+
+    def values(self, queryset, *extra):
+        """
+        queryset.values() со столбцами выбранных полей и extra,
+        например полями ключа паджинации.
+        """
+        return queryset.values(*dict.fromkeys([*self.lookups.values(),
+                                               *extra]))
+
+    def serialize(self, row):
+        result = {}
+        for name, lookup in self.lookups.items():
+            value = row[lookup]
+            if name in self.convert:
+                value = self.convert[name](value)
+            result[name] = value
+        return result
+
+
+POSTS = Resource('posts', {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}, convert={'image': image_url})
+
+COMMENTS = Resource('comments', {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+})
+
+GROUPS = Resource('groups', {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+})
+
+USERS = Resource('users', {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+})
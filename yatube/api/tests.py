@@ -0,0 +1,170 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth',
+                                            first_name='Лев')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.user, group=cls.group)
+            for number in range(settings.COUNT_PAGES_PAGINATOR + 3)
+        )
+        cls.post = Post.objects.latest('created', 'id')
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.reader,
+                                             text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def collect(self, url, key=None):
+        """Записи всех страниц списка, пройденных по next_cursor."""
+        rows, cursor = [], None
+        while True:
+            data = self.client.get(url, {'cursor': cursor} if cursor
+                                   else {}).json()
+            page = data[key] if key else data
+            rows += page['results']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return rows
+
+    def test_index_cursor_pagination(self):
+        """Лента отдается страницами по курсору от новых постов."""
+        url = reverse('api:index')
+        data = self.client.get(url).json()
+        self.assertEqual(len(data['results']),
+                         settings.COUNT_PAGES_PAGINATOR)
+        self.assertIsNone(data['previous_cursor'])
+        self.assertEqual(data['results'][0], {
+            'id': self.post.pk,
+            'text': self.post.text,
+            'created': data['results'][0]['created'],
+            'updated': data['results'][0]['updated'],
+            'author': 'auth',
+            'group': 'group',
+            'image': None,
+            'comments_count': 1,
+        })
+        expected = list(Post.objects.order_by('-created', '-id')
+                        .values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in self.collect(url)], expected)
+
+    def test_index_single_query(self):
+        """Страница ленты выбирается одним запросом без объектов моделей."""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:index'))
+
+    def test_sparse_fieldsets(self):
+        """fields[тип] сокращает набор полей каждого типа записей."""
+        response = self.client.get(
+            reverse('api:post_detail', args=[self.post.pk]),
+            {'fields[posts]': 'id,author', 'fields[comments]': 'text'}
+        )
+        self.assertEqual(response.json()['post'],
+                         {'id': self.post.pk, 'author': 'auth'})
+        self.assertEqual(response.json()['comments']['results'],
+                         [{'text': 'Комментарий'}])
+
+    def test_errors(self):
+        """Неверные поля, курсор и адрес дают ошибку в JSON."""
+        cases = (
+            (reverse('api:index'), {'fields[posts]': 'id,password'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:index'), {'cursor': 'broken'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:post_detail', args=[0]), {},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:group_list', args=['missing']), {},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:follow_index'), {}, HTTPStatus.UNAUTHORIZED),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_group_and_profile(self):
+        """Страницы группы и автора отдают запись и ее посты."""
+        group = self.client.get(reverse('api:group_list', args=['group']),
+                                {'fields[groups]': 'title,posts_count'})
+        self.assertEqual(group.json()['group'], {
+            'title': 'Группа', 'posts_count': self.group.posts.count()
+        })
+        author = self.client.get(reverse('api:profile', args=['auth']),
+                                 {'fields[users]': 'first_name,posts_count'})
+        self.assertEqual(author.json()['author'], {
+            'first_name': 'Лев', 'posts_count': self.user.posts.count()
+        })
+        self.assertEqual(
+            len(self.collect(reverse('api:group_list', args=['group']),
+                             'posts')),
+            self.group.posts.count()
+        )
+
+    def test_follow_feed(self):
+        """Лента подписок отдает посты авторов, на которых подписан."""
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('api:follow_index')
+        self.assertEqual(client.get(url).json()['results'], [])
+        Follow.objects.create(user=self.reader, author=self.user)
+        for threshold in (settings.FEED_FANOUT_THRESHOLD, 0):
+            with self.subTest(threshold=threshold), \
+                    override_settings(FEED_FANOUT_THRESHOLD=threshold):
+                rows = []
+                data = client.get(url).json()
+                while True:
+                    rows += data['results']
+                    if data['next_cursor'] is None:
+                        break
+                    data = client.get(
+                        url, {'cursor': data['next_cursor']}
+                    ).json()
+                self.assertEqual(len(rows), self.user.posts.count())
+
+    def test_etag(self):
+        """Повторный запрос с ETag получает 304, пока данные не изменились."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['text'], 'Новый пост')
+
+    def test_etag_changes_with_counters(self):
+        """Списки и профиль отдаются заново при изменении счетчиков."""
+        index_url = reverse('api:index')
+        profile_url = reverse('api:profile', args=[self.reader.username])
+        index_etag = self.client.get(index_url)['ETag']
+        profile_etag = self.client.get(profile_url)['ETag']
+
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Еще комментарий')
+        response = self.client.get(index_url, HTTP_IF_NONE_MATCH=index_etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['comments_count'], 2)
+
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.client.get(profile_url,
+                                   HTTP_IF_NONE_MATCH=profile_etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['author']['following_count'], 1)
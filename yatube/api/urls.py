@@ -0,0 +1,24 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    # Лента всех постов
+    path('posts/', views.index, name='index'),
+    # Пост с первой страницей комментариев
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    # Следующие страницы комментариев поста
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    # Сообщество и его посты
+    path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    # Автор и его посты
+    path('profile/<str:username>/', views.profile, name='profile'),
+    # Лента подписок
+    path('follow/', views.follow_index, name='follow_index'),
+]
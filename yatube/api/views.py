@@ -0,0 +1,155 @@
+"""
+JSON API только для чтения: те же ленты и страницы, что и в posts,
+но небольшими ответами для мобильных клиентов и кеша на границе сети.
+
+Списки отдаются страницами по курсору (?cursor=...) в виде
+{"results": [...], "next_cursor": ..., "previous_cursor": ...}.
+Ответы получают ETag и Last-Modified по поколениям данных, как
+HTML-страницы, поэтому повторный запрос с If-None-Match получает 304
+без обращения к базе.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import Http404, JsonResponse
+
+from core.db import read_only
+from core.decorators import condition_by_generations, query_budget
+from core.paginator import DEFAULT_KEYS, CursorPaginator, InvalidCursor
+from core.utils import COUNT_PAGES
+from posts import generations
+from posts.feed import feed_source
+from posts.models import Comment, Group, Post
+from .serializers import COMMENTS, GROUPS, POSTS, USERS, InvalidFields
+
+User = get_user_model()
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def _error(detail, status):
+    return _json({'detail': detail}, status=status)
+
+
+def api_view(view_func):
+    """Ошибки запроса отдаются в JSON, а не HTML-страницей."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return _error('Метод не поддерживается', 405)
+        try:
+            return view_func(request, *args, **kwargs)
+        except (InvalidCursor, InvalidFields) as error:
+            return _error(str(error), 400)
+        except Http404:
+            return _error('Не найдено', 404)
+    return wrapper
+
+
+def api_login_required(view_func):
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error('Требуется авторизация', 401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def get_row_or_404(queryset, fieldset, *extra):
+    """Первая запись queryset в виде словаря values()."""
+    rows = fieldset.values(queryset, *extra)[:1]
+    if not rows:
+        raise Http404
+    return rows[0]
+
+
+def page_data(request, queryset, fieldset, keys=DEFAULT_KEYS,
+              per_page=COUNT_PAGES):
+    """Страница записей после курсора из ?cursor=..."""
+    paginator = CursorPaginator(fieldset.values(queryset, *keys), per_page,
+                                keys=keys)
+    page = paginator.cursor_page(request.GET.get('cursor'))
+    return {
+        'results': [fieldset.serialize(row) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+@query_budget(1)
+@api_view
+@read_only
+@condition_by_generations(generations.api_index_page)
+def index(request):
+    return _json(page_data(request, Post.objects.all(),
+                           POSTS.fieldset(request)))
+
+
+@query_budget(2)
+@api_view
+@read_only
+@condition_by_generations(generations.api_group_page)
+def group_posts(request, slug):
+    groups = GROUPS.fieldset(request)
+    group = get_row_or_404(Group.objects.filter(slug=slug), groups, 'id')
+    posts = page_data(request, Post.objects.filter(group_id=group['id']),
+                      POSTS.fieldset(request))
+    return _json({'group': groups.serialize(group), 'posts': posts})
+
+
+@query_budget(2)
+@api_view
+@read_only
+@condition_by_generations(generations.api_profile_page)
+def profile(request, username):
+    users = USERS.fieldset(request)
+    author = get_row_or_404(User.objects.filter(username=username), users,
+                            'id')
+    posts = page_data(request, Post.objects.filter(author_id=author['id']),
+                      POSTS.fieldset(request))
+    return _json({'author': users.serialize(author), 'posts': posts})
+
+
+def _comments_page(request, post_id):
+    return page_data(request, Comment.objects.filter(post_id=post_id),
+                     COMMENTS.fieldset(request),
+                     per_page=settings.COUNT_COMMENTS_PAGINATOR)
+
+
+@query_budget(3)
+@api_view
+@read_only
+@condition_by_generations(generations.post_page)
+def post_detail(request, post_id):
+    posts = POSTS.fieldset(request)
+    post = get_row_or_404(Post.objects.filter(pk=post_id), posts)
+    return _json({'post': posts.serialize(post),
+                  'comments': _comments_page(request, post_id)})
+
+
+@query_budget(3)
+@api_view
+@read_only
+@condition_by_generations(generations.post_page)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return _json(_comments_page(request, post_id))
+
+
+@query_budget(4)
+@api_view
+@api_login_required
+@read_only
+@condition_by_generations(generations.api_follow_page)
+def follow_index(request):
+    source, keys = feed_source(request.user)
+    # Записи ленты (FeedItem) ссылаются на посты через поле post
+    prefix = '' if source.model is Post else 'post__'
+    return _json(page_data(request, source,
+                           POSTS.fieldset(request, prefix=prefix),
+                           keys=keys))
@@ -0,0 +1,7 @@
+"""
+Бенчмарки проекта.
+
+Запускаются из директории с manage.py, например:
+    python -m benchmarks.pagination
+Каждый бенчмарк работает на отдельной временной базе данных.
+"""
@@ -0,0 +1,59 @@
+"""
+Сравнение результатов двух запусков benchmarks.load.
+
+    python -m benchmarks.compare old.json new.json [--threshold 10]
+
+Выводит изменение задержек по сценариям и завершается с кодом 1,
+если p50 или p99 какого-либо сценария выросли больше чем на threshold
+процентов.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('p50_ms', 'p99_ms')
+
+
+def change(old, new):
+    """Изменение в процентах."""
+    return (new - old) / old * 100 if old else 0
+
+
+def compare(old, new, threshold):
+    """Печатает сравнение и возвращает список ухудшений."""
+    regressions = []
+    print(f'{"драйвер":<8}{"сценарий":<14}{"метрика":<8}'
+          f'{"было":>10}{"стало":>10}{"%":>8}')
+    for driver, scenarios in new['results'].items():
+        for scenario, result in scenarios.items():
+            previous = old['results'].get(driver, {}).get(scenario)
+            if previous is None:
+                continue
+            for metric in METRICS:
+                percent = change(previous[metric], result[metric])
+                mark = ''
+                if percent > threshold:
+                    regressions.append((driver, scenario, metric))
+                    mark = ' !'
+                print(f'{driver:<8}{scenario:<14}{metric[:3]:<8}'
+                      f'{previous[metric]:>10.2f}{result[metric]:>10.2f}'
+                      f'{percent:>+8.1f}{mark}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10)
+    options = parser.parse_args()
+    with open(options.old) as old, open(options.new) as new:
+        regressions = compare(json.load(old), json.load(new),
+                              options.threshold)
+    if regressions:
+        print(f'Ухудшений больше {options.threshold}%: {len(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
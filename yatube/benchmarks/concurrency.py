@@ -0,0 +1,159 @@
+"""
+Одновременные запись и чтение в базе данных.
+
+    python -m benchmarks.concurrency [--writers 4] [--readers 8]
+                                     [--seconds 5] [--output results.json]
+
+Писатели добавляют комментарии (с обновлением счетчиков и поискового
+индекса, как add_comment), читатели выбирают страницы постов.
+Для SQLite сравниваются журнал по умолчанию (DELETE) и режим WAL
+из SQLITE_PRAGMAS, для других СУБД (DATABASE_URL=postgres://...)
+измеряется одна конфигурация.
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .utils import percentile, setup_django, test_database
+
+# Настройки SQLite по умолчанию
+SQLITE_DEFAULT = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+class Stats:
+    """Время операций и количество ошибок из всех потоков."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {'write': [], 'read': []}
+        self.errors = 0
+
+    def add(self, kind, timing):
+        with self.lock:
+            self.timings[kind].append(timing)
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+    def summary(self, seconds):
+        result = {'errors': self.errors}
+        for kind, timings in self.timings.items():
+            result[f'{kind}s_per_second'] = round(len(timings) / seconds, 1)
+            if timings:
+                result[f'{kind}_p50_ms'] = round(
+                    percentile(timings, 50) * 1000, 3)
+                result[f'{kind}_p99_ms'] = round(
+                    percentile(timings, 99) * 1000, 3)
+        return result
+
+
+def worker(kind, operation, deadline, stats):
+    """Выполняет операцию до deadline, ошибки БД считаются отдельно."""
+    from django.db import DatabaseError, connection
+
+    number = 0
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                operation(number)
+            except DatabaseError:
+                stats.error()
+                continue
+            stats.add(kind, time.perf_counter() - started)
+            number += 1
+    finally:
+        connection.close()
+
+
+def workload(writers, readers, seconds):
+    """Запускает потоки писателей и читателей на seconds секунд."""
+    from posts.models import Comment, Post, User
+
+    author = User.objects.first()
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+
+    def write(number):
+        Comment.objects.create(post_id=post_ids[number % len(post_ids)],
+                               author=author, text=f'Комментарий {number}')
+
+    def read(number):
+        list(Post.objects.select_related('author', 'group')[:10])
+        list(Comment.objects.filter(
+            post_id=post_ids[number % len(post_ids)]
+        ).select_related('author')[:20])
+
+    stats = Stats()
+    deadline = time.monotonic() + seconds
+    threads = (
+        [threading.Thread(target=worker,
+                          args=('write', write, deadline, stats))
+         for _ in range(writers)]
+        + [threading.Thread(target=worker,
+                            args=('read', read, deadline, stats))
+           for _ in range(readers)]
+    )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.summary(seconds)
+
+
+def run(options):
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import override_settings
+
+    call_command('generate_data', '--users=100', '--posts=1000',
+                 '--comments=1000', '--images=0', stdout=io.StringIO())
+    if connection.vendor == 'sqlite':
+        modes = {'sqlite-delete': SQLITE_DEFAULT,
+                 'sqlite-wal': settings.SQLITE_PRAGMAS}
+    else:
+        modes = {connection.vendor: settings.SQLITE_PRAGMAS}
+
+    results = {}
+    for mode, pragmas in modes.items():
+        # Настройки применяются к новым соединениям
+        connection.close()
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            connection.ensure_connection()
+            results[mode] = workload(options.writers, options.readers,
+                                     options.seconds)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--output', help='Файл для результатов в JSON.')
+    options = parser.parse_args()
+
+    setup_django()
+    with tempfile.TemporaryDirectory() as directory, \
+            test_database(os.path.join(directory, 'db.sqlite3')):
+        results = run(options)
+
+    print(f'{"режим":<16}{"записей/с":>12}{"чтений/с":>12}'
+          f'{"p99 записи, мс":>16}{"ошибки":>8}')
+    for mode, result in results.items():
+        print(f'{mode:<16}{result["writes_per_second"]:>12.1f}'
+              f'{result["reads_per_second"]:>12.1f}'
+              f'{result.get("write_p99_ms", 0):>16.2f}'
+              f'{result["errors"]:>8}')
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Память при выгрузке постов и комментариев пользователя.
+
+    python -m benchmarks.export [--rows 1000 10000 50000]
+
+Выгрузка читается целиком, как ее читал бы клиент, а пиковый объем
+выделенной Python памяти (tracemalloc) сравнивается для разного
+количества строк: при потоковой выгрузке он не должен расти.
+"""
+import argparse
+import time
+import tracemalloc
+
+from .utils import setup_django, test_database
+
+
+def export_peak(user, export_format):
+    """Пиковая память (КиБ), размер выгрузки (КиБ) и время (с)."""
+    from posts.exports import export_response
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in
+               export_response(user, export_format).streaming_content)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024, size / 1024, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[1000, 10000, 50000])
+    options = parser.parse_args()
+
+    setup_django()
+    from posts.models import Post, User
+
+    print(f'{"строк":>8}{"формат":>8}{"выгрузка, КиБ":>16}'
+          f'{"пик памяти, КиБ":>18}{"время, с":>10}')
+    with test_database():
+        user = User.objects.create_user(username='bench')
+        created = 0
+        for rows in sorted(options.rows):
+            Post.objects.bulk_create(
+                Post(text=f'Пост {number} ' * 10, author=user)
+                for number in range(created, rows)
+            )
+            created = rows
+            for export_format in ('csv', 'jsonl'):
+                peak, size, elapsed = export_peak(user, export_format)
+                print(f'{rows:>8}{export_format:>8}{size:>16.0f}'
+                      f'{peak:>18.0f}{elapsed:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
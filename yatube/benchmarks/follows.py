@@ -0,0 +1,94 @@
+"""
+Время импорта подписок.
+
+    python -m benchmarks.follows [--follows 1000 10000]
+
+Сравниваются подписки по одной (get_or_create с сигналами, как
+в profile_follow) и пакетный импорт posts.follows.follow_pairs
+(bulk_create с ignore_conflicts, одна раскладка в ленты на пакет).
+У каждого автора есть посты, поэтому раскладка прежних постов в ленты
+тоже измеряется. Задачи выполняются сразу (TASKS_EAGER).
+"""
+import argparse
+import random
+import time
+
+from .utils import setup_django, test_database
+
+# Постов у каждого автора
+POSTS_PER_AUTHOR = 5
+
+
+def create_users(prefix, count):
+    from posts.counters import reconcile_user_stats
+    from posts.models import Post, User
+
+    User.objects.bulk_create(
+        User(username=f'{prefix}{number}') for number in range(count)
+    )
+    users = list(User.objects.filter(
+        username__startswith=prefix
+    ).values_list('pk', flat=True))
+    reconcile_user_stats()
+    Post.objects.bulk_create(
+        Post(text=f'Пост {number}', author_id=author_id)
+        for author_id in users for number in range(POSTS_PER_AUTHOR)
+    )
+    return users
+
+
+def follow_one_by_one(pairs):
+    from posts.models import Follow
+
+    for user_id, author_id in pairs:
+        Follow.objects.get_or_create(user_id=user_id, author_id=author_id)
+
+
+def follow_in_batches(pairs):
+    from posts.follows import follow_pairs
+
+    follow_pairs(pairs)
+
+
+def run(prefix, count, follow):
+    from django.test import override_settings
+
+    from posts.models import FeedItem, Follow
+
+    rng = random.Random(count)
+    # Пользователей столько, чтобы у каждого было около 20 подписок
+    users = create_users(prefix, max(50, count // 20))
+    pairs = set()
+    while len(pairs) < count:
+        user_id, author_id = rng.sample(users, 2)
+        pairs.add((user_id, author_id))
+    with override_settings(TASKS_EAGER=True):
+        started = time.perf_counter()
+        follow(list(pairs))
+        elapsed = time.perf_counter() - started
+    return (elapsed, Follow.objects.filter(user_id__in=users).count(),
+            FeedItem.objects.filter(user_id__in=users).count())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--follows', type=int, nargs='+',
+                        default=[1000, 10000])
+    options = parser.parse_args()
+
+    setup_django()
+    print(f'{"подписок":>10}{"способ":>12}{"время, с":>10}'
+          f'{"записей ленты":>15}')
+    with test_database():
+        for count in options.follows:
+            for mode, follow in (('по одной', follow_one_by_one),
+                                 ('пакетами', follow_in_batches)):
+                elapsed, follows, items = run(
+                    f'{follow.__name__}{count}_', count, follow
+                )
+                print(f'{follows:>10}{mode:>12}{elapsed:>10.2f}'
+                      f'{items:>15}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Нагрузочный тест основных страниц на синтетических данных.
+
+    python -m benchmarks.load [--output results.json] [--requests 200]
+                              [--concurrency 8] [--driver client|wsgi]
+
+Данные создаются командой generate_data (параметры --users, --posts
+и другие передаются ей). Для каждого сценария измеряются задержки
+(p50, p99) и пропускная способность:
+    client — последовательные запросы через django.test.Client;
+    wsgi   — одновременные HTTP-запросы к WSGI-серверу в том же процессе.
+Результаты сохраняются в JSON, а benchmarks.compare сравнивает два
+таких файла.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from .utils import percentile, setup_django, test_database
+
+SCENARIOS = ('index', 'group_posts', 'profile', 'post_detail',
+             'follow_index', 'post_create')
+# Количество пользователей, от имени которых идут запросы с авторизацией
+SESSIONS = 20
+
+
+class Targets:
+    """Случайные адреса сценариев по созданным данным."""
+
+    def __init__(self, seed):
+        from posts.models import Follow, Group, Post, User
+
+        self.rng = random.Random(seed)
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        self.usernames = list(User.objects.values_list('username',
+                                                       flat=True))
+        self.post_ids = list(Post.objects.values_list('pk', flat=True))
+        # Запросы с авторизацией — от пользователей с подписками
+        self.readers = list(User.objects.filter(
+            pk__in=Follow.objects.values('user')
+        ).order_by('pk')[:SESSIONS])
+
+    def request(self, scenario):
+        """Метод, адрес и данные формы запроса сценария."""
+        from django.urls import reverse
+
+        choice = self.rng.choice
+        if scenario == 'index':
+            return 'GET', reverse('posts:index'), None
+        if scenario == 'group_posts':
+            return 'GET', reverse('posts:group_list',
+                                  args=[choice(self.groups)]), None
+        if scenario == 'profile':
+            return 'GET', reverse('posts:profile',
+                                  args=[choice(self.usernames)]), None
+        if scenario == 'post_detail':
+            return 'GET', reverse('posts:post_detail',
+                                  args=[choice(self.post_ids)]), None
+        if scenario == 'follow_index':
+            return 'GET', reverse('posts:follow_index'), None
+        return 'POST', reverse('posts:post_create'), {
+            'text': f'Нагрузочный пост {self.rng.random()}',
+            'group': '',
+        }
+
+
+def summarize(timings, errors, elapsed):
+    """Сводка сценария: задержки в миллисекундах и запросы в секунду."""
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'rps': round(len(timings) / elapsed, 1),
+    }
+
+
+def run_client(targets, requests):
+    """Последовательные запросы через тестовый клиент Django."""
+    from django.test import Client
+
+    clients = []
+    for reader in targets.readers:
+        client = Client()
+        client.force_login(reader)
+        clients.append(client)
+
+    results = {}
+    for scenario in SCENARIOS:
+        timings = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            method, path, data = targets.request(scenario)
+            client = targets.rng.choice(clients)
+            request_started = time.perf_counter()
+            if method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.post(path, data)
+            timings.append(time.perf_counter() - request_started)
+            errors += response.status_code >= 400
+        results[scenario] = summarize(timings, errors,
+                                      time.perf_counter() - started)
+    return results
+
+
+class Session:
+    """Cookie пользователя для запросов к WSGI-серверу."""
+
+    def __init__(self, port, user):
+        from django.test import Client
+
+        client = Client()
+        client.force_login(user)
+        self.port = port
+        self.cookies = {'sessionid': client.cookies['sessionid'].value}
+        # Токен CSRF выдается вместе со страницей с формой
+        self.request('GET', '/create/')
+
+    def request(self, method, path, data=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        headers = {'Cookie': '; '.join(
+            f'{name}={value}' for name, value in self.cookies.items()
+        )}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            for header in response.headers.get_all('Set-Cookie') or []:
+                for name, morsel in SimpleCookie(header).items():
+                    self.cookies[name] = morsel.value
+            return response.status
+        finally:
+            connection.close()
+
+
+def start_server():
+    """Запускает многопоточный WSGI-сервер на свободном порту."""
+    from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                              WSGIRequestHandler)
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_wsgi(targets, requests, concurrency):
+    """Одновременные HTTP-запросы к WSGI-серверу."""
+    server = start_server()
+    port = server.server_address[1]
+    sessions = [Session(port, reader) for reader in targets.readers]
+
+    def send(request):
+        session, (method, path, data) = request
+        started = time.perf_counter()
+        status = session.request(method, path, data)
+        return time.perf_counter() - started, status >= 400
+
+    results = {}
+    try:
+        for scenario in SCENARIOS:
+            batch = [(targets.rng.choice(sessions), targets.request(scenario))
+                     for _ in range(requests)]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as executor:
+                measured = list(executor.map(send, batch))
+            results[scenario] = summarize(
+                [timing for timing, _ in measured],
+                sum(error for _, error in measured),
+                time.perf_counter() - started
+            )
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options, data_options):
+    import django
+    from django.core.management import call_command
+    from django.db import connection
+    from django.utils import timezone
+
+    call_command('generate_data', *data_options, stdout=io.StringIO())
+    targets = Targets(options.seed)
+    report = {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'data': data_options,
+            'requests': options.requests,
+            'concurrency': options.concurrency,
+        },
+        'results': {},
+    }
+    if options.driver in ('client', 'all'):
+        report['results']['client'] = run_client(targets, options.requests)
+    if options.driver in ('wsgi', 'all'):
+        report['results']['wsgi'] = run_wsgi(targets, options.requests,
+                                             options.concurrency)
+    return report
+
+
+def print_report(report):
+    print(f'{"драйвер":<8}{"сценарий":<14}{"p50, мс":>10}{"p99, мс":>10}'
+          f'{"запр./с":>10}{"ошибки":>8}')
+    for driver, scenarios in report['results'].items():
+        for scenario, result in scenarios.items():
+            print(f'{driver:<8}{scenario:<14}{result["p50_ms"]:>10.2f}'
+                  f'{result["p99_ms"]:>10.2f}{result["rps"]:>10.1f}'
+                  f'{result["errors"]:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--output', help='Файл для результатов в JSON.')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Количество запросов в каждом сценарии.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--driver', choices=('client', 'wsgi', 'all'),
+                        default='all')
+    parser.add_argument('--seed', type=int, default=0)
+    options, data_options = parser.parse_known_args()
+    data_options += ['--seed', str(options.seed)]
+
+    setup_django()
+    from django.test import override_settings
+
+    # Изображения и база данных SQLite создаются во временной папке
+    with tempfile.TemporaryDirectory() as media_root, \
+            override_settings(MEDIA_ROOT=media_root), \
+            test_database(os.path.join(media_root, 'db.sqlite3')):
+        report = run(options, data_options)
+    print_report(report)
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Сравнение OFFSET-паджинации и паджинации по курсору.
+
+    python -m benchmarks.pagination [количество постов]
+
+Для OFFSET время выборки растет с номером страницы,
+для курсора остается постоянным.
+"""
+import sys
+
+from .utils import measure, setup_django, test_database
+
+PAGES = (1, 10, 100, 1000)
+
+
+def run(count_posts):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test import RequestFactory
+
+    from core.paginator import encode_cursor, NEXT
+    from core.utils import get_pages
+    from posts.models import Post
+
+    per_page = settings.COUNT_PAGES_PAGINATOR
+    author = get_user_model().objects.create_user(username='bench')
+    Post.objects.bulk_create(
+        Post(text=f'Пост {i}', author=author) for i in range(count_posts)
+    )
+    posts = Post.objects.select_related('author', 'group')
+    factory = RequestFactory()
+
+    print(f'{"страница":>10}{"OFFSET, мс":>14}{"курсор, мс":>14}')
+    for number in PAGES:
+        if (number - 1) * per_page >= count_posts:
+            break
+        offset_request = factory.get('/', {'page': number})
+        params = {}
+        if number > 1:
+            # Курсор указывает на последний пост предыдущей страницы
+            last = posts.order_by('-created', '-id')[
+                (number - 1) * per_page - 1]
+            params['cursor'] = encode_cursor(NEXT, [last.created, last.id])
+        cursor_request = factory.get('/', params)
+
+        offset_ms = measure(
+            lambda: list(get_pages(offset_request, posts))
+        )
+        cursor_ms = measure(
+            lambda: list(get_pages(cursor_request, posts))
+        )
+        print(f'{number:>10}{offset_ms:>14.2f}{cursor_ms:>14.2f}')
+
+
+if __name__ == '__main__':
+    setup_django()
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
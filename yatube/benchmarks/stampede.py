@@ -0,0 +1,73 @@
+"""
+Нагрузка на базу данных при одновременном промахе кеша главной страницы.
+
+    python -m benchmarks.stampede [количество одновременных запросов]
+
+После изменения поста кеш главной страницы устаревает, и все
+одновременные запросы к ней промахиваются. Без защиты от пересчета
+каждый из них отрисовывает страницу заново, с защитой — только один.
+"""
+import sys
+import threading
+
+from .utils import setup_django, test_database
+
+
+def burst(client_count):
+    """
+    Выполняет одновременные запросы к главной странице после изменения
+    поста. Возвращает количество запросов к базе данных.
+    """
+    from django.db import connection
+    from django.test import Client
+
+    from posts.models import Post
+
+    post = Post.objects.first()
+    post.save()
+    queries = []
+    barrier = threading.Barrier(client_count)
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def request():
+        client = Client()
+        with connection.execute_wrapper(count_query):
+            barrier.wait()
+            client.get('/')
+        connection.close()
+
+    threads = [threading.Thread(target=request) for _ in range(client_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(queries)
+
+
+def run(client_count):
+    from django.contrib.auth import get_user_model
+    from django.test import Client, override_settings
+
+    from posts.models import Post
+
+    author = get_user_model().objects.create_user(username='bench')
+    Post.objects.bulk_create(
+        Post(text=f'Пост {i}', author=author) for i in range(100)
+    )
+    # Прогрев: предыдущая копия страницы уже есть в кеше
+    Client().get('/')
+
+    print(f'{"защита":>10}{"запросов к БД":>16}')
+    for single_flight in (False, True):
+        with override_settings(CACHE_SINGLE_FLIGHT=single_flight):
+            queries = burst(client_count)
+        print(f'{"да" if single_flight else "нет":>10}{queries:>16}')
+
+
+if __name__ == '__main__':
+    setup_django()
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
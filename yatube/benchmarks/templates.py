@@ -0,0 +1,153 @@
+"""
+Время отрисовки главной страницы с 10 постами.
+
+    python -m benchmarks.templates [--repeat 50]
+
+Сравниваются загрузчики шаблонов:
+    uncached — шаблоны читаются и компилируются при каждой отрисовке,
+               как при DEBUG;
+    cold     — кеширующий загрузчик сразу после запуска процесса,
+               первая отрисовка;
+    warm     — кеширующий загрузчик после warm_up_templates.
+Кеш карточек постов очищается перед каждой отрисовкой, иначе карточки
+не отрисовываются. Отдельно сравниваются карточки, подключенные
+через {% include %}, и тот же шаблон, встроенный в цикл.
+"""
+import argparse
+import statistics
+import time
+
+from .utils import setup_django, test_database
+
+CARD_LOOP = ("{% for post in posts %}"
+             "{% include 'posts/includes/post_list.html' %}"
+             "{% endfor %}")
+IMAGE_INCLUDE = "{% include 'posts/includes/post_image.html' %}"
+
+
+def templates_setting(cached):
+    """Настройка TEMPLATES с кеширующим загрузчиком или без него."""
+    from django.conf import settings
+
+    loaders = settings.TEMPLATE_LOADERS
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    backend = settings.TEMPLATES[0]
+    return [dict(backend,
+                 OPTIONS=dict(backend['OPTIONS'], loaders=loaders))]
+
+
+def timed(render, prepare, repeat):
+    """Медианное время render в миллисекундах, prepare не измеряется."""
+    timings = []
+    for _ in range(repeat):
+        prepare()
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def reset_loaders():
+    from django.template import engines
+
+    for engine in engines.all():
+        for loader in engine.engine.template_loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+
+
+def create_page():
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    from core.utils import get_pages
+    from posts.models import Group, Post, User
+
+    author = User.objects.create_user(username='bench', first_name='Автор')
+    group = Group.objects.create(title='Группа', slug='bench',
+                                 description='Описание')
+    Post.objects.bulk_create(
+        Post(text=f'Пост {number} ' * 20, author=author, group=group)
+        for number in range(10)
+    )
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    page_obj = get_pages(request,
+                         Post.objects.select_related('author', 'group'))
+    # Посты выбираются до измерений
+    page_obj.object_list = list(page_obj.object_list)
+    return request, page_obj
+
+
+def run_loaders(request, page_obj, repeat):
+    from django.core.cache import cache
+    from django.template.loader import render_to_string
+    from django.test import override_settings
+
+    from core.template_backends import warm_up_templates
+
+    def render():
+        render_to_string('posts/index.html', {'page_obj': page_obj},
+                         request)
+
+    def cold():
+        reset_loaders()
+        cache.clear()
+
+    results = {}
+    with override_settings(TEMPLATES=templates_setting(cached=False)):
+        results['uncached'] = timed(render, cache.clear, repeat)
+    with override_settings(TEMPLATES=templates_setting(cached=True)):
+        results['cold'] = timed(render, cold, repeat)
+        reset_loaders()
+        warm_up_templates()
+        results['warm'] = timed(render, cache.clear, repeat)
+        results['warm, карточки из кеша'] = timed(
+            render, lambda: None, repeat
+        )
+    return results
+
+
+def run_includes(page_obj, repeat):
+    from django.template import Context, engines
+    from django.test import override_settings
+
+    with override_settings(TEMPLATES=templates_setting(cached=True)):
+        engine = engines.all()[0].engine
+        card = engine.get_template('posts/includes/post_list.html')
+        image = engine.get_template('posts/includes/post_image.html')
+        inline = card.source.replace(IMAGE_INCLUDE, image.source)
+        templates = {
+            'include': engine.from_string(CARD_LOOP),
+            'inline': engine.from_string(
+                '{% for post in posts %}' + inline + '{% endfor %}'
+            ),
+        }
+        context = {'posts': page_obj.object_list}
+        return {name: timed(lambda: template.render(Context(context)),
+                            lambda: None, repeat)
+                for name, template in templates.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=50)
+    options = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        request, page_obj = create_page()
+        loaders = run_loaders(request, page_obj, options.repeat)
+        includes = run_includes(page_obj, options.repeat)
+
+    print(f'{"загрузчик":<26}{"отрисовка, мс":>14}')
+    for mode, ms in loaders.items():
+        print(f'{mode:<26}{ms:>14.2f}')
+    print(f'\n{"10 карточек":<26}{"отрисовка, мс":>14}')
+    for mode, ms in includes.items():
+        print(f'{mode:<26}{ms:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
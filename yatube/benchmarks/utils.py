@@ -0,0 +1,51 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Настраивает Django для запуска бенчмарка вне manage.py."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(sqlite_file=None):
+    """
+    Создает временную базу данных и удаляет ее после бенчмарка.
+    sqlite_file — файл для SQLite вместо базы в памяти: с ней
+    одновременные записи из разных потоков завершаются ошибкой
+    блокировки, а не ожиданием.
+    """
+    from django.db import connection
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+
+    if sqlite_file and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = sqlite_file
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=20):
+    """Возвращает медианное время выполнения func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def percentile(values, q):
+    """Значение, не меньше которого q процентов значений (nearest rank)."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
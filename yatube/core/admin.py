@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'args',
+        'run_at',
+        'attempts',
+        'failed',
+    )
+    search_fields = ('name',)
+    list_filter = ('failed', 'name')
+
+
+admin.site.register(Task, TaskAdmin)
@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .checks import check_shared_cache
+        from .db import configure_sqlite
+
+        connection_created.connect(configure_sqlite)
+        checks.register(check_shared_cache, checks.Tags.caches)
@@ -0,0 +1,211 @@
+import hashlib
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.db import transaction
+
+from . import metrics
+
+
+class CacheStats:
+    """Счетчики попаданий и промахов кеша в текущем процессе."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Запросы, для которых кеш не используется
+        self.bypasses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+        metrics.count_cache(hit=True)
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+        metrics.count_cache(hit=False)
+
+    def bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypasses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+        }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def cache_stats(name):
+    """Возвращает счетчики кеша с указанным именем."""
+    with _stats_lock:
+        return _stats.setdefault(name, CacheStats())
+
+
+def all_cache_stats():
+    return {name: stats.as_dict() for name, stats in _stats.items()}
+
+
+def generation_cache():
+    """
+    Кеш для номеров поколений.
+    Поколения читаются из общего кеша напрямую, минуя локальную копию
+    процесса: иначе процессы видели бы изменения данных с задержкой.
+    """
+    if 'shared' in settings.CACHES:
+        return caches['shared']
+    return caches[DEFAULT_CACHE_ALIAS]
+
+
+def _generation_key(name, prefix='generation'):
+    # Имя может содержать адрес группы или имя пользователя, поэтому
+    # в ключ попадает его хеш: так ключ допустим для любого бэкенда
+    return f'{prefix}:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def _initial_generation():
+    # Начальное значение зависит от времени, чтобы после очистки кеша
+    # поколения не совпали с уже использованными ранее
+    return time.time_ns() // 1000
+
+
+def get_generations(names):
+    """
+    Возвращает текущие номера поколений данных.
+    Поколение меняется при каждом изменении соответствующих данных,
+    поэтому ключи кеша, содержащие его, устаревают сами.
+    """
+    cache = generation_cache()
+    keys = [_generation_key(name) for name in names]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def get_last_modified(names):
+    """
+    Время (timestamp) последнего изменения данных с указанными
+    поколениями. Если время неизвестно, например после очистки кеша,
+    данные считаются измененными сейчас.
+    """
+    cache = generation_cache()
+    keys = [_generation_key(name, 'modified') for name in names]
+    modified = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in modified:
+            cache.add(key, now, None)
+            modified[key] = cache.get(key, now)
+    return max(modified.values(), default=now)
+
+
+def bump_generations(*names):
+    """
+    Отмечает изменение данных: кеш, зависящий от них, устаревает.
+
+    Внутри транзакции номера увеличиваются сразу и еще раз после
+    коммита: запрос, прочитавший данные до коммита, мог сохранить
+    их старую копию под новыми номерами поколений, и второе увеличение
+    ее отбрасывает. Первое нужно, чтобы изменения видел код в той же
+    транзакции, в том числе тесты, транзакция которых не завершается.
+    """
+    _bump_generations(names)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump_generations(names))
+
+
+def _bump_generations(names):
+    cache = generation_cache()
+    for name in set(names):
+        key = _generation_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+    now = time.time()
+    cache.set_many({_generation_key(name, 'modified'): now
+                    for name in names}, None)
+
+
+def _always(value):
+    return True
+
+
+def single_flight(key, compute, timeout, stale_key=None,
+                  cacheable=_always, stats=None, using=None, version=None):
+    """
+    Возвращает значение из кеша или вычисляет его (защита от cache
+    stampede). Единственная реализация защиты в проекте: ее использует
+    и TieredCache.get_or_set.
+
+    При промахе значение вычисляет только запрос, взявший блокировку
+    на CACHE_LOCK_TIMEOUT, а одновременные запросы с тем же ключом
+    получают устаревшую копию из stale_key, если она есть, или ждут
+    результата не дольше CACHE_WAIT_TIMEOUT, после чего вычисляют
+    значение сами.
+    stale_key — ключ без номеров поколений: по нему хранится последняя
+    вычисленная копия значения.
+    cacheable(value) решает, можно ли сохранить результат.
+    timeout может быть функцией timeout(value), если время хранения
+    зависит от вычисленного значения.
+    using — кеш, по умолчанию default; version — версия ключей в нем.
+    """
+    using = cache if using is None else using
+    value = using.get(key, version=version)
+    if value is not None:
+        if stats:
+            stats.hit()
+        return value
+    if stats:
+        stats.miss()
+    store = partial(_compute, using, version, key, compute, timeout,
+                    stale_key, cacheable)
+    if not settings.CACHE_SINGLE_FLIGHT:
+        return store()
+
+    lock = f'lock:{key}'
+    if not using.add(lock, 1, settings.CACHE_LOCK_TIMEOUT, version=version):
+        # Значение уже вычисляет другой запрос
+        value = _wait_for(using, version, key, stale_key)
+        return compute() if value is None else value
+    try:
+        return store()
+    finally:
+        using.delete(lock, version=version)
+
+
+def _wait_for(using, version, key, stale_key):
+    """Предыдущая копия значения или значение, вычисленное при ожидании."""
+    value = using.get(stale_key, version=version) if stale_key else None
+    deadline = time.monotonic() + settings.CACHE_WAIT_TIMEOUT
+    while value is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+        value = using.get(key, version=version)
+    return value
+
+
+def _compute(using, version, key, compute, timeout, stale_key, cacheable):
+    value = compute()
+    if cacheable(value):
+        values = {key: value}
+        if stale_key:
+            values[stale_key] = value
+        using.set_many(values,
+                       timeout(value) if callable(timeout) else timeout,
+                       version=version)
+    return value
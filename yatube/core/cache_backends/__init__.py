@@ -0,0 +1,9 @@
+"""
+Бэкенды кеша для нескольких процессов приложения.
+
+redis.RedisCache — общий кеш по протоколу Redis (RESP) с пулом соединений.
+tiered.TieredCache — двухуровневый кеш: локальный в процессе (L1)
+поверх общего (L2) с защитой от одновременного пересчета значений.
+fake_server.FakeRedisServer — локальный сервер с подмножеством команд
+Redis для тестов и разработки без внешних сервисов.
+"""
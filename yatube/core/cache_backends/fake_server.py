@@ -0,0 +1,183 @@
+"""
+Локальный сервер с подмножеством команд Redis.
+
+Нужен для тестов и разработки без внешних сервисов:
+
+    server = FakeRedisServer().start()
+    CACHES['shared']['LOCATION'] = server.url
+    ...
+    server.stop()
+"""
+import socketserver
+import threading
+import time
+from collections import Counter
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        db = 0
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].decode().upper()
+            if name == 'SELECT':
+                db = int(args[1])
+                reply = 'OK'
+            else:
+                reply = self.server.storage.execute(db, name, args[1:])
+            self.wfile.write(_encode(reply))
+
+
+def _encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Exception):
+        return b'-ERR %s\r\n' % str(reply).encode()
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, bool) or isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(map(_encode, reply))
+
+
+class _Storage:
+    """Данные сервера: {номер базы: {ключ: (значение, срок или None)}}."""
+
+    def __init__(self):
+        self.databases = {}
+        self.commands = Counter()
+        self.lock = threading.Lock()
+
+    def execute(self, db, name, args):
+        handler = getattr(self, f'cmd_{name.lower()}', None)
+        if handler is None:
+            return ValueError(f"unknown command '{name}'")
+        with self.lock:
+            self.commands[name] += 1
+            try:
+                return handler(self.databases.setdefault(db, {}), *args)
+            except (TypeError, ValueError) as error:
+                return ValueError(str(error) or 'syntax error')
+
+    @staticmethod
+    def _get(data, key):
+        value, expires = data.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del data[key]
+            return None
+        return value
+
+    def cmd_ping(self, data):
+        return 'PONG'
+
+    def cmd_get(self, data, key):
+        return self._get(data, key)
+
+    def cmd_mget(self, data, *keys):
+        return [self._get(data, key) for key in keys]
+
+    def cmd_set(self, data, key, value, *options):
+        options = [option.upper() for option in options]
+        expires = None
+        if b'EX' in options:
+            expires = time.monotonic() + int(
+                options[options.index(b'EX') + 1]
+            )
+        if b'PX' in options:
+            expires = time.monotonic() + int(
+                options[options.index(b'PX') + 1]
+            ) / 1000
+        exists = self._get(data, key) is not None
+        if b'NX' in options and exists or b'XX' in options and not exists:
+            return None
+        data[key] = (value, expires)
+        return 'OK'
+
+    def cmd_del(self, data, *keys):
+        return sum(data.pop(key, None) is not None for key in keys)
+
+    def cmd_exists(self, data, *keys):
+        return sum(self._get(data, key) is not None for key in keys)
+
+    def cmd_incrby(self, data, key, delta):
+        value = int(self._get(data, key) or 0) + int(delta)
+        data[key] = (str(value).encode(), data.get(key, (None, None))[1])
+        return value
+
+    def cmd_pexpire(self, data, key, milliseconds):
+        if self._get(data, key) is None:
+            return 0
+        data[key] = (data[key][0], time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def cmd_expire(self, data, key, seconds):
+        return self.cmd_pexpire(data, key, int(seconds) * 1000)
+
+    def cmd_persist(self, data, key):
+        if self._get(data, key) is None or data[key][1] is None:
+            return 0
+        data[key] = (data[key][0], None)
+        return 1
+
+    def cmd_ttl(self, data, key):
+        if self._get(data, key) is None:
+            return -2
+        expires = data[key][1]
+        if expires is None:
+            return -1
+        return round(expires - time.monotonic())
+
+    def cmd_flushdb(self, data):
+        data.clear()
+        return 'OK'
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeRedisServer:
+    """Сервер в отдельном потоке; порт выбирается свободный."""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self._server = _Server((host, port), _Handler)
+        self._server.storage = _Storage()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'redis://{host}:{port}/0'
+
+    @property
+    def commands(self):
+        """Счетчик выполненных команд: {имя команды: количество}."""
+        return self._server.storage.commands
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
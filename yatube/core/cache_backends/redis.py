@@ -0,0 +1,145 @@
+import pickle
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .resp import ConnectionPool
+
+# Пулы соединений общие для всех экземпляров бэкенда в процессе:
+# Django создает экземпляр кеша на каждый поток
+_pools = {}
+
+
+class RedisCache(BaseCache):
+    """
+    Кеш на сервере с протоколом Redis.
+
+    Целые числа хранятся как есть, чтобы incr выполнялся на сервере
+    атомарно (INCRBY), остальные значения сериализуются pickle.
+
+    Настройки:
+        LOCATION — адрес вида redis://host:port/db
+        OPTIONS['MAX_CONNECTIONS'] — размер пула соединений процесса
+        OPTIONS['SOCKET_TIMEOUT'] — таймаут сетевых операций, секунд
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        key = (server, options.get('MAX_CONNECTIONS', 50))
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                server,
+                max_connections=options.get('MAX_CONNECTIONS', 50),
+                timeout=options.get('SOCKET_TIMEOUT', 5),
+            )
+        self._pool = _pools[key]
+
+    def _expiry_args(self, timeout):
+        """Аргументы SET для времени жизни; None — значение вечное."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return []
+        return ['PX', max(int(timeout * 1000), 1)]
+
+    @staticmethod
+    def _is_expired(timeout):
+        return timeout is not None and timeout != DEFAULT_TIMEOUT and (
+            timeout <= 0
+        )
+
+    @staticmethod
+    def _dumps(value):
+        if type(value) is int:
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(data):
+        if data is None:
+            return None
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self._is_expired(timeout):
+            return False
+        key = self._key(key, version)
+        return self._pool.execute(
+            'SET', key, self._dumps(value), 'NX', *self._expiry_args(timeout)
+        ) is not None
+
+    def get(self, key, default=None, version=None):
+        value = self._loads(self._pool.execute('GET', self._key(key, version)))
+        return default if value is None else value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if self._is_expired(timeout):
+            self._pool.execute('DEL', key)
+            return
+        self._pool.execute('SET', key, self._dumps(value),
+                           *self._expiry_args(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if self._is_expired(timeout):
+            return bool(self._pool.execute('DEL', key))
+        expiry = self._expiry_args(timeout)
+        if not expiry:
+            return bool(self._pool.execute('EXISTS', key)) and (
+                self._pool.execute('PERSIST', key) is not None
+            )
+        return bool(self._pool.execute('PEXPIRE', key, expiry[1]))
+
+    def delete(self, key, version=None):
+        self._pool.execute('DEL', self._key(key, version))
+
+    def has_key(self, key, version=None):
+        return bool(self._pool.execute('EXISTS', self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        if not self._pool.execute('EXISTS', key):
+            raise ValueError(f"Key '{key}' not found")
+        return self._pool.execute('INCRBY', key, delta)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._pool.execute(
+            'MGET', *(self._key(key, version) for key in keys)
+        )
+        return {key: self._loads(value)
+                for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if self._is_expired(timeout):
+            self.delete_many(data, version=version)
+            return []
+        expiry = self._expiry_args(timeout)
+        self._pool.pipeline([
+            ('SET', self._key(key, version), self._dumps(value), *expiry)
+            for key, value in data.items()
+        ])
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._pool.execute('DEL', *keys)
+
+    def clear(self):
+        self._pool.execute('FLUSHDB')
+
+    def close(self, **kwargs):
+        # Соединения остаются в пуле для следующих запросов
+        pass
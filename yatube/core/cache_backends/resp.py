@@ -0,0 +1,131 @@
+"""Минимальный клиент протокола Redis (RESP) с пулом соединений."""
+import queue
+import socket
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class RedisError(Exception):
+    """Ошибка, которую вернул сервер."""
+
+
+def encode_command(*args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+class Connection:
+    def __init__(self, host, port, db=0, timeout=None):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    def send(self, *commands):
+        self._sock.sendall(b''.join(
+            encode_command(*command) for command in commands
+        ))
+
+    def read_response(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('Соединение с сервером кеша закрыто')
+        kind, data = line[:1], line[1:-2]
+        if kind == b'+':
+            return data.decode()
+        if kind == b'-':
+            raise RedisError(data.decode())
+        if kind == b':':
+            return int(data)
+        if kind == b'$':
+            length = int(data)
+            if length == -1:
+                return None
+            value = self._file.read(length + 2)
+            return value[:-2]
+        if kind == b'*':
+            length = int(data)
+            if length == -1:
+                return None
+            return [self.read_response() for _ in range(length)]
+        raise RedisError(f'Неизвестный ответ сервера: {line!r}')
+
+    def execute(self, *args):
+        self.send(args)
+        return self.read_response()
+
+    def pipeline(self, commands):
+        """Отправляет команды одним пакетом и читает все ответы."""
+        self.send(*commands)
+        return [self.read_response() for _ in commands]
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+
+class ConnectionPool:
+    """
+    Пул соединений, общий для потоков процесса.
+
+    Соединение берется из пула на время одной команды (или пакета
+    команд) и возвращается обратно. Соединение, на котором произошла
+    сетевая или любая другая ошибка, кроме ошибки самой команды,
+    закрывается и в пул не возвращается.
+    """
+
+    def __init__(self, url, max_connections=50, timeout=None):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = queue.Queue()
+        for _ in range(max_connections):
+            self._slots.put(None)
+
+    @contextmanager
+    def connection(self):
+        # Ограничение числа одновременно открытых соединений
+        self._slots.get(timeout=self.timeout)
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = Connection(self.host, self.port, self.db,
+                                  self.timeout)
+            try:
+                yield conn
+            except RedisError:
+                # Ошибка команды не портит соединение
+                self._idle.put(conn)
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.put(None)
+
+    def execute(self, *args):
+        with self.connection() as conn:
+            return conn.execute(*args)
+
+    def pipeline(self, commands):
+        with self.connection() as conn:
+            return conn.pipeline(commands)
+
+    def disconnect(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
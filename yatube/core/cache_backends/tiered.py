@@ -0,0 +1,148 @@
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from ..cache import single_flight
+
+# Признак «значения нет», отличающийся от сохраненного None
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """
+    Двухуровневый кеш: локальная память процесса (L1) поверх общего
+    кеша (L2), который видят все процессы приложения.
+
+    Значение из L2 запоминается в L1 на короткое время L1_TIMEOUT,
+    поэтому частые чтения одного ключа не ходят по сети, а изменения
+    из других процессов становятся видны не позже чем через L1_TIMEOUT.
+    Запись и удаление выполняются на обоих уровнях.
+
+    get_or_set защищен от одновременного пересчета (cache stampede)
+    общей для проекта функцией core.cache.single_flight: значение
+    вычисляет один процесс, взявший блокировку в L2, остальные ждут его
+    результата не дольше CACHE_WAIT_TIMEOUT.
+
+    Настройки OPTIONS:
+        L2 — псевдоним общего кеша из settings.CACHES
+        L1_TIMEOUT — время жизни значения в L1, секунд
+        L1_MAX_ENTRIES — максимальное число значений в L1
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__(params)
+        self._l2_alias = options['L2']
+        self.l1_timeout = options.get('L1_TIMEOUT', 2)
+        self.l1 = LocMemCache(location or 'tiered', {
+            'TIMEOUT': self.l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _key(self, key, version):
+        # Ключи уровней совпадают: префикс и версия применяются здесь
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _l1_timeout(self, timeout):
+        """L1 не должен хранить значение дольше, чем L2."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.l1.set(key, value, self._l1_timeout(timeout), version=0)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        added = self.l2.add(key, value, timeout, version=0)
+        if added:
+            self._remember(key, value, timeout)
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        value = self.l1.get(key, _MISSING, version=0)
+        if value is _MISSING:
+            value = self.l2.get(key, _MISSING, version=0)
+            if value is _MISSING:
+                return default
+            self._remember(key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        self.l2.set(key, value, timeout, version=0)
+        self._remember(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        self.l1.delete(key, version=0)
+        return self.l2.touch(key, timeout, version=0)
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self.l1.delete(key, version=0)
+        self.l2.delete(key, version=0)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return (self.l1.has_key(key, version=0)
+                or self.l2.has_key(key, version=0))
+
+    def incr(self, key, delta=1, version=None):
+        # Счетчики всегда читаются из L2, иначе процессы разойдутся
+        key = self._key(key, version)
+        self.l1.delete(key, version=0)
+        return self.l2.incr(key, delta, version=0)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self.l1.get_many(keys, version=0)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.l2.get_many(missing, version=0)
+            for key, value in shared.items():
+                self._remember(key, value)
+            found.update(shared)
+        return {keys[key]: value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        data = {self._key(key, version): value for key, value in data.items()}
+        self.l2.set_many(data, timeout, version=0)
+        self.l1.set_many(data, self._l1_timeout(timeout), version=0)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        self.l1.delete_many(keys, version=0)
+        self.l2.delete_many(keys, version=0)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """Возвращает значение из кеша или вычисляет его (single_flight)."""
+        return single_flight(
+            key, default if callable(default) else lambda: default,
+            timeout, using=self, version=version
+        )
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Без TASKS_EAGER задачи выполняет отдельный процесс run_tasks.
+    Поколения страниц, которые он увеличивает, и записи хранилища
+    миниатюр должны попадать в кеш, общий с веб-процессами: иначе
+    те продолжают отдавать закешированные страницы, ответы 304
+    и заглушки вместо готовых миниатюр.
+    """
+    if settings.TASKS_EAGER or settings.CACHE_URL:
+        return []
+    return [Error(
+        'Фоновые задачи выполняются отдельно (TASKS_EAGER=False), '
+        'а кеш свой у каждого процесса.',
+        hint='Задайте CACHE_URL общего кеша (Redis или memcached) '
+             'или TASKS_EAGER=True.',
+        id='core.E001',
+    )]
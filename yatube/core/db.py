@@ -0,0 +1,156 @@
+"""
+Базы данных: реплики для чтения и настройка SQLite.
+
+Представления, которые только читают данные, отмечаются декоратором
+read_only: запросы на чтение внутри них ReplicaRouter направляет
+в случайную реплику из DATABASE_REPLICAS. Остальные запросы, в том
+числе чтение в представлениях, которые что-то записывают, идут
+в основную базу.
+
+Реплики отстают от основной базы, поэтому пользователь, который
+только что что-то записал, еще DATABASE_REPLICA_LAG секунд читает
+все из основной базы и сразу видит свои изменения (read-your-writes).
+Срок хранится в cookie, которую ставит PrimaryStickinessMiddleware.
+
+Потоковый ответ читает базу, пока отправляется, и все это время
+маршрутизируется так же, как в представлении, которое его вернуло.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+from .streaming import around_stream
+
+# Cookie со временем, до которого запросы пользователя читают
+# основную базу
+STICKY_COOKIE = 'primary_until'
+
+_read_only = ContextVar('read_only', default=False)
+_state = ContextVar('db_state', default=None)
+
+
+class RequestState:
+    """Обращения к базам данных в текущем запросе."""
+
+    def __init__(self, sticky=False):
+        # Пользователь недавно записывал данные
+        self.sticky = sticky
+        self.wrote = False
+        self.replica_used = False
+
+
+@contextmanager
+def _context(var, value):
+    token = var.set(value)
+    try:
+        yield
+    finally:
+        var.reset(token)
+
+
+def read_only(view_func):
+    """Чтение в представлении можно выполнять на реплике."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with _context(_read_only, True):
+            response = view_func(*args, **kwargs)
+        if getattr(response, 'streaming', False):
+            around_stream(response, _context(_read_only, True))
+        return response
+    return wrapper
+
+
+def sticky():
+    """Пользователь недавно записывал данные и читает основную базу."""
+    state = _state.get()
+    return state is not None and state.sticky
+
+
+def replica_used():
+    """В текущем запросе данные читались с реплики."""
+    state = _state.get()
+    return state is not None and state.replica_used
+
+
+def reads_replica():
+    """Чтение в текущем контексте направляется на реплику."""
+    return (bool(settings.DATABASE_REPLICAS) and _read_only.get()
+            and not sticky())
+
+
+class ReplicaRouter:
+    """Чтение в представлениях read_only — с реплик, остальное — с default."""
+
+    def db_for_read(self, model, **hints):
+        if not reads_replica():
+            return None
+        state = _state.get()
+        if state is not None:
+            state.replica_used = True
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class PrimaryStickinessMiddleware:
+    """
+    После запроса, записавшего данные, следующие запросы пользователя
+    DATABASE_REPLICA_LAG секунд читают основную базу.
+
+    Подключается после SessionMiddleware, чтобы сохранение сессии
+    не считалось записью.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        state = RequestState(sticky=self.is_sticky(request))
+        with _context(_state, state):
+            response = self.get_response(request)
+        if response.streaming:
+            around_stream(response, _context(_state, state))
+        if state.wrote:
+            lag = settings.DATABASE_REPLICA_LAG
+            response.set_cookie(STICKY_COOKIE, str(time.time() + lag),
+                                max_age=lag, httponly=True,
+                                samesite='Lax')
+        return response
+
+    @staticmethod
+    def is_sticky(request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE)) > time.time()
+        except (TypeError, ValueError):
+            return False
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Применяет SQLITE_PRAGMAS к каждому новому соединению с SQLite.
+
+    Настройки выполняются на соединении DB-API, минуя обертки Django:
+    установка соединения не входит в бюджет запросов и метрики
+    представления, которое его открыло.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import math
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import db, personal, tasks
+from .cache import (cache_stats, get_generations, get_last_modified,
+                    single_flight)
+from .streaming import around_stream
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов к БД, чем разрешено."""
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming
+
+
+def _page_timeout(response):
+    if db.replica_used():
+        return settings.DATABASE_REPLICA_LAG
+    return settings.PAGE_CACHE_TIMEOUT
+
+
+def _page_generations(request, generations, args, kwargs):
+    """
+    Имена и номера поколений страницы. Вычисляются один раз за запрос:
+    их используют и condition_by_generations,
+    и cache_page_by_generations.
+    """
+    if not hasattr(request, '_page_generations'):
+        names = generations(request, *args, **kwargs)
+        request._page_generations = (names, get_generations(names))
+    return request._page_generations
+
+
+def condition_by_generations(generations):
+    """
+    Условный GET: ETag и Last-Modified страницы вычисляются по
+    поколениям ее данных без вызова представления, и повторный запрос
+    с If-None-Match или If-Modified-Since получает ответ 304.
+
+    generations — как в cache_page_by_generations. ETag зависит
+    от адреса, номеров поколений и пользователя: персональные
+    фрагменты страницы (core.personal) у каждого свои. Входит в ETag
+    и секрет CSRF: он меняется при входе, и формы копии страницы
+    из браузера отправлялись бы со старым токеном. Last-Modified —
+    время последнего изменения этих поколений, округленное вверх
+    до секунды; пока оно не наступило, заголовок не отправляется.
+    Страница, прочитанная с реплики, могла не получить последние
+    изменения, поэтому отдается без ETag и Last-Modified: иначе браузер
+    хранил бы устаревшую копию до следующего изменения данных.
+    Потоковая страница читает базу после возврата из представления,
+    поэтому остается без них, если чтение идет с реплики.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            names, versions = _page_generations(request, generations,
+                                                args, kwargs)
+            etag = quote_etag(hashlib.md5(
+                f'{request.get_full_path()}:{request.user.pk}:'
+                f'{request.META.get("CSRF_COOKIE")}:{versions}'.encode()
+            ).hexdigest())
+            # Last-Modified передается с точностью до секунды и
+            # округляется вверх. Пока эта секунда не наступила, следующее
+            # изменение может получить то же значение, поэтому до тех
+            # пор страница проверяется только по ETag.
+            last_modified = math.ceil(get_last_modified(names))
+            if last_modified > time.time():
+                last_modified = None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if (db.replica_used()
+                        or getattr(response, 'replica_read', False)
+                        or response.streaming and db.reads_replica()):
+                    return response
+            if response.status_code not in (200, 304):
+                return response
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Браузер хранит страницу, но каждый раз проверяет ее
+            patch_cache_control(response, no_cache=True,
+                                private=request.user.is_authenticated)
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_page_by_generations(key_prefix, generations, bypass=None):
+    """
+    Кеширует страницу, пока не изменятся данные, из которых она собрана.
+
+    generations(request, *args, **kwargs) возвращает имена поколений
+    данных страницы. Их номера входят в ключ кеша, поэтому после
+    bump_generations страница отрисовывается заново, а старая копия
+    вытесняется из кеша по времени.
+    Копия страницы общая для всех пользователей: части, зависящие
+    от пользователя, выводятся тегом personal и заполняются при каждом
+    ответе (см. core.personal).
+    Пока страница отрисовывается заново, одновременные запросы к ней
+    получают ее предыдущую копию (см. core.cache.single_flight).
+    Страница, прочитанная с реплики, могла не получить последние
+    изменения, поэтому хранится не дольше DATABASE_REPLICA_LAG.
+    Пользователь, который только что записывал данные (db.sticky),
+    получает страницу, заново отрисованную по основной базе: в кеше
+    может лежать копия с реплики без его изменений.
+    Если bypass(request) истинно, страница не кешируется, например
+    потоковый ответ (core.streaming): он отправляется до того, как
+    отрисован целиком. Такие запросы учитываются в счетчиках кеша
+    как пропущенные (bypassed).
+    """
+    stats = cache_stats(f'page:{key_prefix}')
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            if bypass and bypass(request):
+                stats.bypass()
+                return view_func(request, *args, **kwargs)
+
+            _, versions = _page_generations(request, generations,
+                                            args, kwargs)
+            versions = '.'.join(map(str, versions))
+            url = hashlib.md5(request.build_absolute_uri().encode())
+            page = f'page:{key_prefix}:{url.hexdigest()}'
+
+            def render_page():
+                with personal.deferred():
+                    response = view_func(request, *args, **kwargs)
+                # Отметка сохраняется в кеше вместе со страницей
+                response.replica_read = db.replica_used()
+                return response
+
+            if db.sticky():
+                return personal.fill(request, render_page())
+            response = single_flight(
+                f'{page}:{versions}',
+                render_page,
+                _page_timeout,
+                stale_key=f'stale:{page}',
+                cacheable=_cacheable,
+                stats=stats,
+            )
+            return personal.fill(request, response)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def _counting_queries(queries):
+    """Собирает в queries запросы ко всем базам, кроме запросов задач."""
+    def count_query(execute, sql, params, many, context):
+        if not tasks.running_eagerly():
+            queries.append(sql)
+        return execute(sql, params, many, context)
+
+    # Запросы к репликам тоже входят в бюджет
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(count_query))
+        yield
+
+
+def _check_budget(view_func, request, queries, max_queries):
+    if len(queries) <= max_queries:
+        return
+    message = (
+        f'{view_func.__module__}.{view_func.__name__}: '
+        f'{len(queries)} запросов к БД при бюджете '
+        f'{max_queries} ({request.method} {request.path})'
+    )
+    if settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded('\n'.join([message, *queries]))
+    logger.warning(message)
+
+
+def query_budget(max_queries):
+    """
+    Ограничивает количество запросов к БД за один вызов представления,
+    включая отрисовку шаблона.
+
+    Бюджет не должен зависеть от количества записей на странице:
+    превышение означает запросы в цикле (N+1). При QUERY_BUDGET_STRICT
+    (в тестах) превышение вызывает исключение QueryBudgetExceeded,
+    иначе записывается в журнал. Запросы фоновых задач, выполненных
+    сразу при TASKS_EAGER, в бюджет не входят: в работе их выполняет
+    исполнитель. Запросы потокового ответа входят в бюджет, и он
+    проверяется, когда ответ отправлен целиком.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            queries = []
+            with _counting_queries(queries):
+                response = view_func(request, *args, **kwargs)
+            if not response.streaming:
+                _check_budget(view_func, request, queries, max_queries)
+                return response
+
+            @contextmanager
+            def streamed():
+                with _counting_queries(queries):
+                    yield
+                _check_budget(view_func, request, queries, max_queries)
+
+            return around_stream(response, streamed())
+        return wrapper
+    return decorator
@@ -0,0 +1,45 @@
+"""
+Копирование основной базы SQLite в реплики для локальной проверки
+чтения с реплик (DATABASE_URL и DATABASE_REPLICA_URLS — файлы SQLite).
+"""
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def replicate(alias):
+    """Копирует основную базу в реплику через backup API SQLite."""
+    source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+    target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики; с --interval '
+            'повторяет копирование, изображая отстающую реплику.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Период копирования, секунд.')
+
+    def handle(self, *args, **options):
+        aliases = settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не заданы (DATABASE_REPLICA_URLS)')
+        for alias in ['default', *aliases]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'База {alias} — не SQLite')
+        while True:
+            for alias in aliases:
+                replicate(alias)
+            self.stdout.write(f'Реплики обновлены: {", ".join(aliases)}')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
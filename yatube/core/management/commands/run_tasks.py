@@ -0,0 +1,35 @@
+"""
+Исполнитель фоновых задач (см. core.tasks). Для нескольких
+исполнителей команда запускается в нескольких процессах.
+"""
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить поставленные задачи и выйти.')
+        parser.add_argument('--batch', type=int, default=10,
+                            help='Задач, которые берутся за один раз.')
+
+    def handle(self, *args, **options):
+        if settings.TASKS_EAGER:
+            raise CommandError('Задачи выполняются сразу (TASKS_EAGER)')
+        stopping = []
+
+        def stop(signum, frame):
+            # Взятые задачи выполняются до конца
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        done = tasks.run(options['batch'], options['once'],
+                         should_stop=lambda: bool(stopping))
+        self.stdout.write(f'Выполнено задач: {done}')
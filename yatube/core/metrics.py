@@ -0,0 +1,430 @@
+"""
+Метрики производительности запросов.
+
+MetricsMiddleware измеряет для каждого запроса время ответа, время
+и количество запросов к БД, время отрисовки шаблонов и попадания
+в кеш и складывает их в гистограммы по имени URL (posts:index, ...).
+
+Гистограммы хранятся в памяти процесса: накопленные с запуска значения
+отдаются в формате Prometheus, а значения за последние METRICS_WINDOW
+секунд — в JSON. Метрики фоновых задач, которые выполняет отдельный
+процесс run_tasks, хранятся в общем кеше (SharedRegistry), и их отдает
+любой веб-процесс. Измерение стоит несколько вызовов perf_counter()
+на запрос и на запрос к БД, поэтому метрики можно не выключать.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .streaming import around_stream
+
+# Границы корзин гистограмм
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# Метрики запроса: имя -> (описание, границы корзин)
+METRICS = {
+    'request_seconds': ('Время ответа', TIME_BUCKETS),
+    'db_seconds': ('Время запросов к БД', TIME_BUCKETS),
+    'db_queries': ('Количество запросов к БД', COUNT_BUCKETS),
+    'template_seconds': ('Время отрисовки шаблонов', TIME_BUCKETS),
+    'cache_hits': ('Попадания в кеш', COUNT_BUCKETS),
+    'cache_misses': ('Промахи кеша', COUNT_BUCKETS),
+}
+# Метрики фоновых задач: имя -> (описание, границы корзин)
+TASK_METRICS = {
+    'thumbnail_seconds': ('Время создания миниатюр поста', TIME_BUCKETS),
+}
+
+# Количество частей, на которые делится окно METRICS_WINDOW
+WINDOW_SLOTS = 10
+
+# Имя для запросов, адрес которых не найден
+UNRESOLVED = '<unresolved>'
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def cumulative(self):
+        """Пары (граница, количество значений не больше границы)."""
+        total = 0
+        for bound, count in zip((*self.buckets, float('inf')), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Оценка квантиля: верхняя граница корзины, в которую он попал."""
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+        return float('inf')
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'avg': round(self.sum / self.count, 6) if self.count else None,
+            'p50': _bound(self.quantile(0.5)),
+            'p95': _bound(self.quantile(0.95)),
+            'p99': _bound(self.quantile(0.99)),
+        }
+
+
+class RollingHistogram:
+    """
+    Гистограмма значений за все время и за последние window секунд.
+    Окно состоит из WINDOW_SLOTS частей, устаревшие части
+    отбрасываются целиком.
+    """
+
+    def __init__(self, buckets, window):
+        self.buckets = buckets
+        self.slot_seconds = window / WINDOW_SLOTS
+        self.total = Histogram(buckets)
+        self.slots = {}
+
+    def _slot(self, now):
+        return int(now // self.slot_seconds)
+
+    def observe(self, value, now):
+        slot = self._slot(now)
+        if slot not in self.slots:
+            oldest = slot - WINDOW_SLOTS
+            for old in [old for old in self.slots if old <= oldest]:
+                del self.slots[old]
+            self.slots[slot] = Histogram(self.buckets)
+        self.slots[slot].observe(value)
+        self.total.observe(value)
+
+    def window(self, now):
+        oldest = self._slot(now) - WINDOW_SLOTS
+        histogram = Histogram(self.buckets)
+        for slot, part in self.slots.items():
+            if slot > oldest:
+                histogram.merge(part)
+        return histogram
+
+
+class Registry:
+    """Гистограммы метрик по имени URL или задачи."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, name, metric, value, buckets):
+        now = time.monotonic()
+        with self._lock:
+            series = self._series.get((name, metric))
+            if series is None:
+                series = self._series[name, metric] = RollingHistogram(
+                    buckets, settings.METRICS_WINDOW
+                )
+            series.observe(value, now)
+
+    def observe_many(self, name, values, metrics=METRICS):
+        for metric, value in values.items():
+            self.observe(name, metric, value, metrics[metric][1])
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        """Копии гистограмм: {(имя, метрика): (за все время, за окно)}."""
+        now = time.monotonic()
+        with self._lock:
+            return {key: (_copy(series.total), series.window(now))
+                    for key, series in sorted(self._series.items())}
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.merge(histogram)
+    return copy
+
+
+registry = Registry()
+
+
+class SharedRegistry:
+    """
+    Гистограммы метрик в общем кеше (shared, без CACHE_URL — default).
+    Корзины гистограмм — счетчики, которые увеличиваются атомарно
+    (incr), поэтому процессы не теряют значения друг друга. Счетчики
+    окна хранятся по частям окна и истекают вместе с ними; сумма
+    значений хранится в микросекундах.
+    """
+    prefix = 'metrics'
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    @property
+    def cache(self):
+        return caches['shared' if 'shared' in settings.CACHES
+                      else 'default']
+
+    @staticmethod
+    def _slot(now):
+        return int(now // (settings.METRICS_WINDOW / WINDOW_SLOTS))
+
+    def _key(self, name, metric, part, field):
+        return f'{self.prefix}:{name}:{metric}:{part}:{field}'
+
+    def _incr(self, key, delta, timeout):
+        self.cache.add(key, 0, timeout)
+        try:
+            self.cache.incr(key, delta)
+        except ValueError:
+            # Счетчик истек между add и incr
+            self.cache.add(key, delta, timeout)
+
+    def _add_series(self, name, metric):
+        key = f'{self.prefix}:series'
+        series = self.cache.get(key) or []
+        if (name, metric) not in series:
+            self.cache.set(key, [*series, (name, metric)], None)
+
+    def observe(self, name, metric, value):
+        index = bisect_left(self.metrics[metric][1], value)
+        self._add_series(name, metric)
+        for part, timeout in (
+                ('total', None),
+                (self._slot(time.time()), settings.METRICS_WINDOW * 2)):
+            self._incr(self._key(name, metric, part, index), 1, timeout)
+            self._incr(self._key(name, metric, part, 'sum'),
+                       round(value * 1e6), timeout)
+
+    def _histogram(self, values, name, metric, parts):
+        histogram = Histogram(self.metrics[metric][1])
+        for part in parts:
+            for index in range(len(histogram.counts)):
+                histogram.counts[index] += values.get(
+                    self._key(name, metric, part, index), 0
+                )
+            histogram.sum += values.get(
+                self._key(name, metric, part, 'sum'), 0
+            ) / 1e6
+        histogram.count = sum(histogram.counts)
+        return histogram
+
+    def snapshot(self):
+        """Как Registry.snapshot: одно чтение кеша на все метрики."""
+        series = sorted(self.cache.get(f'{self.prefix}:series') or [])
+        slot = self._slot(time.time())
+        parts = ['total', *range(slot - WINDOW_SLOTS + 1, slot + 1)]
+        values = self.cache.get_many([
+            self._key(name, metric, part, field)
+            for name, metric in series for part in parts
+            for field in (*range(len(self.metrics[metric][1]) + 1), 'sum')
+        ])
+        return {(name, metric): (
+            self._histogram(values, name, metric, parts[:1]),
+            self._histogram(values, name, metric, parts[1:]),
+        ) for name, metric in series}
+
+
+task_registry = SharedRegistry(TASK_METRICS)
+
+
+class RequestMetrics:
+    """Значения метрик текущего запроса."""
+
+    def __init__(self):
+        self.db_seconds = 0
+        self.db_queries = 0
+        self.template_seconds = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Глубина вложенных отрисовок шаблонов: время считается
+        # только у внешней
+        self.template_depth = 0
+
+    def as_dict(self):
+        return {
+            'db_seconds': self.db_seconds,
+            'db_queries': self.db_queries,
+            'template_seconds': self.template_seconds,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def current():
+    """Метрики обрабатываемого запроса или None вне запроса."""
+    return _current.get()
+
+
+def count_cache(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+@contextmanager
+def measure_template():
+    """Измеряет отрисовку шаблона в текущем запросе."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.template_depth -= 1
+        if not metrics.template_depth:
+            metrics.template_seconds += time.perf_counter() - started
+
+
+def observe_task(name, metric, value):
+    """
+    Записывает метрику фоновой задачи (например, создания миниатюр)
+    в общий кеш: ее отдают веб-процессы, а не исполнитель задач.
+    """
+    if settings.METRICS_ENABLED:
+        task_registry.observe(name, metric, value)
+
+
+class MetricsMiddleware:
+    """Измеряет запросы и складывает метрики в registry."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        started = time.perf_counter()
+        with self.measuring(metrics):
+            response = self.get_response(request)
+        if response.streaming:
+            # Потоковый ответ читает базу и отрисовывается, пока
+            # отправляется: измерение заканчивается с его последней частью
+            return around_stream(
+                response, self.streamed(request, metrics, started)
+            )
+        self.observe(request, metrics, started)
+        return response
+
+    @contextmanager
+    def measuring(self, metrics):
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        lambda *args: self.measure_query(metrics, *args)
+                    ))
+                yield
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def streamed(self, request, metrics, started):
+        with self.measuring(metrics):
+            yield
+        self.observe(request, metrics, started)
+
+    @staticmethod
+    def observe(request, metrics, started):
+        values = metrics.as_dict()
+        values['request_seconds'] = time.perf_counter() - started
+        match = request.resolver_match
+        registry.observe_many(match.view_name if match else UNRESOLVED,
+                              values)
+
+    @staticmethod
+    def measure_query(metrics, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.db_seconds += time.perf_counter() - started
+            metrics.db_queries += 1
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{_escape(value)}"'
+                    for key, value in labels.items())
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _bound(value):
+    # Значение за последней границей корзин
+    return '+Inf' if value == float('inf') else value
+
+
+def _snapshot():
+    return {**registry.snapshot(), **task_registry.snapshot()}
+
+
+def prometheus():
+    """Гистограммы за все время в текстовом формате Prometheus."""
+    described = {**METRICS, **TASK_METRICS}
+    lines = []
+    seen = set()
+    # Значения одной метрики должны идти подряд после ее описания
+    series = sorted(_snapshot().items(),
+                    key=lambda item: (item[0][1], item[0][0]))
+    for (name, metric), (total, _) in series:
+        full_name = f'yatube_{metric}'
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f'# HELP {full_name} {described[metric][0]}')
+            lines.append(f'# TYPE {full_name} histogram')
+        for bound, count in total.cumulative():
+            labels = _labels(view=name, le=_bound(bound))
+            lines.append(f'{full_name}_bucket{{{labels}}} {count}')
+        labels = _labels(view=name)
+        lines.append(f'{full_name}_sum{{{labels}}} {total.sum}')
+        lines.append(f'{full_name}_count{{{labels}}} {total.count}')
+    return '\n'.join(lines) + '\n'
+
+
+def as_json():
+    """Сводка метрик за последние METRICS_WINDOW секунд."""
+    data = {}
+    for (name, metric), (_, window) in _snapshot().items():
+        data.setdefault(name, {})[metric] = window.summary()
+    return {'window': settings.METRICS_WINDOW, 'metrics': data}
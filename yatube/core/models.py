@@ -11,3 +11,34 @@ class CreatedModel(models.Model):
     class Meta:
         ordering = ['-created']
         abstract = True
+
+
+class Task(models.Model):
+    """
+    Фоновая задача в очереди (см. core.tasks). Выполненные задачи
+    удаляются, а задачи, исчерпавшие попытки, остаются с failed=True.
+    """
+    name = models.CharField('Задача', max_length=100)
+    args = models.TextField('Аргументы (JSON)', default='[]')
+    # Ключ дедупликации: пока задача с ключом ждет выполнения,
+    # такая же задача повторно не ставится
+    key = models.CharField('Ключ', max_length=200, unique=True, null=True,
+                           blank=True)
+    run_at = models.DateTimeField('Выполнить после')
+    # Задача взята исполнителем до этого времени. Если исполнитель
+    # завершился, не выполнив ее, задачу после этого возьмет другой
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    failed = models.BooleanField('Не выполнена', default=False)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Очередные задачи для исполнителей
+            models.Index(fields=['failed', 'run_at'],
+                         name='task_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{self.args}'
@@ -0,0 +1,235 @@
+import base64
+import binascii
+import datetime as dt
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+# Направления перехода по курсору
+NEXT = 'n'
+PREVIOUS = 'p'
+
+# Ключ сортировки по умолчанию: от новых записей к старым
+DEFAULT_KEYS = ('created', 'id')
+# Записей в одной порции потоковой страницы
+STREAM_CHUNK_SIZE = 10
+
+
+class InvalidCursor(ValueError):
+    """Курсор не удалось разобрать."""
+
+
+def _serialize(value):
+    # Дата сохраняется с микросекундами, иначе курсор потеряет точность
+    if isinstance(value, dt.datetime):
+        return value.isoformat()
+    raise TypeError(f'Значение {value!r} нельзя сохранить в курсоре')
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачную строку."""
+    data = json.dumps([direction, *values], default=_serialize)
+    token = base64.urlsafe_b64encode(data.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает строку курсора в направление и значения ключа."""
+    try:
+        padding = '=' * (-len(token) % 4)
+        data = base64.urlsafe_b64decode(token + padding)
+        direction, *values = json.loads(data.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor('Некорректный курсор')
+    if direction not in (NEXT, PREVIOUS) or not values:
+        raise InvalidCursor('Некорректный курсор')
+    return direction, values
+
+
+class CursorPaginator(Paginator):
+    """
+    Паджинатор по ключу (keyset pagination).
+
+    Записи упорядочены по убыванию полей keys, а следующая страница
+    выбирается условием «ключ меньше ключа последней записи» вместо
+    OFFSET, поэтому глубокие страницы не замедляются с ростом таблицы.
+
+    Страницы — обычные объекты Page с атрибутами next_cursor
+    и previous_cursor (None, если соседней страницы нет).
+    У страниц, полученных по курсору, номер неизвестен (number is None),
+    поэтому навигация по ним идет только через курсоры.
+    Методы обычного Paginator (page, get_page, count) сохранены
+    для совместимости со ссылками вида ?page=N.
+    """
+
+    def __init__(self, object_list, per_page, keys=DEFAULT_KEYS, count=None,
+                 **kwargs):
+        self.keys = tuple(keys)
+        object_list = object_list.order_by(*(f'-{key}' for key in self.keys))
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # Количество записей известно из денормализованного счетчика,
+            # COUNT(*) не нужен
+            self.count = count
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.object_list = list(page.object_list)
+        return self._with_cursors(page, page.has_next(), page.has_previous())
+
+    def _with_cursors(self, page, has_next, has_previous):
+        """Добавляет странице курсоры соседних страниц."""
+        rows = page.object_list
+        page.next_cursor = (self.encode_cursor(NEXT, rows[-1])
+                            if has_next and rows else None)
+        page.previous_cursor = (self.encode_cursor(PREVIOUS, rows[0])
+                                if has_previous and rows else None)
+        return page
+
+    def key_values(self, obj):
+        """
+        Значения ключа сортировки для записи: объекта модели
+        или словаря из QuerySet.values().
+        """
+        if isinstance(obj, dict):
+            return [obj[key] for key in self.keys]
+        return [getattr(obj, key) for key in self.keys]
+
+    def encode_cursor(self, direction, obj):
+        return encode_cursor(direction, self.key_values(obj))
+
+    def _keyset_filter(self, direction, values):
+        """
+        Условие (k1, k2, ...) < (v1, v2, ...) для перехода вперед
+        и (k1, k2, ...) > (v1, v2, ...) для перехода назад.
+
+        Нестрогое условие на первый ключ позволяет базе данных
+        начать просмотр индекса сразу с нужного места.
+        """
+        lookup = 'lt' if direction == NEXT else 'gt'
+        condition = Q()
+        for position, key in enumerate(self.keys):
+            equal = {k: v for k, v in zip(self.keys[:position], values)}
+            condition |= Q(**equal, **{f'{key}__{lookup}': values[position]})
+        return Q(**{f'{self.keys[0]}__{lookup}e': values[0]}) & condition
+
+    def _cursor_rows(self, cursor):
+        """
+        Направление, значения ключа из курсора и выборка записей
+        страницы с одной лишней записью: по ней видно, есть ли
+        следующая страница.
+        """
+        if cursor is None:
+            direction, values = NEXT, None
+        else:
+            direction, values = decode_cursor(cursor)
+            if len(values) != len(self.keys):
+                raise InvalidCursor('Некорректный курсор')
+
+        object_list = self.object_list
+        if values is not None:
+            object_list = object_list.filter(
+                self._keyset_filter(direction, values)
+            )
+        if direction == PREVIOUS:
+            object_list = object_list.reverse()
+        return direction, values, object_list[:self.per_page + 1]
+
+    def cursor_page(self, cursor=None):
+        """Возвращает страницу, следующую за курсором (или первую)."""
+        direction, values, object_list = self._cursor_rows(cursor)
+        rows = list(object_list)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        page = Page(rows, None, self)
+        if direction == PREVIOUS:
+            rows.reverse()
+            return self._with_cursors(page, True, has_more)
+        return self._with_cursors(page, has_more, values is not None)
+
+    def get_cursor_page(self, cursor=None):
+        """
+        Возвращает страницу по курсору, даже если курсор некорректен:
+        в этом случае отдается первая страница.
+        """
+        try:
+            return self.cursor_page(cursor)
+        except InvalidCursor:
+            return self.cursor_page()
+
+    def stream_page(self, cursor=None, prepare=None):
+        """
+        Страница для потокового ответа: записи выбираются итератором
+        по мере отрисовки (StreamedPage). Страница перед курсором
+        выбирается в обратном порядке, поэтому загружается целиком,
+        как и страница с некорректным курсором.
+        prepare(rows) вызывается для каждой порции записей перед
+        отрисовкой, например чтобы загрузить связанные данные.
+        """
+        try:
+            direction, values, object_list = self._cursor_rows(cursor)
+        except InvalidCursor:
+            direction = None
+        if direction != NEXT:
+            page = self.get_cursor_page(cursor)
+            if prepare:
+                prepare(page.object_list)
+            return page
+        return StreamedPage(self, object_list, values is not None, prepare)
+
+
+class StreamedPage:
+    """
+    Страница, записи которой выбираются по мере отрисовки.
+
+    Записи читаются из базы порциями по STREAM_CHUNK_SIZE
+    (QuerySet.iterator), поэтому потоковый ответ отправляет первые
+    карточки, пока остальные еще не выбраны. Курсоры соседних страниц
+    известны только после того, как все записи страницы пройдены.
+    """
+
+    number = None
+
+    def __init__(self, paginator, object_list, has_previous, prepare=None):
+        self.paginator = paginator
+        self._object_list = object_list
+        self._has_previous = has_previous
+        self._prepare = prepare
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def _chunks(self):
+        chunk = []
+        rows = self._object_list.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == STREAM_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def __iter__(self):
+        paginator = self.paginator
+        last = None
+        count = 0
+        for chunk in self._chunks():
+            if count == paginator.per_page:
+                # Лишняя запись только показывает, что есть следующая
+                # страница
+                self.next_cursor = paginator.encode_cursor(NEXT, last)
+                return
+            rows = chunk[:paginator.per_page - count]
+            if count == 0 and self._has_previous:
+                self.previous_cursor = paginator.encode_cursor(PREVIOUS,
+                                                               rows[0])
+            if self._prepare:
+                self._prepare(rows)
+            yield from rows
+            count += len(rows)
+            last = rows[-1]
+            if len(rows) < len(chunk):
+                self.next_cursor = paginator.encode_cursor(NEXT, last)
+                return
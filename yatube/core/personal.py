@@ -0,0 +1,90 @@
+"""
+Персональные фрагменты закешированных страниц (hole punching).
+
+Страница кешируется одна для всех пользователей, а части, зависящие
+от пользователя (шапка, кнопки подписки и редактирования, форма
+комментария), при отрисовке для кеша заменяются метками
+<!--personal:...-->. Метки заполняются фрагментами, отрисованными
+для текущего пользователя, при каждом ответе — и из кеша, и после
+отрисовки.
+
+Фрагмент — функция fragment(request, **kwargs), возвращающая HTML,
+зарегистрированная декоратором @register('имя'). В шаблоне фрагмент
+выводится тегом {% personal 'имя' аргумент=значение %} (библиотека
+personal). Аргументы сохраняются в метке, поэтому это должны быть
+простые значения (числа, строки), а не объекты моделей.
+"""
+import base64
+import json
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.loader import render_to_string
+
+_fragments = {}
+_deferred = ContextVar('personal_deferred', default=False)
+
+MARKER = re.compile(r'<!--personal:([A-Za-z0-9_\-=]+)-->')
+
+
+def register(name):
+    """Регистрирует функцию фрагмента под именем name."""
+    def decorator(func):
+        _fragments[name] = func
+        return func
+    return decorator
+
+
+@contextmanager
+def deferred():
+    """Внутри блока фрагменты выводятся метками, а не отрисовываются."""
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def placeholder(name, kwargs):
+    data = json.dumps([name, kwargs], separators=(',', ':')).encode()
+    return f'<!--personal:{base64.urlsafe_b64encode(data).decode()}-->'
+
+
+def render(request, name, kwargs):
+    """Фрагмент для текущего пользователя или метка для кеша."""
+    if _deferred.get():
+        return placeholder(name, kwargs)
+    return _fragments[name](request, **kwargs)
+
+
+def _fill(request, content):
+    if '<!--personal:' not in content:
+        return content
+
+    def replace(match):
+        name, kwargs = json.loads(base64.urlsafe_b64decode(match.group(1)))
+        return _fragments[name](request, **kwargs)
+
+    return MARKER.sub(replace, content)
+
+
+def fill(request, response):
+    """Заменяет метки в ответе фрагментами для текущего пользователя."""
+    if response.streaming:
+        # Метка не разрывается между частями потокового ответа:
+        # каждая часть — целиком отрисованный фрагмент шаблона
+        response.streaming_content = (
+            _fill(request, chunk.decode(response.charset))
+            for chunk in response.streaming_content
+        )
+        return response
+    content = response.content.decode(response.charset)
+    if '<!--personal:' in content:
+        response.content = _fill(request, content)
+    return response
+
+
+@register('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
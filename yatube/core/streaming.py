@@ -0,0 +1,83 @@
+"""
+Потоковая отрисовка страниц (StreamingHttpResponse).
+
+Части шаблона, отмеченные тегом {% stream %} (библиотека streaming),
+при потоковой отрисовке заменяются метками <!--stream:N-->. Остальной
+шаблон — шапка, оформление из base.html и подвал — отрисовывается
+сразу, и его начало до первой метки отправляется клиенту первым.
+Отмеченные части отрисовываются по мере отправки ответа, по порядку.
+Цикл {% for %} внутри {% stream %} отправляет каждую запись отдельно,
+пока итератор выдает записи (см. core.paginator.StreamedPage):
+
+    {% stream %}
+      {% for post in page_obj %}...{% endfor %}
+    {% endstream %}
+
+В таком цикле доступны forloop.counter, forloop.counter0
+и forloop.first; forloop.last неизвестен, пока записи не закончились.
+
+Без потоковой отрисовки тег выводит содержимое сразу, поэтому шаблон
+одинаково работает с render() и с stream_template().
+
+Отложенные части отрисовываются и читают базу данных уже после того,
+как представление вернуло ответ. Декораторы и middleware, действующие
+на время запроса (read_only, query_budget, метрики), продлевают свое
+действие на отправку ответа функцией around_stream.
+"""
+import re
+from copy import copy
+
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+
+# Переменная контекста со списком отложенных частей шаблона
+DEFERRED = 'stream_deferred'
+
+MARKER = re.compile(r'<!--stream:(\d+)-->')
+
+
+def defer(context, node):
+    """Откладывает отрисовку части шаблона, возвращает ее метку."""
+    deferred = context[DEFERRED]
+    # Контекст копируется: после отрисовки шаблона он уже не нужен
+    # остальным тегам и очищается
+    deferred.append((node, copy(context)))
+    return f'<!--stream:{len(deferred) - 1}-->'
+
+
+def is_streaming(context):
+    return context.get(DEFERRED) is not None
+
+
+def around_stream(response, context_manager):
+    """
+    Отдает потоковое содержимое ответа внутри context_manager, который
+    входит перед первой частью и выходит после последней.
+    """
+    content = response.streaming_content
+
+    def chunks():
+        with context_manager:
+            yield from content
+
+    response.streaming_content = chunks()
+    return response
+
+
+def stream_template(request, template_name, context=None):
+    """Потоковый ответ: шаблон, а затем его отложенные части."""
+    deferred = []
+    content = render_to_string(template_name,
+                               {**(context or {}), DEFERRED: deferred},
+                               request)
+
+    def chunks():
+        parts = MARKER.split(content)
+        for position, part in enumerate(parts):
+            if position % 2 == 0:
+                yield part
+                continue
+            node, node_context = deferred[int(part)]
+            yield from node.render_chunks(node_context)
+
+    return StreamingHttpResponse(chunks())
@@ -0,0 +1,143 @@
+"""
+Очередь фоновых задач в базе данных.
+
+Побочные действия записи (раскладка поста в ленты, поисковый индекс,
+миниатюры) выполняются не в запросе, а исполнителями — процессами
+команды run_tasks. Представление только добавляет строку Task в той же
+транзакции, что и основную запись, поэтому задача не теряется и не
+выполняется раньше коммита.
+
+Задача — функция, зарегистрированная декоратором @register('имя'),
+с аргументами, сохраняемыми в JSON (id записей, а не объекты моделей):
+к моменту выполнения запись могла измениться или быть удалена.
+Задача с ошибкой повторяется через TASK_RETRY_DELAY секунд, каждый
+раз вдвое дольше, не больше TASK_MAX_ATTEMPTS раз. Задачи с одинаковым
+ключом, ждущие выполнения, не дублируются.
+
+При TASKS_EAGER (в тестах и при разработке без исполнителя) задачи
+выполняются сразу при постановке.
+"""
+import json
+import logging
+import time
+import traceback
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_eager = ContextVar('eager_task', default=False)
+
+
+def register(name):
+    """Регистрирует функцию задачи под именем name."""
+    def decorator(func):
+        _tasks[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, *args, key=None):
+    """
+    Ставит задачу name(*args) в очередь. Если задача с тем же key
+    уже ждет выполнения, новая не добавляется.
+    """
+    if name not in _tasks:
+        raise KeyError(f'Задача {name} не зарегистрирована')
+    if settings.TASKS_EAGER:
+        token = _eager.set(True)
+        try:
+            _tasks[name](*args)
+        finally:
+            _eager.reset(token)
+        return
+    Task.objects.bulk_create([
+        Task(name=name, args=json.dumps(args), key=key,
+             run_at=timezone.now())
+    ], ignore_conflicts=True)
+
+
+def running_eagerly():
+    """
+    Сейчас выполняется задача, поставленная при TASKS_EAGER: она
+    заменяет исполнителя, поэтому ее запросы не входят в бюджет запроса.
+    """
+    return _eager.get()
+
+
+def _available(now):
+    return Task.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        failed=False, run_at__lte=now,
+    )
+
+
+def claim(limit):
+    """
+    Берет до limit очередных задач. Задача берется условным UPDATE,
+    поэтому одну задачу не возьмут два исполнителя. Ключ снимается:
+    изменение, случившееся во время выполнения, поставит новую задачу.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.TASK_LEASE)
+    claimed = []
+    candidates = _available(now).order_by('run_at', 'id').values_list(
+        'pk', flat=True
+    )[:limit]
+    for pk in candidates:
+        # Попытка засчитывается при взятии: задача, на которой
+        # исполнитель завершается аварийно, не повторяется бесконечно
+        if _available(now).filter(pk=pk).update(
+            locked_until=lease, key=None, attempts=F('attempts') + 1
+        ):
+            claimed.append(Task.objects.get(pk=pk))
+    return claimed
+
+
+def execute(task):
+    """
+    Выполняет задачу в транзакции: удаляет ее или откладывает
+    до новой попытки.
+    """
+    try:
+        with transaction.atomic():
+            _tasks[task.name](*json.loads(task.args))
+    except Exception:
+        logger.exception('Задача %s завершилась с ошибкой', task)
+        task.last_error = traceback.format_exc()
+        task.locked_until = None
+        if task.attempts >= settings.TASK_MAX_ATTEMPTS:
+            task.failed = True
+        else:
+            delay = settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+            task.run_at = timezone.now() + timedelta(seconds=delay)
+        task.save(update_fields=['last_error', 'locked_until', 'failed',
+                                 'run_at'])
+        return False
+    task.delete()
+    return True
+
+
+def run(batch=10, once=False, should_stop=lambda: False):
+    """
+    Выполняет задачи, пока should_stop() ложно; при once — только
+    уже поставленные. Возвращает количество выполненных задач.
+    """
+    done = 0
+    while not should_stop():
+        tasks = claim(batch)
+        for task in tasks:
+            done += execute(task)
+        if not tasks:
+            if once:
+                break
+            time.sleep(settings.TASK_POLL_INTERVAL)
+    return done
@@ -0,0 +1,61 @@
+import logging
+import os
+import time
+
+from django.template import engines
+from django.template.backends.django import DjangoTemplates, Template
+from django.template.loaders.cached import Loader as CachedLoader
+
+from .metrics import measure_template
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        with measure_template():
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django, время отрисовки которых попадает в метрики."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self
+        )
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+    def warm_up(self):
+        """
+        Компилирует все шаблоны из DIRS, если загрузчик их кеширует.
+        Возвращает количество скомпилированных шаблонов.
+        """
+        if not any(isinstance(loader, CachedLoader)
+                   for loader in self.engine.template_loaders):
+            return 0
+        count = 0
+        for directory in self.engine.dirs:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if not name.endswith('.html'):
+                        continue
+                    path = os.path.relpath(os.path.join(root, name),
+                                           directory)
+                    self.engine.get_template(path.replace(os.sep, '/'))
+                    count += 1
+        return count
+
+
+def warm_up_templates():
+    """Компилирует шаблоны заранее, чтобы не тратить на это запросы."""
+    started = time.perf_counter()
+    count = sum(engine.warm_up() for engine in engines.all()
+                if isinstance(engine, InstrumentedDjangoTemplates))
+    if count:
+        logger.info('Скомпилировано шаблонов: %s за %.3f с', count,
+                    time.perf_counter() - started)
+    return count
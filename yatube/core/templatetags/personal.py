@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from .. import personal as fragments
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def personal(context, name, **kwargs):
+    """Фрагмент страницы, зависящий от пользователя (core.personal)."""
+    return mark_safe(fragments.render(context.get('request'), name, kwargs))
@@ -0,0 +1,53 @@
+from django import template
+from django.template.defaulttags import ForNode
+
+from .. import streaming
+
+register = template.Library()
+
+
+class StreamNode(template.Node):
+    """Часть шаблона, отрисовываемая по мере отправки ответа."""
+
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render_chunks(self, context):
+        """
+        Части отрисованного содержимого: циклы {% for %} верхнего
+        уровня отдают каждую запись отдельно, по мере их выборки.
+        """
+        for node in self.nodelist:
+            if isinstance(node, ForNode) and len(node.loopvars) == 1:
+                yield from self.render_loop(node, context)
+            else:
+                yield node.render_annotated(context)
+
+    @staticmethod
+    def render_loop(node, context):
+        items = node.sequence.resolve(context, ignore_failures=True)
+        empty = True
+        for number, item in enumerate(items or ()):
+            empty = False
+            # forloop.last неизвестен, пока записи не закончились
+            forloop = {'counter0': number, 'counter': number + 1,
+                       'first': number == 0}
+            with context.push(forloop=forloop, **{node.loopvars[0]: item}):
+                yield node.nodelist_loop.render(context)
+        if empty:
+            yield node.nodelist_empty.render(context)
+
+    def render(self, context):
+        if streaming.is_streaming(context):
+            return streaming.defer(context, self)
+        return self.nodelist.render(context)
+
+
+@register.tag
+def stream(parser, token):
+    """{% stream %}...{% endstream %} (см. core.streaming)."""
+    if len(token.split_contents()) != 1:
+        raise template.TemplateSyntaxError('У тега stream нет аргументов')
+    nodelist = parser.parse(('endstream',))
+    parser.delete_first_token()
+    return StreamNode(nodelist)
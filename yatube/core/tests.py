@@ -1,4 +1,43 @@
-from django.test import Client, TestCase
+import os
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.template import engines
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import FeedItem, Follow, Post
+from . import metrics, tasks
+from .cache import bump_generations, get_generations, single_flight
+from .cache_backends.fake_server import FakeRedisServer
+from .checks import check_shared_cache
+from .db import STICKY_COOKIE, ReplicaRouter, configure_sqlite, read_only
+from .decorators import QueryBudgetExceeded, query_budget
+from .models import Task
+from .template_backends import warm_up_templates
+
+User = get_user_model()
+# Вызовы тестовой задачи
+task_calls = []
+
+
+@tasks.register('tests.record')
+def record_task(value):
+    if value == 'fail':
+        raise ValueError('Ошибка задачи')
+    task_calls.append(value)
 
 
 class CoreURLTests(TestCase):
@@ -12,3 +51,508 @@ class CoreURLTests(TestCase):
         """Страница 404 отдает кастомный шаблон."""
         response = Client().get(self.PAGE_404_URL)
         self.assertTemplateUsed(response, self.PAGE_404_TEMPL)
+
+
+class SharedCacheTests(SimpleTestCase):
+    """Общий кеш и двухуровневый кеш на локальном сервере Redis."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRedisServer().start()
+        cls.settings_override = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'core.cache_backends.tiered.TieredCache',
+                'OPTIONS': {'L2': 'shared', 'L1_TIMEOUT': 60},
+            },
+            'shared': {
+                'BACKEND': 'core.cache_backends.redis.RedisCache',
+                'LOCATION': cls.server.url,
+            },
+        })
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['default'].clear()
+        self.server.commands.clear()
+
+    def test_shared_cache_operations(self):
+        """Общий кеш выполняет основные операции Django."""
+        shared = caches['shared']
+        shared.set('post', {'text': 'Текст'})
+        self.assertEqual(shared.get('post'), {'text': 'Текст'})
+        self.assertFalse(shared.add('post', 'другой'))
+        self.assertTrue(shared.add('counter', 1))
+        self.assertEqual(shared.incr('counter', 10), 11)
+        self.assertEqual(shared.get('counter'), 11)
+        with self.assertRaises(ValueError):
+            shared.incr('missing')
+        self.assertEqual(shared.get_many(['post', 'counter', 'missing']),
+                         {'post': {'text': 'Текст'}, 'counter': 11})
+        shared.delete_many(['post', 'counter'])
+        self.assertFalse(shared.has_key('post'))
+        shared.set('short', 1, 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(shared.get('short'))
+
+    def test_shared_cache_reuses_connections(self):
+        """Соединения с сервером берутся из пула, а не открываются заново."""
+        shared = caches['shared']
+        shared.set('key', 'value')
+        idle = shared._pool._idle.qsize()
+        for _ in range(20):
+            shared.set('key', 'value')
+        self.assertEqual(shared._pool._idle.qsize(), idle)
+
+    def test_task_metrics_stored_in_shared_cache(self):
+        """Метрики задач пишутся в общий кеш, минуя локальную копию."""
+        metrics.observe_task('thumbnails', 'thumbnail_seconds', 0.3)
+        self.assertIn('INCRBY', self.server.commands)
+        total, _ = metrics.task_registry.snapshot()['thumbnails',
+                                                    'thumbnail_seconds']
+        self.assertEqual(total.count, 1)
+
+    def test_tiered_cache_reads_local_copy(self):
+        """Повторное чтение берется из памяти процесса без обращения к L2."""
+        cache = caches['default']
+        cache.set('key', 'value')
+        self.server.commands.clear()
+        for _ in range(10):
+            self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(sum(self.server.commands.values()), 0)
+
+    def test_tiered_cache_shares_values_between_processes(self):
+        """Значение, записанное одним процессом, видно другому через L2."""
+        cache = caches['default']
+        cache.set('key', 'value')
+        other = caches['default'].__class__(
+            'other', {'OPTIONS': {'L2': 'shared'}}
+        )
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(caches['shared'].get('key'))
+
+    def test_tiered_cache_computes_value_once(self):
+        """Одновременные промахи вычисляют значение один раз."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        def request():
+            # У каждого потока свой экземпляр кеша и своя память L1
+            results.append(caches['default'].get_or_set('key', compute))
+
+        results = []
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Защита от одновременного пересчета значений кеша."""
+
+    def setUp(self):
+        cache.clear()
+
+    def run_concurrently(self, func, count=8):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(func()))
+                   for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_single_flight_computes_value_once(self):
+        """Одновременные промахи вычисляют значение один раз."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = self.run_concurrently(
+            lambda: single_flight('key', compute, 60)
+        )
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_single_flight_returns_stale_copy(self):
+        """Пока значение пересчитывается, отдается предыдущая копия."""
+        single_flight('key:1', lambda: 'old', 60, stale_key='stale:key')
+        cache.add('lock:key:2', 1)
+        value = single_flight('key:2', lambda: 'new', 60,
+                              stale_key='stale:key')
+        self.assertEqual(value, 'old')
+
+    def test_single_flight_skips_uncacheable_values(self):
+        """Значение, которое нельзя кешировать, не сохраняется."""
+        single_flight('key', lambda: 'error', 60,
+                      cacheable=lambda value: value != 'error')
+        self.assertIsNone(cache.get('key'))
+
+
+class GenerationsTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_generation_bumped_again_after_commit(self):
+        """
+        Копия, сохраненная до коммита под новым номером поколения,
+        устаревает после коммита.
+        """
+        [before] = get_generations(['posts'])
+        with transaction.atomic():
+            bump_generations('posts')
+            [in_transaction] = get_generations(['posts'])
+            self.assertEqual(in_transaction, before + 1)
+        self.assertEqual(get_generations(['posts']), [before + 2])
+
+
+class QueryBudgetTests(TestCase):
+    """Ограничение количества запросов представления к БД."""
+
+    @staticmethod
+    def view(request):
+        list(get_user_model().objects.all())
+        list(get_user_model().objects.all())
+        return HttpResponse()
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    def test_query_budget_allows_queries_within_budget(self):
+        response = query_budget(2)(self.view)(self.request)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_query_budget_strict_raises(self):
+        """В тестах превышение бюджета вызывает ошибку."""
+        with self.assertRaises(QueryBudgetExceeded):
+            query_budget(1)(self.view)(self.request)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_query_budget_logs_when_not_strict(self):
+        """В работе превышение бюджета записывается в журнал."""
+        with self.assertLogs('core.decorators', 'WARNING') as logs:
+            response = query_budget(1)(self.view)(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('2 запросов к БД при бюджете 1', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_query_budget_counts_streamed_queries(self):
+        """Запросы при отправке потокового ответа входят в бюджет."""
+        def view(request):
+            return StreamingHttpResponse(
+                str(get_user_model().objects.count()) for _ in range(2)
+            )
+
+        response = query_budget(1)(view)(self.request)
+        with self.assertRaises(QueryBudgetExceeded):
+            b''.join(response.streaming_content)
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    """Метрики запросов по имени URL."""
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+
+    def test_metrics_recorded_per_url_name(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        data = metrics.as_json()['metrics']['posts:index']
+        self.assertEqual(data['request_seconds']['count'], 2)
+        self.assertGreater(data['db_queries']['sum'], 0)
+        self.assertGreater(data['template_seconds']['sum'], 0)
+        # Вторая страница отдана из кеша
+        self.assertEqual(data['cache_hits']['sum'], 1)
+        self.assertEqual(data['cache_misses']['sum'], 1)
+
+    @override_settings(STREAM_LISTINGS=True)
+    def test_metrics_measure_streamed_response(self):
+        """Потоковый ответ измеряется, пока не отправлен целиком."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('posts:index', metrics.as_json()['metrics'])
+        b''.join(response.streaming_content)
+        data = metrics.as_json()['metrics']['posts:index']
+        self.assertEqual(data['request_seconds']['count'], 1)
+        self.assertEqual(data['db_queries']['sum'], 1)
+        self.assertGreater(data['template_seconds']['sum'], 0)
+
+    def test_metrics_prometheus_format(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('core:metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_seconds histogram', text)
+        self.assertIn(
+            'yatube_request_seconds_bucket{view="posts:index",le="+Inf"} 1',
+            text
+        )
+        self.assertIn('yatube_db_queries_count{view="posts:index"} 1', text)
+
+    def test_metrics_require_token_or_staff(self):
+        """Без токена метрики доступны только сотрудникам."""
+        for url in (reverse('core:metrics'), reverse('core:metrics_json')):
+            with self.subTest(url=url):
+                response = self.client.get(url,
+                                           HTTP_AUTHORIZATION='Bearer wrong')
+                self.assertEqual(response.status_code, 302)
+        staff = get_user_model().objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('core:metrics_json'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_task_metrics_shared_between_processes(self):
+        """Метрики задач исполнителя отдаются из общего кеша."""
+        metrics.observe_task('thumbnails', 'thumbnail_seconds', 0.3)
+        metrics.observe_task('thumbnails', 'thumbnail_seconds', 0.003)
+        # Веб-процесс: своя память, общий кеш
+        other = metrics.SharedRegistry(metrics.TASK_METRICS)
+        total, window = other.snapshot()['thumbnails', 'thumbnail_seconds']
+        self.assertEqual((total.count, window.count), (2, 2))
+        self.assertAlmostEqual(total.sum, 0.303)
+        self.assertEqual(window.quantile(0.5), 0.005)
+        self.assertIn(
+            'yatube_thumbnail_seconds_count{view="thumbnails"} 2',
+            metrics.prometheus()
+        )
+        later = time.time() + settings.METRICS_WINDOW * 2
+        with mock.patch('core.metrics.time.time', return_value=later):
+            total, window = other.snapshot()['thumbnails',
+                                             'thumbnail_seconds']
+        self.assertEqual((total.count, window.count), (2, 0))
+
+    def test_rolling_histogram_forgets_old_values(self):
+        histogram = metrics.RollingHistogram(metrics.TIME_BUCKETS, 10)
+        histogram.observe(0.5, now=0)
+        histogram.observe(0.002, now=15)
+        window = histogram.window(now=15)
+        self.assertEqual(window.count, 1)
+        self.assertEqual(window.quantile(0.99), 0.0025)
+        self.assertEqual(histogram.total.count, 2)
+
+
+def templates_setting(loaders):
+    backend = settings.TEMPLATES[0]
+    return [dict(backend,
+                 OPTIONS=dict(backend['OPTIONS'], loaders=loaders))]
+
+
+class TemplateCacheTests(SimpleTestCase):
+    @override_settings(TEMPLATES=templates_setting(
+        [('django.template.loaders.cached.Loader',
+          settings.TEMPLATE_LOADERS)]
+    ))
+    def test_warm_up_compiles_project_templates(self):
+        count = sum(name.endswith('.html')
+                    for _, _, names in os.walk(settings.TEMPLATES_DIR)
+                    for name in names)
+        self.assertEqual(warm_up_templates(), count)
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertIn('posts/index.html', loader.get_template_cache)
+
+    @override_settings(TEMPLATES=templates_setting(settings.TEMPLATE_LOADERS))
+    def test_warm_up_skipped_without_cached_loader(self):
+        self.assertEqual(warm_up_templates(), 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Чтение с реплик в представлениях, которые только читают."""
+
+    router = ReplicaRouter()
+
+    def test_reads_routed_to_replica_in_read_only_views(self):
+        model = get_user_model()
+        view = read_only(lambda: self.router.db_for_read(model))
+        self.assertEqual(view(), 'replica')
+        self.assertIsNone(self.router.db_for_read(model))
+        self.assertIsNone(self.router.db_for_write(model))
+
+    def test_streamed_reads_routed_to_replica(self):
+        """Потоковый ответ читает реплику и после возврата из представления."""
+        model = get_user_model()
+        view = read_only(lambda: StreamingHttpResponse(
+            self.router.db_for_read(model) or 'default' for _ in range(1)
+        ))
+        self.assertEqual(b''.join(view().streaming_content), b'replica')
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+
+class SQLitePragmasTests(TransactionTestCase):
+    def test_sqlite_pragmas_applied(self):
+        """Настройки SQLITE_PRAGMAS применяются к соединению."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Только для SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_sqlite_pragmas_not_counted(self):
+        """Настройка соединения не входит в бюджет запросов."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Только для SQLite')
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            configure_sqlite(None, connection)
+        self.assertEqual(queries, [])
+
+
+@skipUnless('replica' in settings.DATABASES,
+            'База replica есть в настройках yatube.settings_test')
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryStickinessTests(TestCase):
+    """
+    Пользователь видит свои изменения сразу, остальные — после
+    репликации. Реплика — отдельная пустая база replica.
+    """
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create_user('author')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_reads_from_primary_after_write(self):
+        response = self.author_client.post(reverse('posts:post_create'),
+                                           {'text': 'Новый пост'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        post_url = reverse('posts:post_detail',
+                           args=[self.author.posts.get().pk])
+        # Остальные читают еще не обновленную реплику, автор — основную
+        # базу
+        self.assertEqual(Client().get(post_url).status_code, 404)
+        self.assertEqual(self.author_client.get(post_url).status_code, 200)
+
+    def test_reads_from_replica_after_window(self):
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Новый пост'})
+        self.author_client.cookies[STICKY_COOKIE] = '0'
+        post_url = reverse('posts:post_detail',
+                           args=[self.author.posts.get().pk])
+        self.assertEqual(self.author_client.get(post_url).status_code, 404)
+
+    def test_cached_replica_page_not_shown_after_write(self):
+        """
+        Страница, закешированная с реплики другим пользователем,
+        не скрывает от автора его новый пост.
+        """
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Новый пост'})
+        index_url = reverse('posts:index')
+        self.assertNotContains(Client().get(index_url), 'Новый пост')
+        self.assertContains(self.author_client.get(index_url), 'Новый пост')
+
+    def test_replica_pages_without_validators(self):
+        """Страница с реплики может быть устаревшей, ETag у нее нет."""
+        for _ in range(2):
+            response = Client().get(reverse('posts:index'))
+            self.assertFalse(response.has_header('ETag'))
+
+    def test_reads_do_not_stick_to_primary(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        task_calls.clear()
+
+    def test_tasks_run_by_worker(self):
+        """Задачи выполняются командой run_tasks и удаляются."""
+        tasks.enqueue('tests.record', 'a')
+        tasks.enqueue('tests.record', 'b')
+        self.assertEqual(task_calls, [])
+        call_command('run_tasks', '--once', stdout=StringIO())
+        self.assertEqual(task_calls, ['a', 'b'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_tasks_deduplicated_by_key(self):
+        """Ждущая задача с тем же ключом не дублируется."""
+        for _ in range(3):
+            tasks.enqueue('tests.record', 'a', key='record:a')
+        self.assertEqual(Task.objects.count(), 1)
+        # Взятая задача снимает ключ: новое изменение ставит новую задачу
+        tasks.claim(1)
+        tasks.enqueue('tests.record', 'a', key='record:a')
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_claimed_task_not_taken_twice(self):
+        """Взятую задачу не берет другой исполнитель до конца аренды."""
+        tasks.enqueue('tests.record', 'a')
+        self.assertEqual(len(tasks.claim(10)), 1)
+        self.assertEqual(tasks.claim(10), [])
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        self.assertEqual(len(tasks.claim(10)), 1)
+
+    @override_settings(TASK_MAX_ATTEMPTS=2)
+    def test_failed_task_retried(self):
+        """Задача с ошибкой откладывается, затем отмечается невыполненной."""
+        tasks.enqueue('tests.record', 'fail')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run(once=True)
+        task = Task.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertFalse(task.failed)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertIn('Ошибка задачи', task.last_error)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run(once=True)
+        task.refresh_from_db()
+        self.assertTrue(task.failed)
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_post_side_effects_queued(self):
+        """Лента подписчика заполняется исполнителем, а не в запросе."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        tasks.run(once=True)
+        post = Post.objects.create(text='Пост', author=author)
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        tasks.run(once=True)
+        self.assertTrue(FeedItem.objects.filter(user=reader,
+                                                post=post).exists())
+
+    @override_settings(CACHE_URL='')
+    def test_worker_requires_shared_cache(self):
+        """Без TASKS_EAGER проверка требует общий кеш."""
+        self.assertEqual([error.id for error in check_shared_cache(None)],
+                         ['core.E001'])
+        with override_settings(CACHE_URL='redis://127.0.0.1:6379/0'):
+            self.assertEqual(check_shared_cache(None), [])
+        with override_settings(TASKS_EAGER=True):
+            self.assertEqual(check_shared_cache(None), [])
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    # Счетчики попаданий в кеш
+    path('cache/', views.cache_stats, name='cache_stats'),
+    # Метрики запросов
+    path('metrics/', views.metrics_prometheus, name='metrics'),
+    path('metrics.json', views.metrics_json, name='metrics_json'),
+]
@@ -1,14 +1,55 @@
+import datetime as dt
+from argparse import ArgumentTypeError
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .paginator import CursorPaginator
 
 # Колчичество постов на страницу
 COUNT_PAGES = settings.COUNT_PAGES_PAGINATOR
 
 
 # Паджинация
-def get_pages(request, posts):
-    paginator = Paginator(posts, COUNT_PAGES)
+def get_pages(request, posts, per_page=COUNT_PAGES, stream=False,
+              prepare=None, **kwargs):
+    """
+    Возвращает страницу записей по курсору из ?cursor=...
+
+    Старые ссылки вида ?page=N продолжают работать через OFFSET.
+    При stream=True записи выбираются по мере отрисовки потокового
+    ответа (CursorPaginator.stream_page), а prepare(rows) вызывается
+    для каждой порции записей.
+    """
+    paginator = CursorPaginator(posts, per_page, **kwargs)
     page_number = request.GET.get('page')
+    if page_number is not None and 'cursor' not in request.GET:
+        page = paginator.get_page(page_number)
+    elif stream:
+        return paginator.stream_page(request.GET.get('cursor'), prepare)
+    else:
+        # Возвращаем набор записей для страницы после переданного курсора
+        page = paginator.get_cursor_page(request.GET.get('cursor'))
+    if prepare:
+        prepare(page.object_list)
+    return page
+
 
-    # Возвращаем набор записей для страницы с запрошенным номером
-    return paginator.get_page(page_number)
+def parse_moment(value):
+    """
+    Момент времени из аргумента команды: дата или дата и время
+    в ISO 8601. Время без часового пояса считается в TIME_ZONE.
+    """
+    try:
+        moment = parse_datetime(value)
+        date = parse_date(value) if moment is None else None
+    except ValueError:
+        moment = date = None
+    if moment is None and date is None:
+        raise ArgumentTypeError(f'Неверная дата: {value}')
+    if moment is None:
+        moment = dt.datetime.combine(date, dt.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
@@ -1,4 +1,13 @@
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics
+from .cache import all_cache_stats
 
 
 def page_not_found(request, exception):
@@ -19,3 +28,40 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def cache_stats(request):
+    """Счетчики попаданий и промахов кешей текущего процесса."""
+    return JsonResponse(all_cache_stats())
+
+
+def metrics_access(view_func):
+    """
+    Доступ к метрикам для сотрудников и для сборщика метрик
+    с заголовком Authorization: Bearer <METRICS_TOKEN>.
+    """
+    staff_view = staff_member_required(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = settings.METRICS_TOKEN
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and constant_time_compare(header, f'Bearer {token}'):
+            return view_func(request, *args, **kwargs)
+        return staff_view(request, *args, **kwargs)
+    return wrapper
+
+
+@metrics_access
+def metrics_prometheus(request):
+    """Метрики запросов в формате Prometheus."""
+    return HttpResponse(metrics.prometheus(),
+                        content_type='text/plain; version=0.0.4')
+
+
+@metrics_access
+def metrics_json(request):
+    """Метрики запросов за последние METRICS_WINDOW секунд."""
+    return JsonResponse(metrics.as_json(),
+                        json_dumps_params={'ensure_ascii': False})
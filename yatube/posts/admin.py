@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from search.admin import IndexedSearchMixin
 from .models import Comment, Follow, Group, Post
 
 
@@ -7,17 +8,19 @@ class CommentInline(admin.TabularInline):
     model = Comment
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
         'created',
+        'updated',
         'author',
         'group',
     )
     inlines = [CommentInline]
     list_editable = ('group',)
     search_fields = ('text',)
+    search_kind = 'post'
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
@@ -33,13 +36,15 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = (
         'text',
         'post',
         'author',
     )
     search_fields = ('text', 'author__username')
+    search_kind = 'comment'
+    search_exact_fields = ('author__username',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
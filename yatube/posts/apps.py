@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        # Регистрация фрагментов, сигналов и фоновых задач
+        from . import feed, fragments, signals  # noqa: F401
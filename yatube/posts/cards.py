@@ -0,0 +1,40 @@
+"""
+Кеш отрисованных карточек постов (posts/includes/post_list.html).
+
+Карточка не зависит от пользователя, поэтому одна закешированная
+копия используется на всех страницах со списками постов.
+Дата изменения поста входит в ключ кеша, поэтому после любого
+изменения поста, в том числе массового, карточка отрисовывается
+заново. Кеш карточек автора сбрасывается при изменении его имени.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from core.cache import cache_stats, single_flight
+
+CARD_TEMPLATE = 'posts/includes/post_list.html'
+
+stats = cache_stats('post_card')
+
+
+def card_key(post):
+    return f'post_card:{post.pk}:{int(post.updated.timestamp() * 10**6)}'
+
+
+def render_card(post):
+    """Возвращает HTML карточки поста из кеша или отрисовывает его."""
+    return single_flight(
+        card_key(post),
+        lambda: render_to_string(CARD_TEMPLATE, {'post': post}),
+        settings.POST_CARD_CACHE_TIMEOUT,
+        stats=stats,
+    )
+
+
+def invalidate(*posts):
+    cache.delete_many([card_key(post) for post in posts])
+
+
+def invalidate_author(author):
+    invalidate(*author.posts.only('pk', 'updated'))
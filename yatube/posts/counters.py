@@ -0,0 +1,163 @@
+"""
+Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики меняются выражениями F() в той же транзакции, что и запись,
+которая их затрагивает. Расхождения (например, после массовых операций
+в обход сигналов) исправляет команда reconcile_counters.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _change(queryset, delta, *fields):
+    if delta:
+        queryset.update(**{field: F(field) + delta for field in fields})
+
+
+def user_stats(user):
+    """Счетчики пользователя; создаются с пересчетом, если их еще нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        UserStats.objects.get_or_create(user=user)
+        stats = UserStats.objects.filter(user=user)
+        _reconcile(stats, _user_counters())
+        return stats.get()
+
+
+def count_post(post, delta):
+    """Пост создан (delta=1) или удален (delta=-1)."""
+    _change(UserStats.objects.filter(user_id=post.author_id), delta,
+            'posts_count')
+    if post.group_id:
+        _change(Group.objects.filter(pk=post.group_id), delta,
+                'posts_count')
+
+
+def count_group_change(post):
+    """Пост перенесен в другую группу."""
+    old_group_id = getattr(post, '_loaded_group_id', post.group_id)
+    if old_group_id == post.group_id:
+        return
+    if old_group_id:
+        _change(Group.objects.filter(pk=old_group_id), -1, 'posts_count')
+    if post.group_id:
+        _change(Group.objects.filter(pk=post.group_id), 1, 'posts_count')
+
+
+def count_created_posts(posts):
+    """Счетчики для постов, созданных через bulk_create."""
+    authors = Counter(post.author_id for post in posts)
+    groups = Counter(post.group_id for post in posts if post.group_id)
+    for author_id, delta in authors.items():
+        _change(UserStats.objects.filter(user_id=author_id), delta,
+                'posts_count')
+    for group_id, delta in groups.items():
+        _change(Group.objects.filter(pk=group_id), delta, 'posts_count')
+
+
+def count_comment(comment, delta):
+    _change(Post.objects.filter(pk=comment.post_id), delta,
+            'comments_count')
+
+
+def count_follow(follow, delta):
+    _change(UserStats.objects.filter(user_id=follow.author_id), delta,
+            'followers_count')
+    _change(UserStats.objects.filter(user_id=follow.user_id), delta,
+            'following_count')
+
+
+def _change_users(deltas, field):
+    """
+    Меняет счетчик field пользователей на разные величины
+    {user_id: delta}: один запрос на каждую величину, а не на
+    каждого пользователя.
+    """
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        _change(UserStats.objects.filter(user_id__in=user_ids), delta, field)
+
+
+def count_follows(pairs, delta):
+    """
+    Подписки (user_id, author_id), созданные (delta=1) или удаленные
+    (delta=-1) массово, в обход сигналов.
+    """
+    authors = Counter(author_id for _, author_id in pairs)
+    users = Counter(user_id for user_id, _ in pairs)
+    _change_users({pk: count * delta for pk, count in authors.items()},
+                  'followers_count')
+    _change_users({pk: count * delta for pk, count in users.items()},
+                  'following_count')
+
+
+def _actual(model, field, outer='pk'):
+    """Подзапрос с фактическим количеством связанных записей."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def _reconcile(queryset, counters):
+    """
+    Исправляет счетчики, расходящиеся с фактическими значениями.
+    counters — словарь {поле счетчика: выражение фактического значения}.
+    Возвращает количество исправленных записей.
+    """
+    actual = {f'actual_{field}': value for field, value in counters.items()}
+    fixed = 0
+    for obj in queryset.annotate(**actual).iterator():
+        values = {field: getattr(obj, f'actual_{field}')
+                  for field in counters}
+        if any(getattr(obj, field) != value
+               for field, value in values.items()):
+            queryset.filter(pk=obj.pk).update(**values)
+            fixed += 1
+    return fixed
+
+
+def _user_counters():
+    return {
+        'posts_count': _actual(Post, 'author', 'user_id'),
+        'followers_count': _actual(Follow, 'author', 'user_id'),
+        'following_count': _actual(Follow, 'user', 'user_id'),
+    }
+
+
+def reconcile_user_stats():
+    """Создает недостающие счетчики пользователей с нулевыми значениями."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    return len(UserStats.objects.bulk_create(
+        UserStats(user_id=user_id) for user_id in missing
+    ))
+
+
+def reconcile():
+    """
+    Пересчитывает все счетчики.
+    Возвращает словарь {счетчик: количество исправленных записей}.
+    """
+    created = reconcile_user_stats()
+    return {
+        'UserStats (созданы)': created,
+        'UserStats': _reconcile(UserStats.objects.all(), _user_counters()),
+        'Group': _reconcile(Group.objects.all(), {
+            'posts_count': _actual(Post, 'group'),
+        }),
+        'Post': _reconcile(Post.objects.all(), {
+            'comments_count': _actual(Comment, 'post'),
+        }),
+    }
@@ -0,0 +1,260 @@
+"""
+Лента подписок (fan-out on write).
+
+Новый пост раскладывается в ленты подписчиков автора (FeedItem)
+фоновой задачей (core.tasks) сразу после публикации.
+Для авторов, у которых подписчиков больше FEED_FANOUT_THRESHOLD,
+раскладка не выполняется: их посты подмешиваются в ленту при чтении.
+Такие авторы отмечаются флагом UserStats.feed_on_read при раскладке
+первого поста после превышения порога. Когда после отписок подписчиков
+становится не больше порога, все посты автора раскладываются в ленты
+подписчиков и флаг снимается: посты, опубликованные, пока автор был
+популярным, не пропадают из лент.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from core import tasks
+from core.cache import get_generations
+from core.paginator import DEFAULT_KEYS
+from core.utils import get_pages
+from . import generations
+from .models import FeedItem, Follow, Post, UserStats
+
+# Ключ паджинации ленты: дата поста и его id
+FEED_KEYS = ('created', 'post_id')
+
+
+def _feed_on_read(author_id):
+    """
+    Посты автора подмешиваются в ленты при чтении. Автор, у которого
+    подписчиков стало больше FEED_FANOUT_THRESHOLD, отмечается здесь.
+    """
+    stats = UserStats.objects.filter(user_id=author_id).values(
+        'followers_count', 'feed_on_read'
+    ).first()
+    if stats is None:
+        return False
+    if (not stats['feed_on_read']
+            and stats['followers_count'] > settings.FEED_FANOUT_THRESHOLD):
+        UserStats.objects.filter(user_id=author_id).update(feed_on_read=True)
+        generations.feed_on_read_changed()
+        return True
+    return stats['feed_on_read']
+
+
+def _restore_fan_out(author_ids):
+    """
+    Раскладывает в ленты подписчиков все посты авторов, у которых после
+    отписок подписчиков стало не больше FEED_FANOUT_THRESHOLD.
+    """
+    authors = list(UserStats.objects.filter(
+        user_id__in=author_ids,
+        feed_on_read=True,
+        followers_count__lte=settings.FEED_FANOUT_THRESHOLD
+    ).values_list('user_id', flat=True))
+    if not authors:
+        return
+    placeholders = ', '.join(['%s'] * len(authors))
+    _insert_items(
+        f'SELECT f.user_id, p.id, p.created '
+        f'FROM {Follow._meta.db_table} f '
+        f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+        f'WHERE f.author_id IN ({placeholders})',
+        authors
+    )
+    # Флаг снимается после раскладки: до этого посты подмешиваются
+    # при чтении
+    UserStats.objects.filter(user_id__in=authors).update(feed_on_read=False)
+    generations.feed_on_read_changed()
+
+
+def _insert_items(select, params):
+    """
+    Добавляет в ленты строки (user_id, post_id, created) из подзапроса
+    одним запросом INSERT ... SELECT, сколько бы их ни было.
+    Уже существующие записи пропускаются: в SQLite — INSERT OR IGNORE,
+    который, в отличие от ON CONFLICT (3.24), есть в любой версии.
+    """
+    sqlite = connection.vendor == 'sqlite'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT {"OR IGNORE " if sqlite else ""}'
+            f'INTO {FeedItem._meta.db_table} '
+            f'(user_id, post_id, created) {select}'
+            f'{"" if sqlite else " ON CONFLICT DO NOTHING"}',
+            params
+        )
+
+
+def _follows(user_id, author_id):
+    return Follow.objects.filter(user_id=user_id,
+                                 author_id=author_id).exists()
+
+
+@tasks.register('feed.fan_out')
+def fan_out(post_id):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'created'
+    ).first()
+    if post is None or _feed_on_read(post['author_id']):
+        return
+    _insert_items(
+        f'SELECT user_id, %s, %s FROM {Follow._meta.db_table} '
+        f'WHERE author_id = %s',
+        [post_id, connection.ops.adapt_datetimefield_value(post['created']),
+         post['author_id']]
+    )
+    generations.feeds_changed()
+
+
+@tasks.register('feed.backfill')
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    # Пока задача ждала, пользователь мог отписаться
+    if (not _follows(user_id, author_id)
+            or UserStats.objects.filter(user_id=author_id,
+                                        feed_on_read=True).exists()):
+        return
+    _insert_items(
+        f'SELECT %s, id, created FROM {Post._meta.db_table} '
+        f'WHERE author_id = %s',
+        [user_id, author_id]
+    )
+    generations.feed_changed(user_id)
+
+
+@tasks.register('feed.backfill_follows')
+def backfill_follows(follow_ids):
+    """
+    Добавляет в ленты прежние посты авторов для подписок follow_ids,
+    созданных массово, одним запросом на все подписки.
+    """
+    if not follow_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(follow_ids))
+    _insert_items(
+        f'SELECT f.user_id, p.id, p.created '
+        f'FROM {Follow._meta.db_table} f '
+        f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+        f'WHERE f.id IN ({placeholders}) AND f.author_id NOT IN ('
+        f'SELECT user_id FROM {UserStats._meta.db_table} '
+        f'WHERE feed_on_read = %s)',
+        [*follow_ids, True]
+    )
+    generations.feed_changed(*Follow.objects.filter(
+        pk__in=follow_ids
+    ).values_list('user_id', flat=True).distinct())
+
+
+def rebuild():
+    """
+    Заново раскладывает посты в ленты всех подписчиков, например
+    после массового создания подписок и постов в обход сигналов.
+    """
+    FeedItem.objects.all().delete()
+    popular = Q(followers_count__gt=settings.FEED_FANOUT_THRESHOLD)
+    UserStats.objects.filter(popular).update(feed_on_read=True)
+    UserStats.objects.exclude(popular).update(feed_on_read=False)
+    _insert_items(
+        f'SELECT f.user_id, p.id, p.created '
+        f'FROM {Follow._meta.db_table} f '
+        f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+        f'WHERE f.author_id NOT IN ('
+        f'SELECT user_id FROM {UserStats._meta.db_table} '
+        f'WHERE feed_on_read = %s)',
+        [True]
+    )
+    generations.feed_on_read_changed()
+
+
+@tasks.register('feed.prune')
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    # Пока задача ждала, пользователь мог подписаться снова
+    if _follows(user_id, author_id):
+        return
+    FeedItem.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+    generations.feed_changed(user_id)
+    _restore_fan_out([author_id])
+
+
+@tasks.register('feed.prune_follows')
+def prune_follows(pairs):
+    """
+    Убирает из лент посты авторов после массовой отписки: один
+    запрос на каждого подписчика, а не на каждую подписку.
+    """
+    authors = defaultdict(set)
+    for user_id, author_id in pairs:
+        authors[user_id].add(author_id)
+    for user_id, author_ids in authors.items():
+        # Пока задача ждала, пользователь мог подписаться снова
+        author_ids = author_ids - set(Follow.objects.filter(
+            user_id=user_id, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+        if author_ids:
+            FeedItem.objects.filter(
+                user_id=user_id, post__author_id__in=author_ids
+            ).delete()
+    generations.feed_changed(*authors)
+    _restore_fan_out({author_id for _, author_id in pairs})
+
+
+def popular_authors(user):
+    """
+    Авторы из подписок пользователя, чьи посты читаются напрямую.
+    Хранятся в кеше, пока не изменятся подписки пользователя или
+    флаги feed_on_read авторов.
+    """
+    versions = get_generations([generations.follows(user.pk),
+                                generations.FEED_ON_READ])
+    key = f'feed_on_read:{user.pk}:{".".join(map(str, versions))}'
+    authors = cache.get(key)
+    if authors is None:
+        authors = list(
+            UserStats.objects.filter(
+                user__in=Follow.objects.filter(user=user).values('author'),
+                feed_on_read=True
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(key, authors, settings.PAGE_CACHE_TIMEOUT)
+    return authors
+
+
+def feed_source(user):
+    """
+    Выборка ленты подписок и ее ключ паджинации.
+
+    Если пользователь подписан только на обычных авторов, это записи
+    FeedItem, выбираемые по индексу. Иначе к разложенным постам
+    подмешиваются посты популярных авторов (fan-out on read).
+    Курсоры в обоих случаях совместимы: (дата поста, id поста).
+    """
+    popular = popular_authors(user)
+    if popular:
+        return Post.objects.filter(
+            Q(id__in=FeedItem.objects.filter(user=user).values('post'))
+            | Q(author__in=popular)
+        ), DEFAULT_KEYS
+    return FeedItem.objects.filter(user=user), FEED_KEYS
+
+
+def get_feed_page(request, user):
+    """Возвращает страницу ленты подписок (см. feed_source)."""
+    source, keys = feed_source(user)
+    if source.model is Post:
+        return get_pages(request, source.select_related('author', 'group'))
+
+    items = source.select_related('post__author', 'post__group')
+    page_obj = get_pages(request, items, keys=keys)
+    page_obj.object_list = [item.post for item in page_obj]
+    return page_obj
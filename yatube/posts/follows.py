@@ -0,0 +1,167 @@
+"""
+Массовые подписки и отписки.
+
+Подписки создаются одним запросом INSERT ... ON CONFLICT DO NOTHING:
+уже существующие пропускает ограничение unique_follow. Сигналы при этом
+не отправляются, поэтому счетчики, ленты и поколения страниц
+обновляются здесь же, пакетами, а не по одной подписке: прежние посты
+авторов попадают в ленты одной фоновой задачей на пакет.
+
+INSERT и DELETE возвращают (RETURNING) только те подписки, которые
+они действительно создали или удалили, поэтому счетчики меняются ровно
+на них, даже если ту же подписку одновременно создал или удалил другой
+запрос. SQLite поддерживает RETURNING с версии 3.35; в более старых
+созданные и удаленные подписки вычисляются по существующим до записи:
+пишущие транзакции SQLite не выполняются одновременно, а транзакция,
+прочитавшая данные до чужой записи, не может записать сама.
+"""
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core import tasks
+from . import counters, generations
+from .models import Follow, User
+
+# Подписок в одном пакете (и в одной транзакции). Пакет меньше, если
+# СУБД ограничивает количество параметров запроса (см. _batches).
+BATCH_SIZE = 500
+
+
+def _can_return_rows():
+    """INSERT ... RETURNING и DELETE ... RETURNING поддерживаются."""
+    return (connection.vendor != 'sqlite'
+            or connection.Database.sqlite_version_info >= (3, 35))
+
+
+def _batches(pairs):
+    pairs = list(dict.fromkeys(
+        (user_id, author_id) for user_id, author_id in pairs
+        if user_id != author_id
+    ))
+    # Два параметра на подписку
+    size = max(1, min(BATCH_SIZE, connection.ops.bulk_batch_size(
+        ['user_id', 'author_id'], pairs
+    )))
+    for start in range(0, len(pairs), size):
+        yield pairs[start:start + size]
+
+
+def _existing(pairs):
+    """Существующие подписки из pairs: {(user_id, author_id): id}."""
+    rows = Follow.objects.filter(reduce(or_, (
+        Q(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs
+    ))).values_list('user_id', 'author_id', 'id')
+    return {(user_id, author_id): pk for user_id, author_id, pk in rows}
+
+
+def _changed(pairs):
+    generations.follows_changed({user_id for user_id, _ in pairs},
+                                {author_id for _, author_id in pairs})
+
+
+def _insert_returning(pairs):
+    """Создает подписки и возвращает новые: [(id, user_id, author_id)]."""
+    placeholders = ', '.join(['(%s, %s)'] * len(pairs))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Follow._meta.db_table} (user_id, author_id) '
+            f'VALUES {placeholders} ON CONFLICT DO NOTHING '
+            f'RETURNING id, user_id, author_id',
+            [value for pair in pairs for value in pair]
+        )
+        return cursor.fetchall()
+
+
+def _insert_diff(pairs):
+    """То же без RETURNING: новые подписки — те, которых не было."""
+    existing = _existing(pairs)
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs
+         if (user_id, author_id) not in existing],
+        ignore_conflicts=True
+    )
+    return [(pk, user_id, author_id)
+            for (user_id, author_id), pk in _existing(pairs).items()
+            if (user_id, author_id) not in existing]
+
+
+@transaction.atomic
+def _follow_batch(pairs):
+    rows = (_insert_returning(pairs) if _can_return_rows()
+            else _insert_diff(pairs))
+    if not rows:
+        return 0
+    new = [(user_id, author_id) for _, user_id, author_id in rows]
+    counters.count_follows(new, 1)
+    tasks.enqueue('feed.backfill_follows', [pk for pk, _, _ in rows])
+    _changed(new)
+    return len(new)
+
+
+def follow_pairs(pairs):
+    """
+    Создает подписки (user_id, author_id). Подписки на себя и уже
+    существующие пропускаются. Возвращает количество новых подписок.
+    """
+    return sum(_follow_batch(batch) for batch in _batches(pairs))
+
+
+@transaction.atomic
+def _unfollow_batch(pairs):
+    existing = _existing(pairs)
+    if not existing:
+        return 0
+    # QuerySet.delete() отправил бы сигналы для каждой подписки
+    follow_ids = list(existing.values())
+    placeholders = ', '.join(['%s'] * len(follow_ids))
+    returning = _can_return_rows()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Follow._meta.db_table} '
+            f'WHERE id IN ({placeholders})'
+            + (' RETURNING user_id, author_id' if returning else ''),
+            follow_ids
+        )
+        removed = ([tuple(row) for row in cursor.fetchall()] if returning
+                   else list(existing))
+    if not removed:
+        return 0
+    counters.count_follows(removed, -1)
+    tasks.enqueue('feed.prune_follows', removed)
+    _changed(removed)
+    return len(removed)
+
+
+def unfollow_pairs(pairs):
+    """Удаляет подписки (user_id, author_id). Возвращает их количество."""
+    return sum(_unfollow_batch(batch) for batch in _batches(pairs))
+
+
+def follow_many(user, author_ids):
+    return follow_pairs((user.pk, author_id) for author_id in author_ids)
+
+
+def unfollow_many(user, author_ids):
+    return unfollow_pairs((user.pk, author_id) for author_id in author_ids)
+
+
+def suggested_authors(user, limit=None):
+    """
+    Авторы с постами, на которых пользователь еще не подписан,
+    от самых популярных.
+    """
+    return User.objects.filter(
+        stats__posts_count__gt=0
+    ).exclude(
+        pk=user.pk
+    ).exclude(
+        pk__in=Follow.objects.filter(user=user).values('author')
+    ).select_related('stats').order_by(
+        '-stats__followers_count', 'pk'
+    )[:limit or settings.SUGGESTED_AUTHORS_COUNT]
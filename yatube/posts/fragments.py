@@ -0,0 +1,47 @@
+"""
+Фрагменты страниц постов, зависящие от пользователя (core.personal).
+"""
+from django.template.loader import render_to_string
+
+from core import personal
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@personal.register('switcher')
+def switcher(request):
+    return render_to_string('posts/includes/switcher.html', request=request)
+
+
+@personal.register('follow_button')
+def follow_button(request, author_id, username):
+    """Кнопка подписки на странице автора."""
+    user = request.user
+    if user.pk == author_id:
+        return ''
+    following = (user.is_authenticated
+                 and Follow.objects.filter(author_id=author_id,
+                                           user=user).exists())
+    return render_to_string('posts/includes/follow_button.html', {
+        'username': username,
+        'following': following,
+    }, request=request)
+
+
+@personal.register('post_edit_button')
+def post_edit_button(request, post_id, author_id):
+    if request.user.pk != author_id:
+        return ''
+    return render_to_string('posts/includes/post_edit_button.html',
+                            {'post_id': post_id}, request=request)
+
+
+@personal.register('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string('posts/includes/comment_form.html', {
+        'post_id': post_id,
+        'form': CommentForm(),
+    }, request=request)
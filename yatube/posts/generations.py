@@ -0,0 +1,186 @@
+"""
+Поколения данных, из которых собираются закешированные страницы.
+
+Страница кешируется с номерами своих поколений в ключе (см.
+core.decorators.cache_page_by_generations), а сигналы моделей
+увеличивают номера при изменении данных.
+"""
+from django.core.cache import cache
+
+from core.cache import bump_generations
+
+from .models import Group, Post, User
+
+# Посты на главной странице
+POSTS = 'posts'
+# Названия и адреса групп, на которые ссылаются списки постов
+GROUPS = 'groups'
+# Имена пользователей, выводимые в карточках постов
+USERS = 'users'
+# Ленты подписок: посты раскладываются в них фоновой задачей
+FEEDS = 'feeds'
+# Авторы, чьи посты подмешиваются в ленты при чтении (posts.feed)
+FEED_ON_READ = 'feed_on_read'
+# Количество комментариев постов в списках постов API
+COMMENTS_COUNTS = 'comments_counts'
+
+
+def group(slug):
+    return f'group:{slug}'
+
+
+def author(username):
+    return f'author:{username}'
+
+
+def post(post_id):
+    return f'post:{post_id}'
+
+
+def follows(user_id):
+    """Подписки пользователя: из них собирается его лента."""
+    return f'follows:{user_id}'
+
+
+def author_posts(author_id):
+    """Посты автора: их количество выводится на странице поста."""
+    return f'author_posts:{author_id}'
+
+
+def user_stats(username):
+    """Счетчики подписок и подписчиков пользователя в API."""
+    return f'user_stats:{username}'
+
+
+def _post_author_key(post_id):
+    return f'post_author:{post_id}'
+
+
+def post_author(post_id):
+    """
+    id автора поста. Автор поста не меняется, поэтому запоминается
+    в кеше при сохранении поста, а запрос к БД нужен только после
+    вытеснения записи из кеша.
+    """
+    author_id = cache.get(_post_author_key(post_id))
+    if author_id is None:
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True
+        ).first()
+        if author_id is not None:
+            cache.set(_post_author_key(post_id), author_id, None)
+    return author_id
+
+
+def index_page(request):
+    return [POSTS, GROUPS, USERS]
+
+
+def group_page(request, slug):
+    return [group(slug), USERS]
+
+
+def profile_page(request, username):
+    return [author(username), GROUPS, USERS]
+
+
+def post_page(request, post_id):
+    names = [post(post_id), GROUPS, USERS]
+    author_id = post_author(post_id)
+    if author_id is not None:
+        names.append(author_posts(author_id))
+    return names
+
+
+def follow_page(request):
+    # Лента меняется с любым новым постом: поколения каждого
+    # подписчика при раскладке поста не увеличиваются
+    return [follows(request.user.pk), FEEDS, POSTS, GROUPS, USERS]
+
+
+def api_index_page(request):
+    return [*index_page(request), COMMENTS_COUNTS]
+
+
+def api_group_page(request, slug):
+    return [*group_page(request, slug), COMMENTS_COUNTS]
+
+
+def api_profile_page(request, username):
+    return [*profile_page(request, username), COMMENTS_COUNTS,
+            user_stats(username)]
+
+
+def api_follow_page(request):
+    return [*follow_page(request), COMMENTS_COUNTS]
+
+
+def post_changed(instance):
+    """Пост создан, изменен или удален."""
+    group_ids = {instance.group_id,
+                 getattr(instance, '_loaded_group_id', None)} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    ) if group_ids else []
+    cache.set(_post_author_key(instance.pk), instance.author_id, None)
+    bump_generations(
+        POSTS,
+        author(instance.author.username),
+        author_posts(instance.author_id),
+        post(instance.pk),
+        *(group(slug) for slug in slugs),
+    )
+
+
+def group_changed(*slugs):
+    bump_generations(GROUPS, *(group(slug) for slug in slugs))
+
+
+def comment_changed(instance):
+    bump_generations(post(instance.post_id), COMMENTS_COUNTS)
+
+
+def follow_changed(instance):
+    """
+    Кнопка подписки на странице автора, лента подписчика и счетчики
+    подписок обоих в API.
+    """
+    bump_generations(author(instance.author.username),
+                     follows(instance.user_id),
+                     user_stats(instance.author.username),
+                     user_stats(instance.user.username))
+
+
+def feeds_changed():
+    """Новый пост разложен в ленты подписчиков."""
+    bump_generations(FEEDS)
+
+
+def feed_on_read_changed():
+    """Посты авторов перестали или начали раскладываться по лентам."""
+    bump_generations(FEED_ON_READ, FEEDS)
+
+
+def feed_changed(*user_ids):
+    """В ленты подписчиков добавлены или из них убраны посты авторов."""
+    bump_generations(*(follows(user_id) for user_id in user_ids))
+
+
+def follows_changed(user_ids, author_ids):
+    """
+    Подписки созданы или удалены массово: кнопки подписки на страницах
+    авторов, ленты подписчиков и счетчики подписок в API.
+    """
+    usernames = dict(User.objects.filter(
+        pk__in={*user_ids, *author_ids}
+    ).values_list('pk', 'username'))
+    bump_generations(
+        *(author(usernames[author_id]) for author_id in author_ids
+          if author_id in usernames),
+        *(follows(user_id) for user_id in user_ids),
+        *(user_stats(username) for username in usernames.values()),
+    )
+
+
+def user_changed(*usernames):
+    bump_generations(USERS, *(author(username) for username in usernames))
@@ -0,0 +1,206 @@
+"""
+Синтетические данные для нагрузочного тестирования.
+
+Популярность авторов, групп и постов распределена по закону Ципфа,
+а количество подписок пользователя — по закону Парето: немногие авторы
+собирают большую часть подписчиков, как в настоящей социальной сети.
+При одинаковом --seed данные получаются одинаковыми.
+"""
+import datetime as dt
+import io
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import counters, feed, thumbnails
+from posts.models import Comment, Follow, Group, Post, User
+from search import index
+
+# Пароль всех созданных пользователей
+PASSWORD = 'password'
+# Количество разных изображений: посты с картинками ссылаются на них,
+# поэтому миниатюры создаются для каждого изображения один раз
+IMAGE_COUNT = 20
+IMAGE_SIZE = (1200, 800)
+# Доля постов в группах
+GROUP_SHARE = 0.7
+# Посты распределены по последним DAYS дням
+DAYS = 365
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса k-го по популярности элемента: 1 / k^exponent."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def follow_count(rng, mean, exponent, limit):
+    """Количество подписок пользователя с распределением Парето."""
+    scale = mean * (exponent - 1) / exponent
+    return min(limit, round(scale * rng.paretovariate(exponent)))
+
+
+class Command(BaseCommand):
+    help = ('Создает пользователей, группы, посты с изображениями, '
+            'комментарии и подписки для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=float, default=20,
+                            help='Среднее количество подписок.')
+        parser.add_argument('--images', type=float, default=0.3,
+                            help='Доля постов с изображением.')
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Показатель закона Ципфа популярности.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='user',
+                            help='Начало имен создаваемых пользователей.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(
+            username__startswith=options['prefix']
+        ).exists():
+            raise CommandError(
+                f'Пользователи {options["prefix"]}* уже есть, '
+                f'задайте другой --prefix'
+            )
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.zipf = options['zipf']
+
+        with transaction.atomic():
+            users = self.create_users(options['users'], options['prefix'])
+            groups = self.create_groups(options['groups'],
+                                        options['prefix'])
+            posts = self.create_posts(users, groups, options['posts'],
+                                      options['images'])
+            self.create_comments(users, posts, options['comments'])
+            self.create_follows(users, options['follows'])
+            counters.reconcile()
+            feed.rebuild()
+            index.rebuild()
+        self.create_thumbnails(posts)
+        # Данные созданы в обход сигналов, поэтому кеш страниц устарел
+        cache.clear()
+        self.stdout.write(
+            f'Создано: пользователей {len(users)}, групп {len(groups)}, '
+            f'постов {len(posts)}, комментариев {options["comments"]}, '
+            f'подписок {Follow.objects.count()}'
+        )
+
+    def choose(self, items, weights, count=1):
+        return self.rng.choices(items, cum_weights=weights, k=count)
+
+    def create_users(self, count, prefix):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (User(username=f'{prefix}{number}', password=password,
+                  first_name=self.fake.first_name(),
+                  last_name=self.fake.last_name())
+             for number in range(count))
+        )
+        users = list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk'))
+        # Популярность авторов не зависит от порядка создания
+        self.rng.shuffle(users)
+        return users
+
+    def create_groups(self, count, prefix):
+        Group.objects.bulk_create(
+            Group(title=self.fake.catch_phrase(),
+                  slug=f'{prefix}-group-{number}',
+                  description=self.fake.paragraph())
+            for number in range(count)
+        )
+        return list(Group.objects.filter(
+            slug__startswith=f'{prefix}-group-'
+        ).order_by('pk'))
+
+    def create_images(self):
+        names = []
+        for number in range(IMAGE_COUNT):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            content = io.BytesIO()
+            Image.new('RGB', IMAGE_SIZE, color).save(content, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/generated_{number}.jpg',
+                ContentFile(content.getvalue())
+            ))
+        return names
+
+    def create_posts(self, users, groups, count, image_share):
+        images = self.create_images() if image_share else []
+        authors = self.choose(users, zipf_weights(len(users), self.zipf),
+                              count)
+        group_weights = zipf_weights(len(groups), self.zipf)
+        posts = []
+        for author in authors:
+            group = None
+            if groups and self.rng.random() < GROUP_SHARE:
+                group = self.choose(groups, group_weights)[0]
+            image = ''
+            if images and self.rng.random() < image_share:
+                image = self.rng.choice(images)
+            posts.append(Post(text=self.fake.text(), author=author,
+                              group=group, image=image))
+        Post.objects.bulk_create(posts)
+        # Не все базы данных возвращают pk созданных записей
+        posts = list(Post.objects.filter(author__in=users).order_by('pk'))
+        # Дата создания проставляется при сохранении, поэтому посты
+        # распределяются по времени отдельным запросом
+        now = timezone.now()
+        for post in posts:
+            post.created = post.updated = now - dt.timedelta(
+                seconds=self.rng.randrange(DAYS * 24 * 60 * 60)
+            )
+        Post.objects.bulk_update(posts, ['created', 'updated'])
+        return posts
+
+    def create_comments(self, users, posts, count):
+        if not posts:
+            return
+        # Обсуждения тоже сосредоточены вокруг немногих постов
+        post_weights = zipf_weights(len(posts), self.zipf)
+        user_weights = zipf_weights(len(users), self.zipf)
+        pairs = zip(self.choose(posts, post_weights, count),
+                    self.choose(users, user_weights, count))
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text=self.fake.sentence())
+            for post, author in pairs
+        )
+
+    def create_follows(self, users, mean):
+        weights = zipf_weights(len(users), self.zipf)
+        follows = []
+        for user in users:
+            count = follow_count(self.rng, mean, 1.5, len(users) - 1)
+            # Популярных авторов выбирают чаще, поэтому выбирается
+            # с запасом, а повторы отбрасываются
+            authors = dict.fromkeys(
+                author.pk for author in self.choose(users, weights,
+                                                    count * 2)
+                if author.pk != user.pk
+            )
+            follows.extend(Follow(user=user, author_id=author_id)
+                           for author_id in list(authors)[:count])
+        Follow.objects.bulk_create(follows)
+
+    def create_thumbnails(self, posts):
+        with_image = {post.image.name: post.pk for post in posts
+                      if post.image}
+        for post_id in with_image.values():
+            thumbnails.generate(post_id)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.utils import parse_moment
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = 'Создает недостающие миниатюры изображений постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=parse_moment,
+            help='Только посты, измененные после указанного времени '
+                 '(ISO 8601).'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if options['since']:
+            posts = posts.changed_since(options['since'])
+        post_ids = posts.values_list('pk', flat=True)
+        created = sum(generate(post_id) for post_id in post_ids.iterator())
+        self.stdout.write(f'Миниатюры созданы для постов: {created}')
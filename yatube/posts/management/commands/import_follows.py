@@ -0,0 +1,60 @@
+"""
+Импорт списка подписок из CSV: строки «подписчик,автор» с именами
+пользователей. Подписки создаются пакетами (posts.follows), поэтому
+десятки тысяч строк импортируются за секунды.
+"""
+import csv
+import sys
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from posts.follows import BATCH_SIZE, follow_pairs
+from posts.models import User
+
+# Строк, которые читаются и импортируются за один раз
+CHUNK_SIZE = 5000
+
+
+def _user_ids(usernames, known):
+    """Дополняет known id пользователей из usernames, которых там нет."""
+    missing = list(set(usernames) - set(known))
+    for start in range(0, len(missing), BATCH_SIZE):
+        known.update(User.objects.filter(
+            username__in=missing[start:start + BATCH_SIZE]
+        ).values_list('username', 'pk'))
+
+
+class Command(BaseCommand):
+    help = 'Импортирует подписки из CSV-файла (подписчик,автор).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV-файл или - для stdin.')
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            self.import_rows(csv.reader(sys.stdin))
+        else:
+            with open(options['path'], newline='',
+                      encoding='utf-8') as file:
+                self.import_rows(csv.reader(file))
+
+    def import_rows(self, reader):
+        user_ids = {}
+        created = skipped = 0
+        rows = (row for row in reader if len(row) >= 2)
+        while True:
+            chunk = [(user.strip(), author.strip())
+                     for user, author, *_ in islice(rows, CHUNK_SIZE)]
+            if not chunk:
+                break
+            _user_ids([name for pair in chunk for name in pair], user_ids)
+            pairs = [(user_ids[user], user_ids[author])
+                     for user, author in chunk
+                     if user in user_ids and author in user_ids]
+            skipped += len(chunk) - len(pairs)
+            created += follow_pairs(pairs)
+        self.stdout.write(f'Создано подписок: {created}')
+        if skipped:
+            self.stdout.write(f'Пропущено строк с неизвестными '
+                              f'пользователями: {skipped}')
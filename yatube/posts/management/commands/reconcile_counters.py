@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов и подписок.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile()
+        for name, count in fixed.items():
+            self.stdout.write(f'{name}: исправлено {count}')
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-17 23:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_feed_on_read(apps, schema_editor):
+    """Посты популярных авторов уже не раскладывались по лентам."""
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_THRESHOLD
+    ).update(feed_on_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_on_read',
+            field=models.BooleanField(default=False, verbose_name='Посты подмешиваются в ленты при чтении'),
+        ),
+        migrations.RunPython(fill_feed_on_read, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 
 from core.models import CreatedModel
 
@@ -10,6 +11,42 @@ COUNT_SYMBOLS = settings.COUNT_SYMBOLS_POST
 
 User = get_user_model()
 
+# Денормализованные поля: их изменение не считается изменением поста
+COUNTER_FIELDS = {'comments_count'}
+
+
+class PostQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Массовое создание постов обновляет счетчики авторов и групп,
+        так как сигналы post_save при этом не отправляются.
+        """
+        from .counters import count_created_posts
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        count_created_posts(objs)
+        return objs
+
+    def update(self, **kwargs):
+        """
+        Массовое изменение постов (в том числе bulk_update) обновляет
+        дату изменения, как и save(), если меняются не только счетчики.
+        """
+        if 'updated' not in kwargs and not COUNTER_FIELDS.issuperset(kwargs):
+            kwargs['updated'] = timezone.now()
+        return super().update(**kwargs)
+
+    def touch(self):
+        """Отмечает посты измененными, не меняя их полей."""
+        return self.update(updated=timezone.now())
+
+    def changed_since(self, moment):
+        """
+        Посты, созданные или измененные после moment, от более ранних
+        изменений к более поздним. Удаленные посты сюда не попадают.
+        """
+        return self.filter(updated__gt=moment).order_by('updated', 'id')
+
 
 class Post(CreatedModel):
     text = models.TextField(
@@ -36,6 +73,40 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta(CreatedModel.Meta):
+        indexes = [
+            # Ключ курсорной паджинации главной страницы
+            models.Index(fields=['-created', '-id'],
+                         name='post_created_idx'),
+            # Страницы сообщества и профиля
+            models.Index(fields=['group', '-created', '-id'],
+                         name='post_group_created_idx'),
+            models.Index(fields=['author', '-created', '-id'],
+                         name='post_author_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа на момент загрузки нужна, чтобы при смене группы
+        # пересчитать счетчики обеих групп
+        loaded = dict(zip(field_names, values))
+        if 'group_id' in loaded:
+            instance._loaded_group_id = loaded['group_id']
+        return instance
 
     def get_absolute_url(self):
         return reverse('posts:post_detail', args=(self.pk, ))
@@ -49,6 +120,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
 
     def get_absolute_url(self):
         return reverse('posts:group_list', kwargs={'slug': self.slug})
@@ -74,6 +150,13 @@ class Comment(CreatedModel):
         verbose_name='Автор'
     )
 
+    class Meta(CreatedModel.Meta):
+        indexes = [
+            # Комментарии на странице поста
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text[:COUNT_SYMBOLS]
 
@@ -100,3 +183,75 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['author', 'user'],
                                     name='unique_follow')
         ]
+        indexes = [
+            # Подписки пользователя
+            models.Index(fields=['user', 'author'],
+                         name='follow_user_author_idx'),
+        ]
+
+
+class FeedItem(models.Model):
+    """
+    Запись ленты подписок: пост автора, на которого подписан пользователь.
+
+    Заполняется при публикации поста (fan-out on write), поэтому
+    страница подписок читается одним проходом по индексу (user, created).
+    Дата дублирует дату поста, чтобы сортировать без обращения к Post.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пост'
+    )
+    created = models.DateTimeField('Дата публикации поста')
+
+    def __str__(self):
+        return f'{self.user}-{self.post_id}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_item')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created', '-post'],
+                         name='feed_item_user_created_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0
+    )
+    # Подписчиков больше FEED_FANOUT_THRESHOLD: посты автора
+    # не раскладываются по лентам, а подмешиваются при чтении (posts.feed)
+    feed_on_read = models.BooleanField(
+        'Посты подмешиваются в ленты при чтении',
+        default=False
+    )
+
+    def __str__(self):
+        return str(self.user)
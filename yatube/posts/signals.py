@@ -0,0 +1,120 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import tasks
+from . import cards, counters, generations, thumbnails
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля пользователя, которые выводятся на страницах с постами
+USER_SHOWN_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def _shown_fields_changed(update_fields):
+    return update_fields is None or bool(USER_SHOWN_FIELDS & update_fields)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    """Прежнее имя нужно, чтобы сбросить кеш старой страницы профиля."""
+    if instance.pk and _shown_fields_changed(update_fields):
+        instance._loaded_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, raw=False,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        # У нового пользователя появляются счетчики
+        UserStats.objects.get_or_create(user=instance)
+        return
+    # Вход пользователя обновляет только last_login
+    if not _shown_fields_changed(update_fields):
+        return
+    cards.invalidate_author(instance)
+    generations.user_changed(
+        instance.username,
+        getattr(instance, '_loaded_username', instance.username)
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.count_post(instance, 1)
+        # Новый пост попадает в ленты подписчиков
+        tasks.enqueue('feed.fan_out', instance.pk)
+    else:
+        # Пост изменен, в том числе группа из админки. Карточка
+        # с новой датой изменения отрисуется заново
+        counters.count_group_change(instance)
+    generations.post_changed(instance)
+    # Миниатюры создаются в фоне, шаблоны их только читают
+    thumbnails.schedule(instance)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.count_post(instance, -1)
+    cards.invalidate(instance)
+    generations.post_changed(instance)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    """Прежний адрес нужен, чтобы сбросить кеш старой страницы группы."""
+    if instance.pk:
+        instance._loaded_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generations.group_changed(
+            instance.slug, getattr(instance, '_loaded_slug', instance.slug)
+        )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    generations.group_changed(instance.slug)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.count_comment(instance, 1)
+    generations.comment_changed(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.count_comment(instance, -1)
+    generations.comment_changed(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.count_follow(instance, 1)
+        # После подписки в ленту попадают прежние посты автора
+        tasks.enqueue('feed.backfill', instance.user_id, instance.author_id)
+        generations.follow_changed(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.count_follow(instance, -1)
+    # После отписки посты автора пропадают из ленты
+    tasks.enqueue('feed.prune', instance.user_id, instance.author_id)
+    generations.follow_changed(instance)
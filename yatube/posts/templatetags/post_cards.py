@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..cards import render_card
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post):
+    """Карточка поста из кеша фрагментов."""
+    return mark_safe(render_card(post))
@@ -0,0 +1,11 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(post, rendition):
+    """Готовая миниатюра изображения поста или None, пока она создается."""
+    return thumbnails.thumbnail_for(post, rendition)
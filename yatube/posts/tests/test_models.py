@@ -1,8 +1,18 @@
+import re
+from io import StringIO
+from unittest import skipUnless
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-from ..models import Group, Post
+from ..counters import reconcile
+from ..models import Comment, FeedItem, Follow, Group, Post, UserStats
 
 # Количество символов при вызове метода __str__ модели Post
 COUNT_SYMBOLS = settings.COUNT_SYMBOLS_POST
@@ -40,6 +50,7 @@ class PostModelTest(TestCase):
         field_verboses = {
             'text': 'Текст поста',
             'created': 'Дата создания',
+            'updated': 'Дата изменения',
             'author': 'Автор',
             'group': 'Группа'
         }
@@ -60,3 +71,215 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, expected_value)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class PostIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост-123',
+        )
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Комментарий')
+        Follow.objects.create(author=cls.user, user=cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def test_listing_queries_use_indexes(self):
+        """Выборки страниц идут по индексам без сортировки во временном
+        B-дереве."""
+        url_indexes = {
+            reverse('posts:index'): 'post_created_idx',
+            reverse('posts:group_list', args=[self.group.slug]):
+                'post_group_created_idx',
+            reverse('posts:profile', args=[self.user]):
+                'post_author_created_idx',
+            reverse('posts:post_detail', args=[self.post.id]):
+                'comment_post_created_idx',
+            reverse('posts:follow_index'): 'feed_item_user_created_idx',
+        }
+        for url, index in url_indexes.items():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.follower_client.get(url)
+                plans = []
+                for query in queries.captured_queries:
+                    if 'ORDER BY' not in query['sql']:
+                        continue
+                    # Запрос повторяется с параметрами для EXPLAIN
+                    sql, params = self.parametrize(query['sql'])
+                    plans.append(self.explain(sql, params))
+                self.assertTrue(any(index in plan for plan in plans),
+                                plans)
+                for plan in plans:
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_changed_since_uses_index(self):
+        sql, params = Post.objects.changed_since(
+            self.post.created
+        ).query.sql_with_params()
+        plan = self.explain(sql, params)
+        self.assertIn('updated', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    @staticmethod
+    def parametrize(sql):
+        """Превращает строковые литералы логированного запроса
+        в параметры."""
+        params = re.findall(r"'((?:[^']|'')*)'", sql)
+        sql = re.sub(r"'((?:[^']|'')*)'", '%s', sql)
+        return sql, [param.replace("''", "'") for param in params]
+
+
+class PostUpdatedTest(TestCase):
+    """Дата изменения поста обновляется при любом способе записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        self.since = Post.objects.get(pk=self.post.pk).updated
+
+    def changed(self):
+        return list(Post.objects.changed_since(self.since))
+
+    def test_updated_on_save(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertEqual(self.changed(), [post])
+
+    def test_updated_on_queryset_update(self):
+        Post.objects.filter(pk=self.post.pk).update(text='Исправленный пост')
+        self.assertEqual(self.changed(), [self.post])
+
+    def test_updated_on_bulk_update(self):
+        self.post.text = 'Исправленный пост'
+        Post.objects.bulk_update([self.post], ['text'])
+        self.assertEqual(self.changed(), [self.post])
+
+    def test_counters_do_not_change_post(self):
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        self.assertEqual(self.changed(), [])
+
+    def test_changed_since_ordered_by_change(self):
+        other = Post.objects.create(author=self.user, text='Другой пост')
+        Post.objects.filter(pk=self.post.pk).touch()
+        self.assertEqual(self.changed(), [other, self.post])
+
+
+class CounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group_1 = Group.objects.create(
+            title='Группа-1', slug='group-1', description='Описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Группа-2', slug='group-2', description='Описание',
+        )
+
+    def assertCounters(self):
+        """Все счетчики совпадают с фактическими значениями."""
+        self.assertEqual(reconcile(), {
+            'UserStats (созданы)': 0,
+            'UserStats': 0,
+            'Group': 0,
+            'Post': 0,
+        })
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счетчики меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   group=self.group_1)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(author=self.author, user=self.reader)
+        self.author.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.group_1.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        self.assertEqual(self.group_1.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertCounters()
+
+        # Перенос поста в другую группу
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group_2
+        post.save()
+        self.assertCounters()
+
+        # Каскадное удаление поста вместе с комментариями
+        post.delete()
+        Follow.objects.all().delete()
+        self.assertCounters()
+
+    def test_counters_bulk_create_posts(self):
+        """Массовое создание постов обновляет счетчики."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}', group=self.group_1)
+            for i in range(5)
+        )
+        self.assertCounters()
+
+    def test_counters_reconcile_command_fixes_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        Post.objects.create(author=self.author, text='Пост',
+                            group=self.group_1)
+        UserStats.objects.filter(user=self.author).update(posts_count=10)
+        Group.objects.update(posts_count=0)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Group: исправлено 1', out.getvalue())
+        self.assertCounters()
+
+    def test_generate_data_command(self):
+        """Синтетические данные согласованы: счетчики и ленты подписок."""
+        call_command('generate_data', '--users=30', '--groups=3',
+                     '--posts=100', '--comments=50', '--follows=5',
+                     '--images=0', '--prefix=gen', stdout=StringIO())
+        self.assertEqual(Post.objects.filter(
+            author__username__startswith='gen'
+        ).count(), 100)
+        self.assertCounters()
+        expected = Post.objects.filter(
+            author__following__user__username__startswith='gen'
+        ).count()
+        self.assertEqual(FeedItem.objects.count(), expected)
+
+    def test_post_detail_reads_counter(self):
+        """Страница поста не выполняет COUNT-запросов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(
+                reverse('posts:post_detail', args=[post.id])
+            )
+        self.assertEqual(response.context['count_posts'], 1)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
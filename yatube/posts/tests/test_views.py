@@ -1,15 +1,29 @@
+import csv
+import json
+import os
+import re
 import shutil
 import tempfile
+import time
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from core.cache import cache_stats
+
+from .. import cards, counters, feed, follows, thumbnails
+from ..models import Comment, FeedItem, Follow, Group, Post
 
 # Колчичество постов на страницу
 COUNT_PAGES = settings.COUNT_PAGES_PAGINATOR
@@ -85,7 +99,7 @@ class PostPagesTests(TestCase):
         self.validate_content(post, self.post)
 
     def test_posts_cache_index_page(self):
-        """Кеш главной страницы работает корректно."""
+        """Кеш главной страницы работает до изменения постов."""
         new_post = Post.objects.create(
             text='Пост для проверки кеша главной страницы.',
             author=self.user,
@@ -99,18 +113,42 @@ class PostPagesTests(TestCase):
         # Содержимое полей соответствует ожиданиям
         self.validate_content(post, new_post)
 
-        # Удаляем пост
-        Post.objects.first().delete()
-        # После удаления поста контент одинаковый
+        # Повторный запрос отдается из кеша без отрисовки шаблона
+        # страницы, отрисовываются только персональные фрагменты
         response = self.guest_client.get(self.INDEX_URL)
-        content_2 = response.content
-        self.assertEqual(content_1, content_2)
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(content_1, response.content)
 
-        # Очищаем кеш, контент разный
-        cache.clear()
+        # Удаляем пост, кеш сбрасывается, контент разный
+        Post.objects.first().delete()
         response = self.guest_client.get(self.INDEX_URL)
-        content_2 = response.content
-        self.assertNotEqual(content_1, content_2)
+        self.assertTemplateUsed(response, 'base.html')
+        self.assertNotEqual(content_1, response.content)
+
+    def test_posts_cache_pages_invalidated_by_generations(self):
+        """Страницы группы и профиля сбрасываются при изменении
+        своих постов и не сбрасываются при изменении чужих."""
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+        )
+        for url in (self.GROUP_URL, self.PROFILE_URL):
+            self.guest_client.get(url)
+        Post.objects.create(text='Пост в другой группе',
+                            author=User.objects.create_user('other'),
+                            group=other_group)
+        # Страницы не изменились и отдаются из кеша
+        for url in (self.GROUP_URL, self.PROFILE_URL):
+            with self.subTest(url=url):
+                self.assertTemplateNotUsed(self.guest_client.get(url),
+                                           'base.html')
+
+        Post.objects.create(text='Новый пост группы', author=self.user,
+                            group=self.group)
+        for url in (self.GROUP_URL, self.PROFILE_URL):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Новый пост группы')
 
     def test_posts_group_page_show_correct_context(self):
         """Шаблон group_list сформирован с правильным контекстом."""
@@ -218,6 +256,53 @@ class PostPagesTests(TestCase):
             self.assertIn(post, response_guest.context['page_obj'])
             self.assertIn(post, response_auth.context['page_obj'])
 
+    def test_posts_thumbnail_generated_in_background(self):
+        """
+        Страница не создает миниатюру, а показывает заглушку,
+        пока миниатюра не создана фоновой задачей.
+        """
+        response = self.guest_client.get(self.INDEX_URL)
+        self.assertContains(response, 'Изображение обрабатывается')
+
+        self.assertTrue(thumbnails.generate(self.post.pk))
+        response = self.guest_client.get(self.INDEX_URL)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        image = thumbnails.ready(self.post.image, 'card')
+        self.assertContains(response, f'src="{image.url}"')
+        # Готовые миниатюры повторно не создаются
+        self.assertFalse(thumbnails.generate(self.post.pk))
+
+    def test_posts_thumbnails_loaded_in_one_query(self):
+        """Миниатюры всех постов страницы загружаются одним запросом."""
+        for number in range(3):
+            post = Post.objects.create(
+                text=f'Пост с изображением {number}',
+                author=self.user,
+                image=SimpleUploadedFile(
+                    name=f'views_{number}.gif',
+                    content=self.small_gif,
+                    content_type='image/gif'
+                ),
+            )
+            thumbnails.generate(post.pk)
+        thumbnails.generate(self.post.pk)
+        cache.clear()
+        thumbnails.ready_files.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(self.INDEX_URL)
+        kvstore_queries = [query for query in queries.captured_queries
+                           if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+        # Готовые миниатюры запоминаются в памяти процесса
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(self.INDEX_URL)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'thumbnail_kvstore' in query['sql']])
+
     def test_posts_correct_add_post_to_group(self):
         """Пост не попал в группу, для которой не предназначен."""
         group_1 = self.group
@@ -277,6 +362,163 @@ class PostPaginatorTest(TestCase):
             # Количество постов на последней странице
             self.assertEqual(len(last_page), self.COUNT_POSTS % COUNT_PAGES)
 
+    def test_posts_cursor_pages_paginator(self):
+        """Переход по курсорам проходит все посты без повторов."""
+        urls = (
+            self.INDEX_URL,
+            self.GROUP_URL,
+            self.PROFILE_URL,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                page_obj = self.client.get(url).context['page_obj']
+                seen = list(page_obj)
+                while page_obj.next_cursor:
+                    previous_page = page_obj
+                    cache.clear()
+                    page_obj = self.client.get(
+                        url, {'cursor': page_obj.next_cursor}
+                    ).context['page_obj']
+                    seen.extend(page_obj)
+                self.assertEqual(len(seen), self.COUNT_POSTS)
+                self.assertEqual(len(set(seen)), self.COUNT_POSTS)
+
+                # Курсор назад возвращает предыдущую страницу
+                cache.clear()
+                back_page = self.client.get(
+                    url, {'cursor': page_obj.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(previous_page))
+
+    def test_posts_legacy_page_number_paginator(self):
+        """Ссылки вида ?page=N продолжают работать."""
+        page_obj = self.client.get(
+            self.GROUP_URL, {'page': 2}
+        ).context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj), COUNT_PAGES)
+        # С номерной страницы можно перейти дальше по курсору
+        next_page = self.client.get(
+            self.GROUP_URL, {'cursor': page_obj.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(next_page),
+                         list(page_obj.paginator.page(3)))
+
+    def test_posts_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор отдает первую страницу."""
+        page_obj = self.client.get(
+            self.GROUP_URL, {'cursor': 'broken'}
+        ).context['page_obj']
+        self.assertIsNone(page_obj.previous_cursor)
+        self.assertEqual(len(page_obj), COUNT_PAGES)
+
+
+@override_settings(STREAM_LISTINGS=True)
+class PostStreamingTest(TestCase):
+    COUNT_POSTS = 23
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост-номер-{i}.', author=cls.user,
+                 group=cls.group)
+            for i in range(cls.COUNT_POSTS)
+        )
+        Comment.objects.create(post=Post.objects.first(), author=cls.user,
+                               text='Комментарий, с запятой')
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', args=[cls.user]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @staticmethod
+    def content(response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_posts_listing_streamed_by_parts(self):
+        """Шапка отправляется отдельно от карточек постов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertTrue(response.streaming)
+                parts = [part.decode() for part in response.streaming_content]
+                self.assertIn('<head>', parts[0])
+                self.assertNotIn('<article>', parts[0])
+                content = ''.join(parts)
+                self.assertEqual(content.count('<article>'), COUNT_PAGES)
+                self.assertIn('Пользователь: StasBasov', content)
+                self.assertNotIn('<!--stream:', content)
+                self.assertNotIn('<!--personal:', content)
+
+    def test_posts_streamed_listing_not_cached(self):
+        """Потоковые страницы не кешируются, и это видно в счетчиках."""
+        stats = cache_stats('page:index_page')
+        bypasses = stats.bypasses
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.content(self.client.get(reverse('posts:index')))
+        self.assertEqual(stats.bypasses, bypasses + 2)
+
+    def test_posts_streamed_cursor_pages(self):
+        """По курсорам потоковых страниц проходятся все посты."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                content = self.content(self.client.get(url))
+                seen = re.findall(r'пост-номер-(\d+)\.', content)
+                while True:
+                    cursor = re.search(
+                        r'cursor=([\w-]+)">\s*Следующая', content
+                    )
+                    if cursor is None:
+                        break
+                    content = self.content(
+                        self.client.get(url, {'cursor': cursor.group(1)})
+                    )
+                    seen.extend(re.findall(r'пост-номер-(\d+)\.', content))
+                self.assertEqual(len(set(seen)), self.COUNT_POSTS)
+                self.assertEqual(len(seen), self.COUNT_POSTS)
+                self.assertIn('Предыдущая', content)
+
+    def test_posts_export(self):
+        """Посты и комментарии выгружаются в CSV и JSON Lines."""
+        response = self.authorized_client.get(
+            reverse('posts:export', args=['csv'])
+        )
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(self.content(response).splitlines()))
+        self.assertEqual(len(rows), self.COUNT_POSTS + 1)
+        self.assertEqual(rows[-1]['type'], 'comment')
+        self.assertEqual(rows[-1]['text'], 'Комментарий, с запятой')
+
+        response = self.authorized_client.get(
+            reverse('posts:export', args=['jsonl'])
+        )
+        rows = [json.loads(line)
+                for line in self.content(response).splitlines()]
+        self.assertEqual(rows[0]['group'], self.group.slug)
+        self.assertEqual(len(rows), self.COUNT_POSTS + 1)
+
+    def test_posts_export_requires_login(self):
+        url = reverse('posts:export', args=['csv'])
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+        response = self.authorized_client.get(
+            reverse('posts:export', args=['xml'])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
 
 class PostFollowTest(TestCase):
     @classmethod
@@ -382,3 +624,520 @@ class PostFollowTest(TestCase):
                          count_subs,
                          'Колчичество постов в избранном неподписчика '
                          'больше 0, проверьте вью-функцию profile_unfollow.')
+
+    def test_posts_follow_fills_feed_with_previous_posts(self):
+        """После подписки в ленте появляются прежние посты автора,
+        после отписки они пропадают."""
+        old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=self.user,
+        )
+        self.auth_follower.get(self.PROFILE_FOLLOW_URL)
+        response = self.auth_follower.get(self.FOLLOW_INDEX_URL)
+        self.assertIn(old_post, response.context['page_obj'])
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.follower, post=old_post
+        ).exists())
+
+        self.auth_follower.get(self.PROFILE_UNFOLLOW_URL)
+        response = self.auth_follower.get(self.FOLLOW_INDEX_URL)
+        self.assertNotIn(old_post, response.context['page_obj'])
+        self.assertFalse(FeedItem.objects.filter(
+            user=self.follower
+        ).exists())
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_posts_popular_author_feed_read_on_request(self):
+        """Посты популярного автора не раскладываются по лентам,
+        а подмешиваются в ленту при чтении."""
+        Follow.objects.create(author=self.user, user=self.follower)
+        new_post = Post.objects.create(
+            text='Пост популярного автора',
+            author=self.user,
+        )
+        self.assertFalse(FeedItem.objects.exists())
+
+        response = self.auth_follower.get(self.FOLLOW_INDEX_URL)
+        self.assertEqual(list(response.context['page_obj']), [new_post])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_posts_author_below_threshold_posts_kept_in_feed(self):
+        """Посты, опубликованные, пока автор был популярным, остаются
+        в лентах, когда подписчиков становится меньше порога."""
+        Follow.objects.create(author=self.user, user=self.follower)
+        self.auth_unfollower.get(self.PROFILE_FOLLOW_URL)
+        popular_post = Post.objects.create(
+            text='Пост популярного автора',
+            author=self.user,
+        )
+        self.assertFalse(FeedItem.objects.exists())
+
+        self.auth_unfollower.get(self.PROFILE_UNFOLLOW_URL)
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.follower, post=popular_post
+        ).exists())
+        response = self.auth_follower.get(self.FOLLOW_INDEX_URL)
+        self.assertEqual(list(response.context['page_obj']), [popular_post])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_posts_popular_authors_cached(self):
+        """Популярные авторы из подписок не запрашиваются при каждом
+        чтении ленты."""
+        Follow.objects.create(author=self.user, user=self.follower)
+        Post.objects.create(text='Пост популярного автора', author=self.user)
+        self.assertEqual(feed.popular_authors(self.follower), [self.user.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(feed.popular_authors(self.follower),
+                             [self.user.pk])
+
+
+class PostBulkFollowTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(3)]
+        for number, author in enumerate(cls.authors):
+            Post.objects.create(text=f'Пост {number}', author=author)
+        cls.FOLLOW_MANY_URL = reverse('posts:follow_many')
+        cls.UNFOLLOW_MANY_URL = reverse('posts:unfollow_many')
+        cls.SUGGESTED_URL = reverse('posts:suggested_authors')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def assertCountersReconciled(self):
+        self.assertEqual(counters.reconcile()['UserStats'], 0)
+
+    def test_follow_many(self):
+        """Подписка на нескольких авторов: себя и повторы пропускает,
+        счетчики и ленты обновляются."""
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        usernames = ['reader', 'missing',
+                     *(author.username for author in self.authors)]
+        response = self.client.post(self.FOLLOW_MANY_URL,
+                                    {'username': usernames})
+        self.assertEqual(response.json(), {'followed': 2})
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(FeedItem.objects.filter(user=self.user).count(), 3)
+        self.assertCountersReconciled()
+
+    def test_unfollow_many(self):
+        """Отписка от нескольких авторов убирает их посты из ленты."""
+        follows.follow_many(self.user, [author.pk for author in self.authors])
+        response = self.client.post(self.UNFOLLOW_MANY_URL, {
+            'username': [self.authors[0].username, self.authors[1].username]
+        })
+        self.assertEqual(response.json(), {'unfollowed': 2})
+        self.assertEqual(
+            list(FeedItem.objects.filter(user=self.user).values_list(
+                'post__author', flat=True
+            )),
+            [self.authors[2].pk]
+        )
+        self.assertCountersReconciled()
+
+    @override_settings(FOLLOW_BULK_MAX=2)
+    def test_follow_many_limit(self):
+        """Слишком длинный список авторов отклоняется."""
+        response = self.client.post(self.FOLLOW_MANY_URL, {
+            'username': [author.username for author in self.authors]
+        })
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Follow.objects.exists())
+        response = self.client.post(self.SUGGESTED_URL, {
+            'username': [author.username for author in self.authors]
+        })
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_many_counts_inserted_only(self):
+        """Счетчики меняются только на созданные пакетом подписки."""
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        pairs = [(self.user.pk, author.pk) for author in self.authors]
+        self.assertEqual(follows.follow_pairs(pairs), 2)
+        self.assertEqual(follows.follow_pairs(pairs), 0)
+        self.assertEqual(follows.unfollow_pairs(pairs), 3)
+        self.assertEqual(follows.unfollow_pairs(pairs), 0)
+        self.assertCountersReconciled()
+
+    def test_follow_many_without_returning(self):
+        """SQLite без RETURNING: новые и удаленные подписки
+        вычисляются по существующим."""
+        with mock.patch('posts.follows._can_return_rows',
+                        return_value=False):
+            self.test_follow_many_counts_inserted_only()
+        self.assertEqual(FeedItem.objects.filter(user=self.user).count(), 0)
+
+    @mock.patch('posts.follows.BATCH_SIZE', 2)
+    def test_follow_many_batches(self):
+        """Подписки создаются и удаляются пакетами."""
+        pairs = [(self.user.pk, author.pk) for author in self.authors]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(follows.follow_pairs(pairs), 3)
+        inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith(f'INSERT INTO {Follow._meta.db_table}')
+        ]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(follows.unfollow_pairs(pairs), 3)
+        self.assertCountersReconciled()
+
+    def test_suggested_authors_follow_all(self):
+        """Рекомендуемые авторы: популярные первыми, подписка на всех."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.authors[2])
+        Follow.objects.create(user=self.user, author=self.authors[1])
+        response = self.client.get(self.SUGGESTED_URL)
+        self.assertEqual(list(response.context['authors']),
+                         [self.authors[2], self.authors[0]])
+
+        response = self.client.post(self.SUGGESTED_URL, {
+            'username': [author.username
+                         for author in response.context['authors']]
+        })
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 3)
+        self.assertCountersReconciled()
+
+    def test_import_follows(self):
+        """Команда import_follows создает подписки из CSV."""
+        rows = [f'{user.username},{author.username}'
+                for user in [self.user, *self.authors]
+                for author in self.authors]
+        with tempfile.NamedTemporaryFile('w', suffix='.csv',
+                                         delete=False) as file:
+            file.write('\n'.join([*rows, 'reader,missing']))
+        out = StringIO()
+        call_command('import_follows', file.name, stdout=out)
+        os.remove(file.name)
+        # Подписки на себя пропускаются
+        self.assertIn('Создано подписок: 9', out.getvalue())
+        self.assertIn('неизвестными пользователями: 1', out.getvalue())
+        self.assertEqual(FeedItem.objects.filter(user=self.user).count(), 3)
+        self.assertCountersReconciled()
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov',
+                                            first_name='Стас')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user,
+            group=cls.group,
+        )
+        cls.GROUP_URL = reverse('posts:group_list',
+                                kwargs={'slug': cls.group.slug})
+        cls.POST_EDIT_URL = reverse('posts:post_edit', args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_posts_card_rendered_from_cache(self):
+        """Повторная отрисовка карточки берется из кеша."""
+        hits, misses = cards.stats.hits, cards.stats.misses
+        self.client.get(self.GROUP_URL)
+        self.assertEqual(cards.stats.misses, misses + 1)
+        # Другой адрес не попадает в кеш страниц, но карточка та же
+        self.client.get(self.GROUP_URL, {'cursor': ''})
+        self.assertEqual(cards.stats.hits, hits + 1)
+        self.assertIsNotNone(cache.get(cards.card_key(self.post)))
+
+    def test_posts_card_invalidated_on_edit(self):
+        """Карточка обновляется после редактирования поста."""
+        self.client.get(self.GROUP_URL)
+        self.authorized_client.post(self.POST_EDIT_URL, {
+            'text': 'Исправленный текст',
+            'group': self.group.id,
+        })
+        response = self.client.get(self.GROUP_URL)
+        self.assertContains(response, 'Исправленный текст')
+
+    def test_posts_card_invalidated_on_bulk_update(self):
+        """Массовое изменение постов в обход сигналов тоже обновляет
+        карточку: дата изменения входит в ключ кеша."""
+        self.client.get(self.GROUP_URL)
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        response = self.client.get(self.GROUP_URL, {'cursor': ''})
+        self.assertContains(response, 'Новый текст')
+
+    def test_posts_card_invalidated_on_author_change(self):
+        """Карточка обновляется после изменения имени автора."""
+        self.client.get(self.GROUP_URL)
+        self.user.first_name = 'Станислав'
+        self.user.save()
+        response = self.client.get(self.GROUP_URL)
+        self.assertContains(response, 'Станислав')
+
+    def test_posts_card_cache_stats_for_staff(self):
+        """Счетчики кеша доступны только персоналу."""
+        url = reverse('core:cache_stats')
+        self.client.get(self.GROUP_URL)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.authorized_client.force_login(staff)
+        response = self.authorized_client.get(url)
+        self.assertIn('post_card', response.json())
+
+
+class PostPersonalFragmentsTest(TestCase):
+    """Страницы кешируются одни для всех, а персональные части —
+    для каждого пользователя свои."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.author)
+        cls.PROFILE_URL = reverse('posts:profile', args=[cls.author])
+        cls.POST_DETAIL_URL = reverse('posts:post_detail',
+                                      args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_posts_page_shared_between_users(self):
+        """Страница, отрисованная для гостя, отдается из кеша автору
+        с его шапкой, кнопкой редактирования и формой комментария."""
+        response = self.client.get(self.POST_DETAIL_URL)
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertNotContains(response, 'Добавить комментарий')
+        self.assertNotContains(response, '<!--personal:')
+
+        response = self.author_client.get(self.POST_DETAIL_URL)
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertContains(response, 'Пользователь: author')
+        self.assertContains(response, 'редактировать запись')
+        self.assertContains(response, 'Добавить комментарий')
+
+        response = self.reader_client.get(self.POST_DETAIL_URL)
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertNotContains(response, 'редактировать запись')
+
+    def test_posts_follow_button_for_each_user(self):
+        """Кнопка подписки на закешированной странице автора
+        соответствует подпискам текущего пользователя."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(self.PROFILE_URL)
+        self.assertContains(response, 'Подписаться')
+
+        response = self.reader_client.get(self.PROFILE_URL)
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertContains(response, 'Отписаться')
+
+        response = self.author_client.get(self.PROFILE_URL)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(response, 'Отписаться')
+
+
+class PostConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.author)
+        cls.INDEX_URL = reverse('posts:index')
+        cls.POST_DETAIL_URL = reverse('posts:post_detail',
+                                      args=[cls.post.id])
+        cls.FOLLOW_INDEX_URL = reverse('posts:follow_index')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        # Секунда последнего изменения данных уже прошла
+        self.clock = mock.patch('core.decorators.time')
+        self.clock.start().time.return_value = time.time() + 2
+        self.addCleanup(self.clock.stop)
+
+    def test_posts_last_modified_after_second_ends(self):
+        """Пока не прошла секунда изменения, страница проверяется
+        только по ETag: следующее изменение в ту же секунду не изменило
+        бы Last-Modified."""
+        self.clock.stop()
+        response = self.client.get(self.INDEX_URL)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_posts_not_modified_without_rendering(self):
+        """Повторный запрос с ETag получает 304 без запросов к БД."""
+        for url in (self.INDEX_URL, self.POST_DETAIL_URL):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertTemplateNotUsed(response, 'base.html')
+
+    def test_posts_not_modified_since(self):
+        response = self.client.get(self.INDEX_URL)
+        response = self.client.get(
+            self.INDEX_URL,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_post_detail_etag_changes_after_relogin(self):
+        """После повторного входа форма комментария получает новый
+        токен CSRF, а не копию страницы со старым."""
+        user = User.objects.create_user(username='user',
+                                        password='password')
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(user)
+        etag = client.get(self.POST_DETAIL_URL)['ETag']
+        client.logout()
+        client.get(reverse('users:login'))
+        client.post(reverse('users:login'), {
+            'username': 'user', 'password': 'password',
+            'csrfmiddlewaretoken':
+                client.cookies[settings.CSRF_COOKIE_NAME].value,
+        })
+        response = client.get(self.POST_DETAIL_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"',
+                          response.content.decode()).group(1)
+        response = client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Комментарий', 'csrfmiddlewaretoken': token}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertTrue(Comment.objects.filter(text='Комментарий').exists())
+
+    def test_posts_etag_changes_with_data(self):
+        """ETag меняется при изменении данных страницы."""
+        etag = self.client.get(self.POST_DETAIL_URL)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        response = self.client.get(self.POST_DETAIL_URL,
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Комментарий')
+
+    def test_posts_etag_depends_on_user(self):
+        """Страница с чужими персональными фрагментами не подходит."""
+        etag = self.client.get(self.INDEX_URL)['ETag']
+        response = self.reader_client.get(self.INDEX_URL,
+                                          HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_posts_follow_index_etag_changes_on_follow(self):
+        etag = self.reader_client.get(self.FOLLOW_INDEX_URL)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(self.FOLLOW_INDEX_URL,
+                                          HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Тестовый пост')
+
+
+class PostCommentsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Популярный пост', author=cls.user)
+        User.objects.bulk_create(
+            User(username=f'user_{number}') for number in range(10)
+        )
+        commentators = User.objects.filter(username__startswith='user_')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=commentators[number % 10],
+                    text=f'Комментарий {number}')
+            for number in range(1000)
+        )
+        Post.objects.filter(pk=cls.post.pk).update(comments_count=1000)
+        cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.id])
+        cls.POST_COMMENTS_URL = reverse('posts:post_comments',
+                                        args=[cls.post.id])
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_posts_post_detail_comments_query_count(self):
+        """
+        Страница поста с 1000 комментариев выполняет постоянное
+        количество запросов и выводит только первые комментарии.
+        """
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(self.POST_DETAIL_URL)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COUNT_COMMENTS_PAGINATOR)
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_posts_load_more_comments(self):
+        """Фрагмент комментариев подгружает все комментарии по курсору."""
+        loaded = 0
+        params = {}
+        while True:
+            with self.assertNumQueries(2):
+                response = self.guest_client.get(self.POST_COMMENTS_URL,
+                                                 params)
+            self.assertTemplateUsed(response,
+                                    'posts/includes/comment_list.html')
+            comments = response.context['comments']
+            loaded += len(comments)
+            if comments.next_cursor is None:
+                break
+            params['cursor'] = comments.next_cursor
+        self.assertEqual(loaded, 1000)
+
+
+class PostQueryBudgetTest(TestCase):
+    """Бюджет запросов представлений не зависит от размера страниц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='budget')
+        authors = [User.objects.create_user(username=f'author_{number}')
+                   for number in range(COUNT_PAGES * 2)]
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(text='Пост', author=author,
+                                       group=cls.group)
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text='Комментарий')
+        cls.post = post
+        cls.URLS = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[authors[0]]),
+            reverse('posts:post_detail', args=[cls.post.id]),
+            reverse('posts:post_comments', args=[cls.post.id]),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_posts_views_within_query_budget(self):
+        """Полные страницы отдаются без превышения бюджета запросов."""
+        for url in self.URLS:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,194 @@
+"""
+Миниатюры изображений постов.
+
+Миниатюры всех размеров из THUMBNAIL_RENDITIONS создаются фоновой
+задачей (core.tasks) сразу после сохранения поста, а шаблоны только
+читают готовые миниатюры из хранилища sorl-thumbnail (ready_thumbnail)
+и показывают заглушку, пока миниатюра не готова.
+
+Миниатюры всех постов страницы загружаются из хранилища одним
+запросом (preload), а найденные запоминаются в памяти процесса:
+имя файла миниатюры зависит от исходного файла и параметров,
+поэтому запись о готовой миниатюре не устаревает.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics, tasks
+
+from . import generations
+from .models import Post
+
+
+class ThumbnailLookup(ThumbnailBackend):
+    """Поиск готовой миниатюры без ее создания."""
+
+    def thumbnail_name(self, file_, geometry_string, **options):
+        """Имя файла миниатюры, как его вычисляет get_thumbnail."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+
+class LRUCache:
+    """Потокобезопасный словарь, вытесняющий давно не читанные значения."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+lookup = ThumbnailLookup()
+# Готовые миниатюры по имени файла миниатюры
+ready_files = LRUCache(settings.THUMBNAIL_LRU_SIZE)
+
+
+def _load(names):
+    """
+    Записи о готовых миниатюрах из хранилища: {имя: ImageFile}.
+    Для хранилища cached_db — одно чтение кеша и не больше одного
+    запроса к БД на все имена.
+    """
+    kvstore = default.kvstore
+    files = [ImageFile(name, default.storage) for name in names]
+    if not isinstance(kvstore, KVStore):
+        found = {file.name: kvstore.get(file) for file in files}
+        return {name: file for name, file in found.items() if file}
+
+    keys = {add_prefix(file.key): file.name for file in files}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        # Отсутствие записи запоминается так же, как это делает
+        # sorl-thumbnail: значением EMPTY_VALUE
+        stored = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(stored)
+    return {keys[key]: deserialize_image_file(value)
+            for key, value in values.items() if isinstance(value, str)}
+
+
+def _ready_many(images, rendition):
+    """Готовые миниатюры изображений: {имя изображения: ImageFile}."""
+    geometry, options = settings.THUMBNAIL_RENDITIONS[rendition]
+    names = {image.name: lookup.thumbnail_name(image, geometry, **options)
+             for image in images if image}
+    files = {name: ready_files.get(name) for name in names.values()}
+    missing = [name for name, file in files.items() if file is None]
+    if missing:
+        for name, file in _load(missing).items():
+            ready_files.set(name, file)
+            files[name] = file
+    return {image: files[name] for image, name in names.items()
+            if files[name] is not None}
+
+
+def ready(image, rendition):
+    """Готовая миниатюра изображения указанного размера или None."""
+    if not image:
+        return None
+    return _ready_many([image], rendition).get(image.name)
+
+
+def preload(posts):
+    """
+    Загружает готовые миниатюры всех размеров для постов страницы.
+    Результат сохраняется в post.thumbnails: {размер: ImageFile или None}.
+    """
+    posts = list(posts)
+    images = [post.image for post in posts]
+    found = {rendition: _ready_many(images, rendition)
+             for rendition in settings.THUMBNAIL_RENDITIONS}
+    for post in posts:
+        post.thumbnails = {rendition: files.get(post.image.name)
+                           for rendition, files in found.items()}
+
+
+def thumbnail_for(post, rendition):
+    """Готовая миниатюра поста: загруженная preload или из хранилища."""
+    thumbnails = getattr(post, 'thumbnails', None)
+    if thumbnails is not None and rendition in thumbnails:
+        return thumbnails[rendition]
+    return ready(post.image, rendition)
+
+
+@tasks.register('thumbnails.generate')
+def generate(post_id):
+    """
+    Создает недостающие миниатюры изображения поста.
+    Возвращает True, если хотя бы одна миниатюра была создана.
+    """
+    post = Post.objects.select_related('author').filter(pk=post_id).first()
+    if post is None or not post.image:
+        return False
+    # Проверяется само хранилище, а не память процесса
+    names = {rendition: lookup.thumbnail_name(post.image, geometry, **options)
+             for rendition, (geometry, options)
+             in settings.THUMBNAIL_RENDITIONS.items()}
+    stored = _load(names.values())
+    missing = [rendition for rendition, name in names.items()
+               if name not in stored]
+    started = time.perf_counter()
+    for rendition in missing:
+        geometry, options = settings.THUMBNAIL_RENDITIONS[rendition]
+        default.backend.get_thumbnail(post.image, geometry, **options)
+    if missing:
+        metrics.observe_task('thumbnails', 'thumbnail_seconds',
+                             time.perf_counter() - started)
+        # Закешированные карточка и страницы содержат заглушку
+        Post.objects.filter(pk=post.pk).touch()
+        generations.post_changed(post)
+    return bool(missing)
+
+
+def schedule(post):
+    """Ставит создание миниатюр поста в очередь после коммита транзакции."""
+    if post.image:
+        post_id = post.pk
+        # Даже при TASKS_EAGER миниатюры создаются после коммита:
+        # транзакция запроса не держит запись в базу, пока изображение
+        # уменьшается
+        transaction.on_commit(lambda: tasks.enqueue(
+            'thumbnails.generate', post_id, key=f'thumbnails:{post_id}'
+        ))
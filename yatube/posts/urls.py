@@ -14,6 +14,12 @@ urlpatterns = [
     path('profile/<str:username>/', views.profile, name='profile'),
     # Просмотр поста
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    # Подгрузка комментариев к посту
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     # Создание поста
     path('create/', views.post_create, name='post_create'),
     # Редактирование поста
@@ -38,4 +44,15 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    # Подписка и отписка на нескольких авторов сразу
+    path('follow/bulk/', views.follow_many, name='follow_many'),
+    path('unfollow/bulk/', views.unfollow_many, name='unfollow_many'),
+    # Рекомендуемые авторы
+    path(
+        'follow/suggested/',
+        views.suggested_authors,
+        name='suggested_authors'
+    ),
+    # Выгрузка постов и комментариев пользователя
+    path('export/<str:export_format>/', views.export, name='export'),
 ]
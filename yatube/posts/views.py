@@ -1,28 +1,59 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_POST
 
+from core.db import read_only
+from core.decorators import (cache_page_by_generations,
+                             condition_by_generations, query_budget)
+from core.streaming import stream_template
 from core.utils import get_pages
+from . import exports, follows, generations, thumbnails
+from .counters import user_stats
+from .feed import get_feed_page
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
 
 User = get_user_model()
 
 
+def _streaming(request):
+    """Страницы со списками постов отдаются потоковым ответом."""
+    return settings.STREAM_LISTINGS
+
+
+def _render_listing(request, template_name, context):
+    if _streaming(request):
+        return stream_template(request, template_name, context)
+    return render(request, template_name, context)
+
+
 # Главная страница
-@cache_page(20, key_prefix='index_page')
+@query_budget(4)
+@read_only
+@condition_by_generations(generations.index_page)
+@cache_page_by_generations('index_page', generations.index_page,
+                           bypass=_streaming)
 def index(request):
     """Получаем все посты и выводим используя паджинатор get_pages."""
     posts = Post.objects.select_related('author', 'group').all()
-    page_obj = get_pages(request, posts)
+    page_obj = get_pages(request, posts, stream=_streaming(request),
+                         prepare=thumbnails.preload)
     context = {
         'page_obj': page_obj,
     }
-    return render(request, 'posts/index.html', context)
+    return _render_listing(request, 'posts/index.html', context)
 
 
 # Страница с постами отфильрованными по группам
+@query_budget(5)
+@read_only
+@condition_by_generations(generations.group_page)
+@cache_page_by_generations('group_page', generations.group_page,
+                           bypass=_streaming)
 def group_posts(request, slug):
     """
     По полученной slug строке получаем название группы,
@@ -31,15 +62,22 @@ def group_posts(request, slug):
     """
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author').all()
-    page_obj = get_pages(request, posts)
+    page_obj = get_pages(request, posts, count=group.posts_count,
+                         stream=_streaming(request),
+                         prepare=thumbnails.preload)
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return _render_listing(request, 'posts/group_list.html', context)
 
 
 # Страница профиля со списком постов
+@query_budget(7)
+@read_only
+@condition_by_generations(generations.profile_page)
+@cache_page_by_generations('profile_page', generations.profile_page,
+                           bypass=_streaming)
 def profile(request, username):
     """
     По полученной строке забираем имя пользователя,
@@ -48,28 +86,33 @@ def profile(request, username):
     """
     author = get_object_or_404(User, username=username)
     posts = author.posts.select_related('group').all()
-    page_obj = get_pages(request, posts)
-    following = (request.user.is_authenticated
-                 and Follow.objects.filter(author=author,
-                                           user=request.user).exists())
-
+    page_obj = get_pages(request, posts,
+                         count=user_stats(author).posts_count,
+                         stream=_streaming(request),
+                         prepare=thumbnails.preload)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
     }
-    return render(request, 'posts/profile.html', context)
+    return _render_listing(request, 'posts/profile.html', context)
 
 
 # Страница с выбранным постом
+@query_budget(6)
+@read_only
+@condition_by_generations(generations.post_page)
+@cache_page_by_generations('post_page', generations.post_page)
 def post_detail(request, post_id):
     """
     Получаем пост по pk, через ForeignKey-author полученного поста
-    возвращаем текст посата и общее количество постов автора.
+    возвращаем текст посата и общее количество постов автора
+    из счетчика автора.
     """
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
-    count_posts = post.author.posts.all().count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    comments = get_comments_page(request, post)
+    count_posts = user_stats(post.author).posts_count
     form = CommentForm()
     context = {
         'post': post,
@@ -80,7 +123,34 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def get_comments_page(request, post):
+    """
+    Страница комментариев поста: первая или следующая за ?cursor=...
+    Следующие страницы подгружаются фрагментом post_comments.
+    """
+    return get_pages(
+        request,
+        post.comments.select_related('author'),
+        per_page=settings.COUNT_COMMENTS_PAGINATOR,
+        count=post.comments_count,
+    )
+
+
+# Комментарии поста для подгрузки на странице поста
+@query_budget(2)
+@read_only
+def post_comments(request, post_id):
+    """Возвращает HTML-фрагмент со следующей страницей комментариев."""
+    post = get_object_or_404(Post, pk=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 # Создание поста
+@query_budget(14)
 @login_required
 def post_create(request):
     """
@@ -99,7 +169,9 @@ def post_create(request):
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        new_post.save()
+        # Пост и счетчики автора и группы сохраняются вместе
+        with transaction.atomic():
+            new_post.save()
         return redirect('posts:profile', username=request.user.username)
     context = {
         'form': form,
@@ -108,6 +180,7 @@ def post_create(request):
 
 
 # Редактирование поста
+@query_budget(14)
 @login_required
 def post_edit(request, post_id):
     """
@@ -134,7 +207,8 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -145,6 +219,7 @@ def post_edit(request, post_id):
 
 
 # Добавление коментария к посту
+@query_budget(9)
 @login_required
 def add_comment(request, post_id):
     """Добавляет комментарий к посту."""
@@ -154,23 +229,27 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(5)
 @login_required
+@read_only
+@condition_by_generations(generations.follow_page)
 def follow_index(request):
     """Выводит список постов авторов, на которых подписан пользователь."""
-    user = get_object_or_404(User, username=request.user)
-    # Все посты авторов
-    posts = Post.objects.filter(author__following__user=user)
-    page_obj = get_pages(request, posts)
+    # Посты авторов из материализованной ленты подписок
+    page_obj = get_feed_page(request, request.user)
+    thumbnails.preload(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(11)
 @login_required
 def profile_follow(request, username):
     """Подписка на автора."""
@@ -184,12 +263,80 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=author.username)
 
 
+@query_budget(11)
 @login_required
 def profile_unfollow(request, username):
     """Отписка от автора."""
     author = get_object_or_404(User, username=username)
 
+    # Удаление с сигналами (счетчики, лента) выполняется в транзакции
     Follow.objects.filter(
         author=author, user=request.user
     ).delete()
     return redirect('posts:profile', username=author.username)
+
+
+def _authors_from(request):
+    """id авторов по именам из POST-параметров username."""
+    usernames = request.POST.getlist('username')
+    if len(usernames) > settings.FOLLOW_BULK_MAX:
+        return None
+    return list(User.objects.filter(username__in=usernames).values_list(
+        'pk', flat=True
+    ))
+
+
+@query_budget(12)
+@login_required
+@require_POST
+def follow_many(request):
+    """Подписка на нескольких авторов сразу; отвечает количеством."""
+    author_ids = _authors_from(request)
+    if author_ids is None:
+        return JsonResponse({'detail': 'Слишком много авторов'}, status=400)
+    return JsonResponse(
+        {'followed': follows.follow_many(request.user, author_ids)}
+    )
+
+
+@query_budget(12)
+@login_required
+@require_POST
+def unfollow_many(request):
+    """Отписка от нескольких авторов сразу; отвечает количеством."""
+    author_ids = _authors_from(request)
+    if author_ids is None:
+        return JsonResponse({'detail': 'Слишком много авторов'}, status=400)
+    return JsonResponse(
+        {'unfollowed': follows.unfollow_many(request.user, author_ids)}
+    )
+
+
+@query_budget(12)
+@login_required
+def suggested_authors(request):
+    """
+    Популярные авторы, на которых пользователь еще не подписан,
+    и подписка на всех них сразу.
+    """
+    if request.method == 'POST':
+        author_ids = _authors_from(request)
+        if author_ids is None:
+            return JsonResponse({'detail': 'Слишком много авторов'},
+                                status=400)
+        if author_ids:
+            follows.follow_many(request.user, author_ids)
+        return redirect('posts:follow_index')
+    context = {
+        'authors': follows.suggested_authors(request.user),
+    }
+    return render(request, 'posts/suggested.html', context)
+
+
+@query_budget(4)
+@login_required
+def export(request, export_format):
+    """Выгрузка постов и комментариев пользователя (CSV, JSON Lines)."""
+    if export_format not in exports.FORMATS:
+        raise Http404
+    return exports.export_response(request.user, export_format)
@@ -0,0 +1,24 @@
+from django.db.models import Q
+
+from .index import search_ids
+
+
+class IndexedSearchMixin:
+    """
+    Поиск в админке по поисковому индексу вместо LIKE '%...%'.
+
+    Текст объектов типа search_kind ищется по индексу, а поля
+    search_exact_fields — по точному совпадению (по индексу БД).
+    search_fields по-прежнему нужны, чтобы админка показала поле поиска.
+    """
+    search_kind = None
+    search_exact_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        condition = Q(pk__in=search_ids(search_term, self.search_kind))
+        for field in self.search_exact_fields:
+            condition |= Q(**{field: search_term})
+        return queryset.filter(condition), False
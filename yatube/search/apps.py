@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.core import checks
+
+
+class SearchConfig(AppConfig):
+    name = 'search'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .backends import get_backend
+
+        @checks.register(checks.Tags.database)
+        def check_backend(**kwargs):
+            return get_backend().check()
@@ -0,0 +1,27 @@
+"""
+Бэкенды поискового индекса.
+
+Бэкенд выбирается по СУБД основной базы данных (SEARCH_BACKENDS)
+или явно настройкой SEARCH_BACKEND.
+"""
+from django.conf import settings
+from django.db import connection as default_connection
+from django.utils.module_loading import import_string
+
+_backends = {}
+
+
+def get_backend(connection=None):
+    """
+    Бэкенд для соединения connection, по умолчанию — основной базы
+    данных. Миграции передают соединение своего schema_editor.
+    """
+    connection = connection or default_connection
+    path = settings.SEARCH_BACKEND or settings.SEARCH_BACKENDS.get(
+        connection.vendor
+    )
+    if connection is not default_connection:
+        return import_string(path)(connection)
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
@@ -0,0 +1,59 @@
+from django.db import connection as default_connection
+
+# Типы проиндексированных объектов. Номер типа входит в id записи
+# индекса: id = pk объекта * len(KINDS) + номер типа
+KINDS = ('post', 'comment')
+
+
+def entry_id(kind, pk):
+    return pk * len(KINDS) + KINDS.index(kind)
+
+
+def split_entry_id(value):
+    """Тип и pk объекта по id записи индекса."""
+    pk, kind = divmod(value, len(KINDS))
+    return KINDS[kind], pk
+
+
+class SearchBackend:
+    """
+    Инвертированный индекс по основам слов (см. search.stemmer).
+    Тексты и запросы приходят в бэкенд уже разбитыми на основы.
+    Запросы выполняются на соединении connection, по умолчанию —
+    основной базы данных.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection or default_connection
+
+    def check(self):
+        """Список ошибок настройки СУБД для системной проверки Django."""
+        return []
+
+    def create_schema(self, schema_editor):
+        raise NotImplementedError
+
+    def drop_schema(self, schema_editor):
+        raise NotImplementedError
+
+    def index(self, kind, pk, stems):
+        """Добавляет или заменяет запись объекта в индексе."""
+        raise NotImplementedError
+
+    def index_many(self, entries):
+        """Добавляет записи [(kind, pk, stems), ...] одним пакетом."""
+        for kind, pk, stems in entries:
+            self.index(kind, pk, stems)
+
+    def remove(self, kind, pk):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, stems, kind=None, limit=None):
+        """
+        Объекты, содержащие все основы запроса, от более релевантных
+        к менее: [(kind, pk), ...].
+        """
+        raise NotImplementedError
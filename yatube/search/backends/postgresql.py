@@ -0,0 +1,62 @@
+from .base import KINDS, SearchBackend, entry_id, split_entry_id
+
+TABLE = 'search_entry'
+
+
+class PostgreSQLBackend(SearchBackend):
+    """
+    Индекс в таблице с колонкой tsvector и GIN-индексом.
+    Слова уже приведены к основам, поэтому используется словарь simple,
+    релевантность — функция ts_rank.
+    """
+
+    def create_schema(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE TABLE {TABLE} ('
+            f'id bigint PRIMARY KEY, body tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {TABLE}_body_idx ON {TABLE} USING gin (body)'
+        )
+
+    def drop_schema(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE {TABLE}')
+
+    def index(self, kind, pk, stems):
+        self.index_many([(kind, pk, stems)])
+
+    def index_many(self, entries):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (id, body) '
+                f"VALUES (%s, to_tsvector('simple', %s)) "
+                f'ON CONFLICT (id) DO UPDATE SET body = EXCLUDED.body',
+                [(entry_id(kind, pk), ' '.join(stems))
+                 for kind, pk, stems in entries]
+            )
+
+    def remove(self, kind, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE id = %s',
+                           [entry_id(kind, pk)])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {TABLE}')
+
+    def search(self, stems, kind=None, limit=None):
+        if not stems:
+            return []
+        sql = (f'SELECT id FROM {TABLE}, '
+               f"plainto_tsquery('simple', %s) query WHERE body @@ query")
+        params = [' '.join(stems)]
+        if kind is not None:
+            sql += ' AND id %% %s = %s'
+            params += [len(KINDS), KINDS.index(kind)]
+        sql += ' ORDER BY ts_rank(body, query) DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [split_entry_id(row[0]) for row in cursor.fetchall()]
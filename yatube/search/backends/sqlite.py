@@ -0,0 +1,81 @@
+from django.core import checks
+from django.db import OperationalError
+
+from .base import KINDS, SearchBackend, entry_id, split_entry_id
+
+TABLE = 'search_entry'
+
+
+def _quote(stem):
+    # Основа состоит из букв и цифр, но кавычки защищают
+    # от синтаксиса запросов FTS5 (AND, OR, NEAR)
+    return '"%s"' % stem.replace('"', '""')
+
+
+class SQLiteBackend(SearchBackend):
+    """
+    Индекс в виртуальной таблице FTS5 SQLite.
+    rowid записи — id объекта в индексе (base.entry_id),
+    релевантность — функция bm25.
+    """
+
+    def check(self):
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute('CREATE VIRTUAL TABLE temp.search_fts5_check '
+                               'USING fts5(body)')
+                cursor.execute('DROP TABLE temp.search_fts5_check')
+        except OperationalError:
+            return [checks.Error(
+                'SQLite собран без расширения FTS5, поиск недоступен.',
+                hint='Установите SQLite с FTS5 или задайте SEARCH_BACKEND.',
+                id='search.E001',
+            )]
+        return []
+
+    def create_schema(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {TABLE} USING fts5(body, '
+            f"tokenize='unicode61')"
+        )
+
+    def drop_schema(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE {TABLE}')
+
+    def index(self, kind, pk, stems):
+        self.index_many([(kind, pk, stems)])
+
+    def index_many(self, entries):
+        rows = [(entry_id(kind, pk), ' '.join(stems))
+                for kind, pk, stems in entries]
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                               [(rowid,) for rowid, _ in rows])
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)', rows
+            )
+
+    def remove(self, kind, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                           [entry_id(kind, pk)])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+
+    def search(self, stems, kind=None, limit=None):
+        if not stems:
+            return []
+        sql = f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s'
+        params = [' '.join(map(_quote, stems))]
+        if kind is not None:
+            sql += ' AND rowid %% %s = %s'
+            params += [len(KINDS), KINDS.index(kind)]
+        sql += f' ORDER BY bm25({TABLE})'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [split_entry_id(row[0]) for row in cursor.fetchall()]
@@ -0,0 +1,100 @@
+"""
+Поисковый индекс постов и комментариев.
+
+Индекс хранит основы слов (search.stemmer), поэтому запрос находит
+слова в любой форме. Записи обновляются фоновой задачей (core.tasks),
+которую ставят сигналы при сохранении и удалении постов
+и комментариев. Изменения в обход сигналов
+(например, bulk_create) попадают в индекс после его пересборки
+командой rebuild_search_index, а измененные посты можно
+переиндексировать отдельно (rebuild_search_index --since).
+"""
+from core import tasks
+from posts.models import Comment, Post
+
+from .backends import get_backend
+from .stemmer import stems
+
+# Количество объектов в одном пакете при пересборке индекса
+BATCH_SIZE = 500
+
+MODELS = {'post': Post, 'comment': Comment}
+
+
+@tasks.register('search.index')
+def index_record(kind, pk):
+    """Индексирует пост или комментарий, а удаленный убирает из индекса."""
+    text = MODELS[kind].objects.filter(pk=pk).values_list(
+        'text', flat=True
+    ).first()
+    if text is None:
+        remove(kind, pk)
+    else:
+        get_backend().index(kind, pk, stems(text))
+
+
+def schedule(kind, pk):
+    """Ставит обновление записи индекса в очередь фоновых задач."""
+    tasks.enqueue('search.index', kind, pk, key=f'search:{kind}:{pk}')
+
+
+def remove(kind, pk):
+    get_backend().remove(kind, pk)
+
+
+def _index_rows(backend, kind, queryset):
+    """Индексирует объекты пакетами. Возвращает их количество."""
+    count = 0
+    batch = []
+    for pk, text in queryset.values_list('pk', 'text').iterator():
+        batch.append((kind, pk, stems(text)))
+        if len(batch) == BATCH_SIZE:
+            backend.index_many(batch)
+            count += len(batch)
+            batch = []
+    backend.index_many(batch)
+    return count + len(batch)
+
+
+def rebuild():
+    """Пересобирает индекс. Возвращает количество записей."""
+    backend = get_backend()
+    backend.clear()
+    return sum(_index_rows(backend, kind, model.objects.all())
+               for kind, model in MODELS.items())
+
+
+def update_posts_since(moment):
+    """
+    Переиндексирует посты, измененные после moment. Возвращает
+    количество записей.
+    """
+    return _index_rows(get_backend(), 'post',
+                       Post.objects.changed_since(moment))
+
+
+def search(query, kind=None, limit=None):
+    """Объекты, найденные по запросу, от более релевантных: [(kind, pk)]."""
+    return get_backend().search(stems(query), kind=kind, limit=limit)
+
+
+def search_ids(query, kind, limit=None):
+    """pk объектов одного типа, найденных по запросу."""
+    return [pk for _, pk in search(query, kind=kind, limit=limit)]
+
+
+def search_posts(query, limit=None):
+    """
+    pk постов, найденных по тексту поста или его комментариев,
+    от более релевантных к менее.
+    """
+    hits = search(query, limit=limit)
+    comment_posts = dict(Comment.objects.filter(
+        pk__in=[pk for kind, pk in hits if kind == 'comment']
+    ).values_list('pk', 'post_id'))
+    post_ids = (pk if kind == 'post' else comment_posts.get(pk)
+                for kind, pk in hits)
+    # Пост остается на месте самого релевантного совпадения
+    return list(dict.fromkeys(
+        post_id for post_id in post_ids if post_id is not None
+    ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.utils import parse_moment
+from search.index import rebuild, update_posts_since
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=parse_moment,
+            help='Только посты, измененные после указанного времени '
+                 '(ISO 8601).'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['since']:
+                count = update_posts_since(options['since'])
+            else:
+                count = rebuild()
+        self.stdout.write(f'Проиндексировано записей: {count}')
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-17 21:40
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    """Создает таблицу индекса и индексирует существующие записи."""
+    from search.backends import get_backend
+    from search.stemmer import stems
+
+    backend = get_backend(schema_editor.connection)
+    backend.create_schema(schema_editor)
+    for kind, model in (('post', 'Post'), ('comment', 'Comment')):
+        rows = apps.get_model('posts', model).objects.using(
+            schema_editor.connection.alias
+        ).values_list('pk', 'text')
+        backend.index_many(
+            [(kind, pk, stems(text)) for pk, text in rows.iterator()]
+        )
+
+
+def drop_index(apps, schema_editor):
+    from search.backends import get_backend
+
+    get_backend(schema_editor.connection).drop_schema(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
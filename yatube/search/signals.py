@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.models import Comment, Post
+
+from . import index
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index.schedule('post', instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    index.schedule('post', instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index.schedule('comment', instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    index.schedule('comment', instance.pk)
@@ -0,0 +1,145 @@
+"""
+Стеммер для русского языка (алгоритм Snowball, Russian stemming
+algorithm) и разбиение текста на основы слов для поискового индекса.
+
+Основы слов нужны, чтобы по запросу «котами» находились посты со
+словами «кот», «кота» и «коты».
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = (
+    (),
+    ('ся', 'сь'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _regions(word):
+    """Начала областей RV и R2 слова."""
+    rv = r1 = r2 = len(word)
+    for i, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _longest(word, suffixes):
+    return max((suffix for suffix in suffixes if word.endswith(suffix)),
+               key=len, default=None)
+
+
+def _remove(rv, groups):
+    """
+    Удаляет самое длинное окончание из групп (group1, group2).
+    Окончания первой группы удаляются, только если перед ними а или я.
+    Возвращает None, если окончание не найдено.
+    """
+    group1, group2 = groups
+    suffix = _longest(rv, group1 + group2)
+    if suffix is None:
+        return None
+    stem = rv[:-len(suffix)]
+    if suffix in group1 and suffix not in group2:
+        if not stem.endswith(('а', 'я')):
+            return None
+    return stem
+
+
+def _remove_adjectival(rv):
+    stem = _remove(rv, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _remove(stem, PARTICIPLE)
+    return stem if participle is None else participle
+
+
+def _step1(rv):
+    stem = _remove(rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    reflexive = _remove(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    for remove in (_remove_adjectival,
+                   lambda rv: _remove(rv, VERB),
+                   lambda rv: _remove(rv, NOUN)):
+        stem = remove(rv)
+        if stem is not None:
+            return stem
+    return rv
+
+
+def stem(word):
+    """Основа слова. Слова не на русском языке возвращаются как есть."""
+    word = word.lower().replace('ё', 'е')
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+    if not rv:
+        return word
+
+    rv = _step1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    derivational = _longest(rv, DERIVATIONAL)
+    if derivational and len(prefix) + len(rv) - len(derivational) >= (
+        r2_start
+    ):
+        rv = rv[:-len(derivational)]
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _longest(rv, SUPERLATIVE)
+        if superlative:
+            rv = rv[:-len(superlative)]
+            if rv.endswith('нн'):
+                rv = rv[:-1]
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def stems(text):
+    """Основы всех слов текста по порядку."""
+    return [stem(word) for word in WORD_RE.findall(text.lower())]
@@ -0,0 +1,133 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from .backends import get_backend
+from .index import rebuild, search, search_posts
+from .stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_stemmer_word_forms(self):
+        """Формы одного слова приводятся к одной основе."""
+        forms = (
+            ('кот', 'кота', 'коты', 'котами'),
+            ('книга', 'книги', 'книгах', 'книгой'),
+            ('красивый', 'красивая', 'красивейший'),
+            ('ёлка', 'елки'),
+        )
+        for words in forms:
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+    def test_stemmer_keeps_other_languages(self):
+        """Слова не на русском языке не изменяются."""
+        self.assertEqual(stem('Django'), 'django')
+
+
+@skipUnless('replica' in settings.DATABASES,
+            'База replica есть в настройках yatube.settings_test')
+class SearchBackendTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def test_backend_uses_given_connection(self):
+        """Миграции работают с индексом в базе своего schema_editor."""
+        replica = connections['replica']
+        backend = get_backend(replica)
+        self.assertIs(backend.connection, replica)
+        self.assertEqual(backend.search(['кот']), [])
+        self.assertIs(get_backend(), get_backend())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post_cats = Post.objects.create(
+            text='Коты и кошки. Котам нужен корм.', author=cls.user
+        )
+        cls.post_dogs = Post.objects.create(
+            text='Собака охраняет дом, рядом сидит кот.', author=cls.user
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post_dogs, author=cls.user, text='Собаки любят кости.'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_search_ranked_results(self):
+        """Посты находятся по любой форме слова, релевантные выше."""
+        self.assertEqual(search_posts('котами'),
+                         [self.post_cats.pk, self.post_dogs.pk])
+
+    def test_search_in_comments(self):
+        """Пост находится по тексту своего комментария."""
+        self.assertEqual(search('кость'), [('comment', self.comment.pk)])
+        self.assertEqual(search_posts('кость'), [self.post_dogs.pk])
+
+    def test_search_index_updated_by_signals(self):
+        """Индекс обновляется при изменении и удалении записей."""
+        post = Post.objects.get(pk=self.post_cats.pk)
+        post.text = 'Попугаи'
+        post.save()
+        self.assertEqual(search_posts('попугай'), [post.pk])
+        self.assertEqual(search_posts('кошка'), [])
+        Post.objects.get(pk=self.post_dogs.pk).delete()
+        self.assertEqual(search('собака'), [])
+
+    def test_search_rebuild_index(self):
+        """Пересборка индекса находит посты, созданные без сигналов."""
+        Post.objects.bulk_create([Post(text='Черепаха', author=self.user)])
+        self.assertEqual(search_posts('черепаха'), [])
+        rebuild()
+        self.assertEqual(len(search_posts('черепаха')), 1)
+
+    def test_search_update_changed_posts(self):
+        """Команда с --since переиндексирует только измененные посты."""
+        since = Post.objects.get(pk=self.post_dogs.pk).updated
+        Post.objects.filter(pk=self.post_cats.pk).update(text='Черепаха')
+        out = StringIO()
+        call_command('rebuild_search_index', f'--since={since.isoformat()}',
+                     stdout=out)
+        self.assertIn('Проиндексировано записей: 1', out.getvalue())
+        self.assertEqual(search_posts('черепаха'), [self.post_cats.pk])
+
+    def test_search_page(self):
+        """Страница поиска выводит найденные посты."""
+        response = self.guest_client.get(reverse('search:search'),
+                                         {'q': 'собаки'})
+        self.assertTemplateUsed(response, 'search/search.html')
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.post_dogs])
+
+    def test_search_page_query_syntax_is_escaped(self):
+        """Синтаксис запросов индекса в строке поиска не работает."""
+        response = self.guest_client.get(reverse('search:search'),
+                                         {'q': 'кот OR "собака" NEAR('})
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_admin_uses_index(self):
+        """Поиск в админке ищет по индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'кошками'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post_cats])
+        response = client.get(reverse('admin:posts_comment_changelist'),
+                              {'q': 'auth'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.comment])
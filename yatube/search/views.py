@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.shortcuts import render
+
+from core.db import read_only
+from posts import thumbnails
+from posts.models import Post
+from .index import search_posts
+
+
+@read_only
+def search(request):
+    """
+    Посты, найденные по запросу q в тексте поста или комментариев,
+    от более релевантных к менее, с паджинацией по номеру страницы.
+    """
+    query = request.GET.get('q', '').strip()
+    post_ids = search_posts(query, limit=settings.SEARCH_MAX_RESULTS)
+    page_obj = Paginator(
+        post_ids, settings.COUNT_PAGES_PAGINATOR
+    ).get_page(request.GET.get('page'))
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        page_obj.object_list
+    )
+    page_obj.object_list = [posts[pk] for pk in page_obj.object_list
+                            if pk in posts]
+    thumbnails.preload(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'search/search.html', context)
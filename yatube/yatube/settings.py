@@ -1,4 +1,5 @@
 import os
+from urllib.parse import unquote, urlsplit
 
 from dotenv import find_dotenv, load_dotenv
 
@@ -10,7 +11,7 @@ load_dotenv(find_dotenv())
 SECRET_KEY = os.getenv('SECRET_KEY', 'default_SECRET_KEY_for_develop_DO_NOT_USE_IN_PRODUCTION')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -32,15 +33,19 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'search.apps.SearchConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db.PrimaryStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -49,11 +54,19 @@ ROOT_URLCONF = 'yatube.urls'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Скомпилированные шаблоны хранятся в памяти процесса (кеширующий
+# загрузчик), а шаблоны из TEMPLATES_DIR компилируются при запуске
+# WSGI-приложения. Изменения шаблонов тогда видны только после
+# перезапуска, поэтому по умолчанию режим включен без DEBUG.
+TEMPLATE_CACHE = os.getenv('TEMPLATE_CACHE', str(not DEBUG)) == 'True'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -62,6 +75,10 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
             ],
+            'loaders': (
+                [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+                if TEMPLATE_CACHE else TEMPLATE_LOADERS
+            ),
         },
     },
 ]
@@ -72,14 +89,83 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+# База данных задается адресом DATABASE_URL:
+#   sqlite:////абсолютный/путь/db.sqlite3 (по умолчанию db.sqlite3
+#   в BASE_DIR) или sqlite:///путь/относительно/текущей/директории
+#   postgres://пользователь:пароль@хост:порт/база
+# Реплики для чтения — адреса через запятую в DATABASE_REPLICA_URLS.
+DATABASE_URL = os.getenv(
+    'DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3')
+)
+DATABASE_REPLICA_URLS = [
+    url for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url
+]
+# Время жизни соединения с БД, секунд (0 — новое соединение на каждый
+# запрос). При внешнем пуле соединений (DATABASE_POOLER=True, например
+# PgBouncer в режиме transaction) серверные курсоры отключаются:
+# пул может выполнять соседние транзакции в разных соединениях.
+CONN_MAX_AGE = int(os.getenv('CONN_MAX_AGE', 60))
+DATABASE_POOLER = os.getenv('DATABASE_POOLER', 'False') == 'True'
+
+DATABASE_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
 }
 
 
+def _database(url):
+    parts = urlsplit(url)
+    if parts.scheme == 'sqlite':
+        return {
+            'ENGINE': DATABASE_ENGINES['sqlite'],
+            'NAME': parts.path[1:],
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            # Ожидание блокировки записи другим процессом, секунд
+            'OPTIONS': {'timeout': 20},
+        }
+    return {
+        'ENGINE': DATABASE_ENGINES[parts.scheme],
+        'NAME': unquote(parts.path[1:]),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': parts.port or '',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': DATABASE_POOLER,
+    }
+
+
+DATABASES = {'default': _database(DATABASE_URL)}
+for _number, _url in enumerate(DATABASE_REPLICA_URLS):
+    DATABASES[f'replica_{_number}'] = {
+        **_database(_url),
+        # В тестах реплики читают тестовую основную базу
+        'TEST': {'MIRROR': 'default'},
+    }
+# Реплики, с которых читают представления read_only (core.db)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Наибольшее ожидаемое отставание реплик, секунд: столько после записи
+# пользователь читает основную базу, а страницы, прочитанные
+# с реплик, хранятся в кеше
+DATABASE_REPLICA_LAG = int(os.getenv('DATABASE_REPLICA_LAG', 5))
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+
+# Настройки каждого соединения с SQLite для работы на одном сервере:
+# журнал WAL позволяет читать во время записи, а synchronous=NORMAL
+# в режиме WAL не теряет целостность при сбое. SQLITE_WAL=False
+# оставляет настройки SQLite по умолчанию.
+SQLITE_WAL = os.getenv('SQLITE_WAL', 'True') == 'True'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    # Кеш страниц 64 МБ (отрицательное значение — в килобайтах)
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+} if SQLITE_WAL else {}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -123,6 +209,26 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 # Количество постов на странице пагинатора
 COUNT_PAGES_PAGINATOR = 10
 
+# Страницы со списками постов отдаются потоковым ответом: шапка
+# отправляется сразу, карточки — по мере выборки постов. Такие
+# страницы не кешируются целиком, и каждый запрос к ним читает базу
+# (core.streaming); в счетчиках кеша они учитываются как bypassed.
+STREAM_LISTINGS = os.getenv('STREAM_LISTINGS', 'False') == 'True'
+# Записей в одном запросе к БД при выгрузке постов и комментариев
+EXPORT_CHUNK_SIZE = 2000
+
+# Количество комментариев, загружаемых на страницу поста за один раз
+COUNT_COMMENTS_PAGINATOR = 20
+
+# Количество подписчиков автора, до которого его посты раскладываются
+# в ленты подписчиков при публикации. Посты более популярных авторов
+# подмешиваются в ленту при чтении.
+FEED_FANOUT_THRESHOLD = int(os.getenv('FEED_FANOUT_THRESHOLD', 1000))
+# Авторов, на которых можно подписаться одним запросом
+FOLLOW_BULK_MAX = 500
+# Авторов в списке рекомендуемых
+SUGGESTED_AUTHORS_COUNT = 10
+
 # Количество символов при вызове метода __str__ модели Post
 COUNT_SYMBOLS_POST = 15
 
@@ -133,9 +239,102 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Бэкенд кеширования
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Бэкенд кеширования. Без CACHE_URL кеш свой у каждого процесса.
+# С CACHE_URL вида redis://host:port/db или memcached://host:port
+# кеш общий для всех процессов (shared), а default читает его через
+# короткий локальный кеш процесса.
+CACHE_URL = os.getenv('CACHE_URL', '')
+
+CACHE_BACKENDS = {
+    'redis': 'core.cache_backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+
+if CACHE_URL:
+    _cache_scheme, _cache_location = CACHE_URL.split('://', 1)
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.tiered.TieredCache',
+            'OPTIONS': {
+                'L2': 'shared',
+                'L1_TIMEOUT': float(os.getenv('CACHE_L1_TIMEOUT', 2)),
+                'L1_MAX_ENTRIES': 1000,
+            },
+        },
+        'shared': {
+            'BACKEND': CACHE_BACKENDS[_cache_scheme],
+            'LOCATION': (CACHE_URL if _cache_scheme == 'redis'
+                         else _cache_location),
+            'OPTIONS': {'MAX_CONNECTIONS': 50, 'SOCKET_TIMEOUT': 5}
+            if _cache_scheme == 'redis' else {},
+        },
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Время жизни кеша страниц, секунд. Страницы сбрасываются
+# при изменении данных, а устаревшие копии вытесняются по времени.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Размеры миниатюр изображений постов:
+# {название: (геометрия, параметры sorl-thumbnail)}.
+# Миниатюры создаются фоновой задачей после сохранения поста.
+THUMBNAIL_RENDITIONS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Количество готовых миниатюр, запоминаемых в памяти процесса
+THUMBNAIL_LRU_SIZE = 10000
+
+# Фоновые задачи (core.tasks) выполняет команда run_tasks.
+# При TASKS_EAGER задачи выполняются сразу в запросе, без исполнителя.
+# Без TASKS_EAGER нужен общий кеш (CACHE_URL): иначе веб-процессы
+# не видят поколений и миниатюр, записанных исполнителем.
+TASKS_EAGER = os.getenv('TASKS_EAGER', str(DEBUG)) == 'True'
+# Попыток выполнить задачу с ошибкой
+TASK_MAX_ATTEMPTS = 5
+# Задержка перед повтором задачи, секунд; удваивается с каждой попыткой
+TASK_RETRY_DELAY = 10
+# Время, на которое исполнитель берет задачу, секунд. Задачу,
+# не выполненную за это время, может взять другой исполнитель.
+TASK_LEASE = 60 * 5
+# Пауза между проверками пустой очереди, секунд
+TASK_POLL_INTERVAL = 1
+
+# Время жизни кеша карточки поста, секунд.
+# Карточка сбрасывается при изменении поста, поэтому время большое.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Защита от одновременного пересчета кеша (cache stampede): при промахе
+# значение вычисляет один запрос, остальные ждут его не дольше
+# CACHE_WAIT_TIMEOUT секунд или получают предыдущую копию.
+# Действует и на get_or_set двухуровневого кеша (core.cache.single_flight).
+CACHE_SINGLE_FLIGHT = True
+CACHE_WAIT_TIMEOUT = 2
+# Время жизни блокировки пересчета, секунд
+CACHE_LOCK_TIMEOUT = 10
+
+# Бэкенды поискового индекса по СУБД основной базы данных
+SEARCH_BACKENDS = {
+    'sqlite': 'search.backends.sqlite.SQLiteBackend',
+    'postgresql': 'search.backends.postgresql.PostgreSQLBackend',
 }
+# Бэкенд поиска, если нужен не тот, что выбирается по СУБД
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND')
+# Максимальное количество результатов поиска
+SEARCH_MAX_RESULTS = 200
+
+# Превышение бюджета запросов к БД представлением (core.decorators.
+# query_budget) вызывает ошибку, а не только запись в журнал
+QUERY_BUDGET_STRICT = False
+
+# Метрики запросов (core.metrics): гистограммы по имени URL
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+# Окно (в секундах), за которое метрики отдаются в JSON
+METRICS_WINDOW = 300
+# Токен сборщика метрик (Authorization: Bearer <токен>). Без токена
+# метрики доступны только сотрудникам
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
@@ -0,0 +1,23 @@
+"""Настройки для запуска тестов.
+
+    python manage.py test --settings=yatube.settings_test
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASE_ENGINES, DATABASES
+
+# В тестах данные пишутся в незавершенных транзакциях, которые
+# реплики не видят, поэтому чтение с реплик включают только тесты
+# маршрутизации — на отдельной базе replica.
+DATABASE_REPLICAS = []
+DATABASES['replica'] = {
+    'ENGINE': DATABASE_ENGINES['sqlite'],
+    'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+}
+
+# Задачи выполняются сразу в запросе, без исполнителя
+TASKS_EAGER = True
+
+# Превышение бюджета запросов в тестах — ошибка
+QUERY_BUDGET_STRICT = True
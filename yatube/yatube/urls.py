@@ -18,6 +18,15 @@ urlpatterns = [
 
     # О проекте
     path('about/', include('about.urls', namespace='about')),
+
+    # Поиск по постам и комментариям
+    path('search/', include('search.urls', namespace='search')),
+
+    # JSON API для чтения
+    path('api/', include('api.urls', namespace='api')),
+
+    # Служебная статистика
+    path('stats/', include('core.urls', namespace='core')),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Шаблоны компилируются до первого запроса (при TEMPLATE_CACHE)
+from core.template_backends import warm_up_templates  # noqa: E402
+
+warm_up_templates()